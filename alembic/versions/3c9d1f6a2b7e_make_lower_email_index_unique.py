@@ -0,0 +1,79 @@
+"""Make the lower(email) index on users unique
+
+Revision ID: 3c9d1f6a2b7e
+Revises: e57385083092
+Create Date: 2026-10-17 14:02:51.407315
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9d1f6a2b7e"
+down_revision: Union[str, None] = "e57385083092"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def drop_invalid_index(name: str) -> None:
+    # An interrupted or failed CREATE INDEX CONCURRENTLY (say, on duplicate
+    # emails) leaves an INVALID index under its name: drop it so a re-run
+    # builds the index again.
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    invalid = bind.execute(
+        sa.text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+        ),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.drop_index(name, table_name="users", postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Signup inserts with ON CONFLICT (lower(email)) DO NOTHING, which needs a
+    # unique index to arbitrate. Fails if two accounts differ only in case:
+    # merge or rename those first. Built before the old index is dropped, so
+    # lookups keep an index throughout; a failed build stops the migration
+    # before the drop.
+    with op.get_context().autocommit_block():
+        drop_invalid_index("uq_users_email_lower")
+        op.create_index(
+            "uq_users_email_lower",
+            "users",
+            [sa.text("lower(email)")],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_users_email_lower",
+            table_name="users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        drop_invalid_index("ix_users_email_lower")
+        op.create_index(
+            "ix_users_email_lower",
+            "users",
+            [sa.text("lower(email)")],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "uq_users_email_lower",
+            table_name="users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
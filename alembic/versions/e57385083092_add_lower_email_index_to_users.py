@@ -0,0 +1,62 @@
+"""Add lower(email) expression index to users
+
+Revision ID: e57385083092
+Revises: eae7f8b6a379
+Create Date: 2026-10-17 10:12:44.118203
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision: str = "e57385083092"
+down_revision: Union[str, None] = "eae7f8b6a379"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def drop_invalid_index(name: str) -> None:
+    # A CREATE INDEX CONCURRENTLY that failed or was interrupted leaves an
+    # INVALID index behind; drop it so the build runs again rather than being
+    # skipped (which IF NOT EXISTS would do, leaving the index unusable).
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    invalid = bind.execute(
+        sa.text(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+        ),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.drop_index(name, table_name="users", postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction; build it in an
+    # autocommit block so the users table stays writable during the build.
+    with op.get_context().autocommit_block():
+        drop_invalid_index("ix_users_email_lower")
+        op.create_index(
+            "ix_users_email_lower",
+            "users",
+            [sa.text("lower(email)")],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_users_email_lower",
+            table_name="users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
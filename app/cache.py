@@ -0,0 +1,101 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class TTLCache[V]:
+    """
+    Bounded, per-process LRU with per-entry expiry. Not shared across workers:
+    anything cached here must be invalidated explicitly (or tolerate being
+    stale for at most `ttl` seconds).
+
+    With `max_bytes`, the sizes callers pass to set() are bounded as well; an
+    entry larger than the whole budget isn't cached.
+    """
+
+    def __init__(
+        self, max_entries: int, ttl: float | None = None, max_bytes: int | None = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.stats = CacheStats()
+        # Bumped on every invalidation. Callers snapshot it before a slow read
+        # and pass it to set(), so a value fetched before an invalidation
+        # can't be written back over it.
+        self.generation = 0
+        # key -> (value, expires_at, size)
+        self._entries: OrderedDict[Any, tuple[V, float | None, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Any) -> V | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at, _ = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return value
+            self._remove(key)
+        self.stats.misses += 1
+        return None
+
+    def set(
+        self,
+        key: Any,
+        value: V,
+        ttl: float | None = None,
+        generation: int | None = None,
+        size: int = 0,
+    ) -> None:
+        if generation is not None and generation != self.generation:
+            return
+        self._remove(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (value, expires_at, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def _remove(self, key: Any) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def invalidate(self, key: Any) -> None:
+        self.generation += 1
+        self.stats.invalidations += 1
+        self._remove(key)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self.bytes = 0
@@ -0,0 +1,337 @@
+"""
+Redis-backed caching: the @cached decorator below, and TwoTierCache (a
+per-worker LRU in front of Redis) further down.
+
+Read-through caching of async service functions:
+
+    @cached(key="profile-{email}", ttl=300, tags=["user-{email}"])
+    async def load_profile(email: str) -> dict | None: ...
+
+    await load_profile.invalidate("a@example.com")  # one entry
+    await invalidate_tags("user-a@example.com")     # every entry under the tag
+
+Keys and tags are format strings over the function's arguments (or callables
+taking the same arguments). Results must be JSON-serializable: they are stored
+with cache_json_item. Against a thundering herd:
+
+- concurrent misses for one key within a worker share a single call
+  (single-flight);
+- each hit may refresh the entry early, with a probability that rises as it
+  nears expiry and with how long the last load took (XFetch), so a hot key
+  isn't recomputed by every worker at the moment it expires (a short SET NX
+  lets one worker do the early refresh);
+- None results are cached as well (for `negative_ttl`), so lookups of missing
+  rows don't all fall through to the database.
+"""
+import asyncio
+import functools
+import inspect
+import math
+import random
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Sequence
+
+from app.cache import CacheStats, TTLCache
+from app.logger import logger
+from app.memory_redis import MemoryStore
+from app.redis_manager import redis_manager
+
+CACHE_KEY_PREFIX = "cached:"
+TAG_KEY_PREFIX = "cache-tag:"
+REFRESH_KEY_PREFIX = "cache-refresh:"
+
+# A tag is a set of cache keys, kept at least as long as its longest entry.
+# One script call per tag: a tag and its keys needn't share a cluster slot.
+TAG_KEY_SCRIPT = """
+redis.call("SADD", KEYS[1], ARGV[1])
+if redis.call("TTL", KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+"""
+POP_TAG_SCRIPT = """
+local keys = redis.call("SMEMBERS", KEYS[1])
+redis.call("DEL", KEYS[1])
+return keys
+"""
+
+
+def tag_key_locally(store: MemoryStore, keys: list, args: list) -> None:
+    key, ttl = args
+    store.sadd(keys[0], key)
+    if store.ttl(keys[0]) < int(ttl):
+        store.expire(keys[0], int(ttl))
+
+
+def pop_tag_locally(store: MemoryStore, keys: list, args: list) -> list[bytes]:
+    members = list(store.smembers(keys[0]))
+    store.delete(keys[0])
+    return members
+
+
+redis_manager.register_script("tag_cache_key", TAG_KEY_SCRIPT, local=tag_key_locally)
+redis_manager.register_script("pop_cache_tag", POP_TAG_SCRIPT, local=pop_tag_locally)
+
+KeyTemplate = str | Callable[..., str]
+
+# Cache key -> the load in progress for it in this worker.
+_inflight: dict[str, asyncio.Task] = {}
+# Bumped by every invalidation in this worker: a load that started before one
+# returns its result but doesn't store it.
+_generation = 0
+
+
+def refresh_early(entry: dict[str, Any], beta: float) -> bool:
+    """XFetch: recompute before expiry with probability growing towards it."""
+    # 1 - random() is in (0, 1], so the log is defined and <= 0.
+    jitter = -entry["delta"] * beta * math.log(1.0 - random.random())
+    return time.time() + jitter >= entry["expires_at"]
+
+
+class CachedFunction:
+    def __init__(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        key: KeyTemplate,
+        ttl: int,
+        negative_ttl: int | None,
+        tags: Sequence[KeyTemplate],
+        beta: float,
+    ):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.key = key
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.tags = tags
+        self.beta = beta
+        self._signature = inspect.signature(func)
+
+    def _render(self, template: KeyTemplate, args: tuple, kwargs: dict) -> str:
+        if callable(template):
+            return template(*args, **kwargs)
+        bound = self._signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return template.format(**bound.arguments)
+
+    def cache_key(self, *args: Any, **kwargs: Any) -> str:
+        return CACHE_KEY_PREFIX + self._render(self.key, args, kwargs)
+
+    async def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        key = self.cache_key(*args, **kwargs)
+        entry = await redis_manager.get_json_item(key)
+        if entry is not None and (
+            not refresh_early(entry, self.beta)
+            # One early refresh per stored entry across workers; the rest
+            # serve the still-valid entry meanwhile.
+            or not await redis_manager.set_if_absent(
+                f"{REFRESH_KEY_PREFIX}{key}:{entry['expires_at']}",
+                ttl=math.ceil(entry["delta"]) + 1,
+            )
+        ):
+            return entry["value"]
+
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, args, kwargs))
+            _inflight[key] = task
+            task.add_done_callback(
+                lambda done: _inflight.pop(key) if _inflight.get(key) is done else None
+            )
+        # Shielded: a caller that gives up doesn't cancel the load for the rest.
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, args: tuple, kwargs: dict) -> Any:
+        generation = _generation
+        started = time.monotonic()
+        value = await self.func(*args, **kwargs)
+        delta = time.monotonic() - started
+
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if not ttl or generation != _generation:
+            return value
+        entry = {"value": value, "delta": delta, "expires_at": time.time() + ttl}
+        await redis_manager.cache_json_item(key, entry, ttl=ttl)
+        for tag in self.tags:
+            await redis_manager.run_script(
+                "tag_cache_key",
+                keys=[TAG_KEY_PREFIX + self._render(tag, args, kwargs)],
+                args=[key, ttl],
+            )
+        return value
+
+    async def invalidate(self, *args: Any, **kwargs: Any) -> None:
+        """Drop the entry for these arguments."""
+        global _generation
+        _generation += 1
+        await redis_manager.delete_keys(self.cache_key(*args, **kwargs))
+
+
+def cached(
+    key: KeyTemplate,
+    ttl: int,
+    *,
+    negative_ttl: int | None = None,
+    tags: Sequence[KeyTemplate] = (),
+    beta: float = 1.0,
+) -> Callable[[Callable[..., Awaitable[Any]]], CachedFunction]:
+    """
+    Cache an async function's results for `ttl` seconds. None results are kept
+    for `negative_ttl` (default `ttl`; 0 disables negative caching). A higher
+    `beta` refreshes earlier.
+    """
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> CachedFunction:
+        return CachedFunction(func, key, ttl, negative_ttl, tags, beta)
+
+    return decorator
+
+
+async def invalidate_tags(*tags: str) -> int:
+    """Drop every entry stored under any of `tags`; returns how many."""
+    global _generation
+    _generation += 1
+    keys: list[str] = []
+    for tag in tags:
+        keys += await redis_manager.run_script(
+            "pop_cache_tag", keys=[TAG_KEY_PREFIX + tag], args=[]
+        )
+    if keys:
+        await redis_manager.delete_keys(*keys)
+    return len(keys)
+
+
+# Every TwoTierCache by name, for cross-worker invalidation and /health/metrics.
+two_tier_caches: dict[str, "TwoTierCache"] = {}
+CACHE_INVALIDATION_CHANNEL = "cache-invalidations"
+# Identifies this worker's own invalidation messages, which it has applied.
+WORKER_ID = secrets.token_hex(8)
+
+
+class TwoTierCache:
+    """
+    A per-worker LRU (bounded in entries and in encoded bytes) in front of
+    Redis, for read-mostly values. Values must be JSON-serializable and not
+    None; they are stored with RedisManager's serializer.
+
+    - get(): this worker's tier, then Redis (filling the local tier).
+    - get_or_load(): on a miss in both, call the loader and store its result.
+    - set(): write-through, Redis first and then the local tier. Other workers
+      drop their copy and re-read from Redis.
+    - invalidate(): delete from Redis and from every worker's local tier.
+
+    Cross-worker drops go over CACHE_INVALIDATION_CHANNEL (see
+    listen_for_invalidations); `local_ttl` bounds how stale a worker can be if
+    a message is lost. Create instances at import time, so the lifespan knows
+    to start the listener.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: int,
+        *,
+        local_ttl: float = 30.0,
+        max_entries: int = 1_000,
+        max_bytes: int = 1024 * 1024,
+    ):
+        if name in two_tier_caches:
+            raise ValueError(f"A TwoTierCache named {name!r} already exists")
+        self.name = name
+        self.ttl = ttl
+        self.local: TTLCache[Any] = TTLCache(
+            max_entries=max_entries, ttl=min(local_ttl, ttl), max_bytes=max_bytes
+        )
+        self.redis_stats = CacheStats()
+        two_tier_caches[name] = self
+
+    def redis_key(self, key: str) -> str:
+        return f"two-tier:{self.name}:{key}"
+
+    async def get(self, key: str) -> Any | None:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        generation = self.local.generation
+        (raw,) = await redis_manager.get_many(self.redis_key(key), decode=False)
+        if raw is None:
+            self.redis_stats.misses += 1
+            return None
+        self.redis_stats.hits += 1
+        value = redis_manager.serializer.loads(raw)
+        self.local.set(key, value, generation=generation, size=len(raw))
+        return value
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Any]]
+    ) -> Any | None:
+        value = await self.get(key)
+        if value is None:
+            generation = self.local.generation
+            value = await loader()
+            if value is not None and generation == self.local.generation:
+                # Redis had no copy, so no worker holds one: nothing to broadcast.
+                await self._store(key, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._store(key, value)
+        await self._publish(key)
+
+    async def invalidate(self, key: str) -> None:
+        self.local.invalidate(key)
+        await redis_manager.delete_keys(self.redis_key(key))
+        await self._publish(key)
+
+    async def _store(self, key: str, value: Any) -> None:
+        raw = redis_manager.serializer.dumps(value)
+        await redis_manager.set_bytes(self.redis_key(key), raw, ttl=self.ttl)
+        # Bump the generation, so an older read in flight can't overwrite the
+        # new value. Not an invalidation: it isn't counted as one.
+        self.local.generation += 1
+        self.local.set(key, value, size=len(raw))
+
+    async def _publish(self, key: str) -> None:
+        await redis_manager.publish(
+            CACHE_INVALIDATION_CHANNEL,
+            {"cache": self.name, "key": key, "origin": WORKER_ID},
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "local": {
+                **self.local.stats.as_dict(),
+                "entries": len(self.local),
+                "bytes": self.local.bytes,
+            },
+            "redis": self.redis_stats.as_dict(),
+        }
+
+
+def handle_invalidation(message: dict) -> None:
+    cache = two_tier_caches.get(message.get("cache", ""))
+    if cache is not None and message.get("origin") != WORKER_ID:
+        cache.local.invalidate(message.get("key"))
+
+
+async def listen_for_invalidations() -> None:
+    """
+    Apply TwoTierCache invalidations published by other workers, for the app's
+    lifetime. Returns at once when no TwoTierCache exists. On a dropped
+    connection it flushes the local tiers, since messages may have been missed,
+    and resubscribes.
+    """
+    if not two_tier_caches:
+        return
+    while True:
+        try:
+            async for message in redis_manager.subscribe(CACHE_INVALIDATION_CHANNEL):
+                handle_invalidation(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Cache invalidation listener failed, resubscribing: {exc}")
+            for cache in two_tier_caches.values():
+                cache.local.clear()
+            await asyncio.sleep(1)
@@ -1,8 +1,334 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Sequence
 
+from sqlalchemy import Select, event
+from sqlalchemy.engine import Connection, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue, Empty
+
+from app.cache import TTLCache
+from app.logger import logger
 from app.settings import settings
 
 DATABASE_URL = settings.DATABASE_URL
 
-async_engine = create_async_engine(DATABASE_URL)
-AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+class InstrumentedQueue(AsyncAdaptedQueue):
+    """
+    The pool's queue of idle connections. A checkout blocks on it only once
+    pool_size + max_overflow connections are out; it times those waits.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def get(self, block: bool = True, timeout: float | None = None) -> Any:
+        if not block:
+            return super().get(block, timeout)
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        except Empty:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.waits += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """The engine's default async pool, with statistics for /health/metrics."""
+
+    _queue_class = InstrumentedQueue
+    _pool: InstrumentedQueue
+
+    def stats(self) -> dict[str, float | int]:
+        queue = self._pool
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            # Connections open beyond pool_size; negative while still filling.
+            "overflow": max(self.overflow(), 0),
+            "waits": queue.waits,
+            "wait_ms_avg": round(
+                queue.wait_seconds_total * 1000 / max(queue.waits, 1), 3
+            ),
+            "wait_ms_max": round(queue.wait_seconds_max * 1000, 3),
+            "checkout_timeouts": queue.timeouts,
+        }
+
+
+def engine_options(url: str) -> dict[str, Any]:
+    """create_async_engine keyword arguments for `url`, from the DB_* settings."""
+    options: dict[str, Any] = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    }
+    parsed = make_url(url)
+    # SQLite (tests, local dev) keeps its own single-connection pools.
+    if parsed.get_backend_name() != "sqlite":
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        )
+    if parsed.get_driver_name() == "asyncpg":
+        connect_args: dict[str, Any] = {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "command_timeout": settings.DB_COMMAND_TIMEOUT_SECONDS,
+        }
+        if settings.DB_PGBOUNCER:
+            # In transaction mode consecutive statements can run on different
+            # server connections, where a prepared statement cached (or named)
+            # on another one doesn't exist. Cache nothing, and give every
+            # statement a unique name.
+            connect_args.update(
+                prepared_statement_cache_size=0,
+                statement_cache_size=0,
+                prepared_statement_name_func=unique_statement_name,
+            )
+        options["connect_args"] = connect_args
+    return options
+
+
+def unique_statement_name() -> str:
+    return f"__asyncpg_{uuid.uuid4()}__"
+
+
+class RoutingSession(Session):
+    """
+    Sends plain SELECTs to a random replica and everything else (flushes,
+    INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE, raw SQL) to the primary. Once
+    a session has used the primary for anything but a forced read, it stays
+    there, so it reads its own writes. Force one read to the primary with
+    `session.execute(stmt, bind_arguments={"primary": True})`; a lambda_stmt()
+    that locks rows must, as its FOR UPDATE isn't visible from outside.
+    """
+
+    def __init__(self, *args: Any, replicas: Sequence[AsyncEngine] = (), **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.replicas = [engine.sync_engine for engine in replicas]
+
+    def get_bind(
+        self,
+        mapper: Any = None,
+        *,
+        clause: Any = None,
+        primary: bool = False,
+        **kw: Any,
+    ) -> Engine | Connection:
+        # is_select is public on statements and on the lambda_stmt() wrapper
+        # (which answers for the statement it builds); raw SQL has none.
+        read_only = (
+            not self._flushing
+            and getattr(clause, "is_select", False)
+            and not locks_rows(clause)
+        )
+        if not read_only:
+            self.info["on_primary"] = True
+        elif self.replicas and not primary and not self.info.get("on_primary"):
+            return random.choice(self.replicas)
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def locks_rows(clause: Any) -> bool:
+    # SELECT ... FOR UPDATE has no public accessor. _for_update_arg has been
+    # stable through 2.0, and SQLAlchemy is pinned in requirements.txt.
+    return isinstance(clause, Select) and clause._for_update_arg is not None
+
+
+async_engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+replica_engines = [
+    create_async_engine(url, **engine_options(url))
+    for url in settings.DATABASE_REPLICA_URLS
+]
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    replicas=replica_engines,
+)
+
+# Keys (a user's email) of rows written within DB_READ_YOUR_WRITES_SECONDS.
+# Reads of them skip the replicas, which may not have the write yet.
+recent_writes: TTLCache[bool] = TTLCache(
+    max_entries=100_000, ttl=settings.DB_READ_YOUR_WRITES_SECONDS
+)
+
+
+def mark_written(key: str) -> None:
+    if replica_engines:
+        recent_writes.set(key, True)
+
+
+def read_binding(key: str) -> dict[str, bool]:
+    """bind_arguments for a read of the row(s) under `key` (see mark_written)."""
+    return {"primary": recent_writes.get(key) is not None}
+
+
+def pool_stats(engine: AsyncEngine = async_engine) -> dict[str, float | int]:
+    pool = engine.pool
+    return pool.stats() if isinstance(pool, InstrumentedQueuePool) else {}
+
+
+# --- Per-request query statistics --------------------------------------------
+# Slowest statements kept per count_queries() block (the access log shows them).
+SLOWEST_KEPT = 3
+EXPLAINABLE = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"})
+# Plan only: neither form runs the statement again.
+EXPLAIN_PREFIXES = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+
+
+@dataclass
+class QueryStats:
+    """The SQL statements run inside a count_queries() block, on any engine."""
+
+    count: int = 0
+    seconds: float = 0.0
+    # (seconds, statement), slowest first.
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+    # Every statement, in order, with count_queries(keep_statements=True).
+    statements: list[str] | None = None
+    # Enclosing block, so a test's budget still counts a request's queries.
+    parent: "QueryStats | None" = None
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if self.statements is not None:
+            self.statements.append(statement)
+        if len(self.slowest) < SLOWEST_KEPT or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, statement))
+            self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "db_queries": self.count,
+            "db_time": f"{self.seconds * 1000:.1f}ms",
+            "slowest_queries": [
+                {"ms": round(seconds * 1000, 2), "statement": shorten(statement)}
+                for seconds, statement in self.slowest
+            ],
+        }
+
+
+# The stats for the current request (or test block); mutable, like the Redis
+# round-trip counter, so tasks spawned by middleware add to the same totals.
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def count_queries(keep_statements: bool = False) -> Iterator[QueryStats]:
+    """Count and time the SQL statements run inside the block."""
+    stats = QueryStats(
+        statements=[] if keep_statements else None, parent=_query_stats.get()
+    )
+    reset_token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(reset_token)
+
+
+def shorten(statement: str, limit: int = 200) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def redact(parameters: Any) -> Any:
+    """Bound parameters with each value replaced by its type name, for logs."""
+    if isinstance(parameters, dict):
+        return {name: redact(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    return type(parameters).__name__
+
+
+def explain(conn: Connection, statement: str, parameters: Any) -> list[str] | None:
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    words = statement.split(None, 1)
+    if prefix is None or not words or words[0].upper() not in EXPLAINABLE:
+        return None
+    # A failed statement aborts the whole PostgreSQL transaction, and this one
+    # runs in the request's: confine a failure to a savepoint.
+    savepoint = (
+        conn.dialect.name == "postgresql"
+        and conn.get_execution_options().get("isolation_level") != "AUTOCOMMIT"
+    )
+    # On the raw DBAPI cursor, so the EXPLAIN fires no events: it isn't
+    # counted, timed or explained itself.
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT explain_plan")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = [str(row[-1]) for row in cursor.fetchall()]
+        except Exception as exc:  # noqa: BLE001
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT explain_plan")
+            plan = [f"EXPLAIN failed: {exc}"]
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT explain_plan")
+        return plan
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(
+    conn: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    started = getattr(context, "query_started", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    stats = _query_stats.get()
+    while stats is not None:
+        stats.record(statement, seconds)
+        stats = stats.parent
+
+    if seconds * 1000 >= settings.DB_SLOW_QUERY_MS:
+        entry: dict[str, Any] = {
+            "slow_query_ms": round(seconds * 1000, 2),
+            "statement": statement,
+            "parameters": redact(parameters),
+        }
+        if settings.DB_SLOW_QUERY_EXPLAIN and not executemany:
+            entry["plan"] = explain(conn, statement, parameters)
+        logger.warning(entry)
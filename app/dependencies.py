@@ -1,13 +1,12 @@
-from typing import Annotated, AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncGenerator, AsyncIterator
 
-import jwt
-from fastapi import Depends, HTTPException, status
-from jwt.exceptions import InvalidTokenError
+from fastapi import Depends, FastAPI, Request
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import AsyncSessionLocal
 from app.models.auth import User as UserDB
-from app.redis_manager import redis_manager
 from app.schemas import auth as auth_schemas
 from app.services import auth as auth_services
 
@@ -20,43 +19,53 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 async def get_current_user(
     token: Annotated[str, Depends(auth_services.oauth2_scheme)],
     db: Annotated[AsyncSession, Depends(get_db)],
-):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    # check if the user token has been added to the list of logged out tokens
-    if await redis_manager.get_json_item(token):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or Expired credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+) -> auth_schemas.Principal:
+    email = await auth_services.authenticate_access_token(token)
+    principal = await auth_services.get_principal(email, db)
+    if not principal:
+        raise auth_services.credentials_exception()
+    return principal
+
+
+@asynccontextmanager
+async def open_db_session(app: FastAPI) -> AsyncIterator[AsyncSession]:
+    """get_db for code outside FastAPI's DI; honours app.dependency_overrides."""
+    session_dependency = app.dependency_overrides.get(get_db, get_db)
+    sessions = session_dependency()
     try:
-        payload: dict = jwt.decode(
-            token, auth_services.JWT_SECRET, algorithms=[auth_services.JWT_ALGORITHM]
-        )
-        username = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        # Reject refresh tokens (or any non-access token) on authenticated routes.
-        if payload.get("type") != "access":
-            raise credentials_exception
-        # Reject tokens issued before the user's last global logout.
-        version = await redis_manager.get_int(auth_services.token_version_key(username))
-        if payload.get("ver", 0) != version:
-            raise credentials_exception
-        token_data = auth_schemas.TokenData(email=username)
-    except InvalidTokenError as err:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=str(err),
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user: UserDB | None = await auth_services.get_user(
-        email=token_data.email, session=db
+        yield await anext(sessions)
+    finally:
+        await sessions.aclose()
+
+
+async def get_current_principal(
+    request: Request,
+    token: Annotated[str, Depends(auth_services.oauth2_scheme)],
+) -> auth_schemas.Principal:
+    """
+    The principal AuthenticationMiddleware already resolved for this request,
+    falling back to the full get_current_user checks when the middleware is
+    disabled (or the path isn't one it protects).
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is None:
+        async with open_db_session(request.app) as db:
+            principal = await get_current_user(token, db)
+    return principal
+
+
+async def get_current_user_row(
+    user: Annotated[auth_schemas.Principal, Depends(get_current_principal)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+) -> UserDB:
+    """
+    Opt-in: the live ORM row for the authenticated user, for routes that need
+    to modify it in their session. Costs a primary-key lookup per request, on
+    the primary: a replica's copy may be stale.
+    """
+    row = await db.scalar(
+        select(UserDB).where(UserDB.id == user.id), bind_arguments={"primary": True}
     )
-    if not user:
-        raise credentials_exception
-    return user
+    if row is None:
+        raise auth_services.credentials_exception()
+    return row
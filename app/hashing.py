@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from typing import Any, Callable
+
+import bcrypt
+from fastapi import HTTPException, status
+
+from app.settings import settings
+
+
+def hash_password(password: str, rounds: int | None = None) -> str:
+    return bcrypt.hashpw(
+        bytes(password, encoding="utf-8"),
+        bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS),
+    ).decode()
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(
+        bytes(plain_password, encoding="utf-8"),
+        bytes(hashed_password, encoding="utf-8"),
+    )
+
+
+def hash_rounds(hashed_password: str) -> int:
+    # Modular crypt format: $2b$<cost>$<salt+hash>
+    return int(hashed_password.split("$")[2])
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    return hash_rounds(hashed_password) != settings.BCRYPT_ROUNDS
+
+
+def calibrate(target_ms: float, samples: int = 3) -> list[tuple[int, float]]:
+    """Time one hash per cost, from the minimum up to the first over target."""
+    timings = []
+    for rounds in range(4, 32):
+        start = time.perf_counter()
+        for _ in range(samples):
+            hash_password("calibration-password", rounds=rounds)
+        elapsed_ms = (time.perf_counter() - start) / samples * 1000
+        timings.append((rounds, elapsed_ms))
+        if elapsed_ms > target_ms:
+            break
+    return timings
+
+
+def release_threadsafe(
+    loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore
+) -> None:
+    with suppress(RuntimeError):  # the loop has closed; nothing to release
+        loop.call_soon_threadsafe(slots.release)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded process pool so a ~250ms hash never blocks the
+    event loop. At most `max_workers` hashes run at once and at most
+    `max_queue` callers wait behind them; a caller that can't get a worker
+    within `queue_timeout` seconds (or arrives to a full queue) gets a 503
+    instead of piling more work onto an already saturated worker.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_queue: int = settings.PASSWORD_HASH_MAX_QUEUE,
+        queue_timeout: float = settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._waiting = 0
+
+    def start(self) -> None:
+        # Idempotent; also called lazily so scripts and tests work without the
+        # app lifespan. Spawning up front keeps the first login from paying
+        # for process start-up. Workers come from a forkserver: forking the
+        # event-loop process itself, which runs threads, can deadlock.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._slots = None
+        self._loop = None
+
+    async def hash(self, password: str) -> str:
+        # Pass the cost explicitly; pool workers may hold older settings.
+        return await self._run(hash_password, password, settings.BCRYPT_ROUNDS)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(check_password, plain_password, hashed_password)
+
+    async def _run[T](self, func: Callable[..., T], *args: Any) -> T:
+        self.start()
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            # asyncio primitives bind to one loop; rebuild for a new one (each
+            # pytest-asyncio test runs on a fresh loop).
+            self._slots = asyncio.Semaphore(self.max_workers)
+            self._loop = loop
+            self._waiting = 0
+
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            raise self._busy()
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except TimeoutError:
+            raise self._busy()
+        finally:
+            self._waiting -= 1
+
+        slots = self._slots
+        assert self._executor is not None
+        try:
+            job = self._executor.submit(func, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot stands for a busy worker, not a waiting caller: free it when
+        # the job ends, even if the caller was cancelled (client gone) while
+        # bcrypt still runs. Done-callbacks run on the executor's thread.
+        job.add_done_callback(lambda _: release_threadsafe(loop, slots))
+        return await asyncio.wrap_future(job)
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+
+password_hasher = PasswordHasher()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recommend a BCRYPT_ROUNDS value for this host."
+    )
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    args = parser.parse_args()
+
+    timings = calibrate(args.target_ms)
+    for rounds, elapsed_ms in timings:
+        print(f"rounds={rounds:<3} {elapsed_ms:9.1f}ms")
+    within = [rounds for rounds, elapsed_ms in timings if elapsed_ms <= args.target_ms]
+    recommended = within[-1] if within else 4
+    print(
+        f"Recommended: BCRYPT_ROUNDS={recommended} "
+        f"(current: {settings.BCRYPT_ROUNDS}, target: {args.target_ms:.0f}ms)"
+    )
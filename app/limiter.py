@@ -3,13 +3,30 @@ from slowapi.util import get_remote_address
 
 from app.settings import settings
 
+
+def storage_uri() -> str:
+    """The limits storage URI for the configured Redis topology."""
+    if settings.REDIS_MODE == "cluster":
+        nodes = settings.REDIS_CLUSTER_NODES or [
+            f"{settings.REDIS_HOST}:{settings.REDIS_PORT}"
+        ]
+        return f"redis+cluster://{','.join(nodes)}"
+    if settings.REDIS_MODE == "memory":
+        return "memory://"
+    if settings.REDIS_MODE == "sentinel":
+        sentinels = ",".join(settings.REDIS_SENTINELS)
+        return f"redis+sentinel://{sentinels}/{settings.REDIS_SENTINEL_SERVICE}"
+    return f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}"
+
+
 # Shared rate limiter, keyed by client IP. Backed by Redis so limits are
 # enforced consistently across every worker/replica (an in-memory store would
-# give each process its own counter and reset on restart). Import this in
+# give each process its own counter and reset on restart; that is what
+# REDIS_MODE=memory uses, for single-worker deployments). Import this in
 # routers to decorate endpoints with `@limiter.limit(...)`, and register it on
 # the app in main.py.
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=[settings.RATE_LIMIT_DEFAULT],
-    storage_uri=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}",
+    storage_uri=storage_uri(),
 )
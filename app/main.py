@@ -1,4 +1,5 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from datetime import UTC, datetime
 
 from fastapi import FastAPI, HTTPException
@@ -14,17 +15,22 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 
 from app.api_router import api
-from app.database import AsyncSessionLocal
+from app.cached import listen_for_invalidations as listen_for_cache_invalidations
+from app.database import AsyncSessionLocal, async_engine, replica_engines
+from app.hashing import password_hasher
 from app.limiter import limiter
 from app.logger import logger
 from app.middlewares import (
     AllowAuthorizedDocAccess,
+    AuthenticationMiddleware,
     MaxBodySizeMiddleware,
     SecurityHeadersMiddleware,
     log_request_middleware,
 )
 from app.redis_manager import redis_manager
 from app.routers.health import router as health_router
+from app.routers.well_known import router as well_known_router
+from app.services import auth as auth_services
 from app.settings import settings
 
 
@@ -38,6 +44,8 @@ async def check_connectivity() -> None:
         problems.append(f"database ({exc})")
     try:
         await redis_manager.redis_client.ping()
+        # Preload the Lua scripts so the first EVALSHA doesn't miss.
+        await redis_manager.load_scripts()
     except Exception as exc:  # noqa: BLE001
         problems.append(f"redis ({exc})")
 
@@ -53,8 +61,23 @@ async def check_connectivity() -> None:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    redis_manager.open()
     await check_connectivity()
+    await redis_manager.start_client_cache()
+    password_hasher.start()
+    invalidation_listener = asyncio.create_task(
+        auth_services.listen_for_invalidations()
+    )
+    cache_invalidation_listener = asyncio.create_task(listen_for_cache_invalidations())
     yield
+    for listener in (invalidation_listener, cache_invalidation_listener):
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+    password_hasher.shutdown()
+    await redis_manager.close()
+    for engine in (async_engine, *replica_engines):
+        await engine.dispose()
 
 
 def initiate_app():
@@ -65,6 +88,10 @@ def initiate_app():
         lifespan=lifespan,
     )
 
+    # Innermost, so its 401s still get CORS and security headers.
+    if settings.AUTH_MIDDLEWARE_ENABLED:
+        app.add_middleware(AuthenticationMiddleware)
+
     origins = [
         # Add allowed origins here
     ]
@@ -101,6 +128,7 @@ def initiate_app():
 
     app.include_router(api)
     app.include_router(health_router)
+    app.include_router(well_known_router)
     return app
 
 
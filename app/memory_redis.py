@@ -0,0 +1,404 @@
+"""
+In-process stand-in for Redis (REDIS_MODE=memory): for single-worker
+deployments, which then skip the socket entirely, and for running the test
+suite without a server.
+
+MemoryRedis implements the subset of the redis.asyncio client that
+RedisManager uses (strings, counters, hashes, expiry, SCAN, pipelines and
+pub/sub) over a MemoryStore. Lua can't run here, so every script registered
+with RedisManager.register_script also provides a Python version that works on
+the store directly; scripts stay atomic because nothing else runs on the event
+loop while one executes.
+
+The data lives in this process only: with more than one worker, each would
+have its own revocations, sessions and rate-limit counters.
+"""
+import asyncio
+import fnmatch
+import hashlib
+import math
+import time
+from typing import Any, AsyncIterator, Callable
+
+from redis.client import NEVER_DECODE
+from redis.exceptions import ResponseError
+
+Members = set[bytes]
+Value = bytes | dict[bytes, bytes] | Members
+# How many writes between sweeps of expired keys that were never read again.
+SWEEP_EVERY = 1_000
+
+
+def encode(value: Any) -> bytes:
+    """Encode a key, field or value the way redis-py does."""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, bool):
+        raise TypeError("Booleans aren't valid Redis values")
+    if isinstance(value, (int, float)):
+        return repr(value).encode()
+    raise TypeError(f"Unsupported Redis value: {type(value).__name__}")
+
+
+def wrong_type() -> ResponseError:
+    return ResponseError(
+        "WRONGTYPE Operation against a key holding the wrong kind of value"
+    )
+
+
+class MemoryStore:
+    """
+    The keyspace: synchronous, bytes-in/bytes-out operations with Redis
+    semantics. Expired keys are dropped when touched and by a periodic sweep.
+    """
+
+    def __init__(self):
+        self._data: dict[bytes, Value] = {}
+        self._expires: dict[bytes, float] = {}
+        # channel -> subscribed queues
+        self.channels: dict[bytes, set[asyncio.Queue]] = {}
+        self._writes = 0
+
+    def __len__(self) -> int:
+        self.sweep()
+        return len(self._data)
+
+    def _live(self, key: Any) -> Value | None:
+        key = encode(key)
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._drop(key)
+        return self._data.get(key)
+
+    def _drop(self, key: bytes) -> bool:
+        self._expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    def _write(self, key: bytes, value: Value) -> None:
+        self._data[key] = value
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            self.sweep()
+
+    def sweep(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, at in self._expires.items() if at <= now]:
+            self._drop(key)
+
+    def flush(self) -> None:
+        self._data.clear()
+        self._expires.clear()
+
+    def _string(self, key: Any) -> bytes | None:
+        value = self._live(key)
+        if value is not None and not isinstance(value, bytes):
+            raise wrong_type()
+        return value
+
+    def _hash(self, key: Any) -> dict[bytes, bytes]:
+        value = self._live(key)
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            raise wrong_type()
+        return value
+
+    def _set(self, key: Any) -> Members:
+        value = self._live(key)
+        if value is None:
+            return set()
+        if not isinstance(value, set):
+            raise wrong_type()
+        return value
+
+    # Keys
+
+    def type(self, key: Any) -> str:
+        value = self._live(key)
+        if value is None:
+            return "none"
+        return {bytes: "string", dict: "hash", set: "set"}[type(value)]
+
+    def exists(self, *keys: Any) -> int:
+        return sum(self._live(key) is not None for key in keys)
+
+    def delete(self, *keys: Any) -> int:
+        return sum(
+            self._live(key) is not None and self._drop(encode(key)) for key in keys
+        )
+
+    def expire(self, key: Any, seconds: int) -> bool:
+        if self._live(key) is None:
+            return False
+        if int(seconds) <= 0:
+            return self._drop(encode(key))
+        self._expires[encode(key)] = time.monotonic() + int(seconds)
+        self._writes += 1
+        return True
+
+    def ttl(self, key: Any) -> int:
+        if self._live(key) is None:
+            return -2
+        expires_at = self._expires.get(encode(key))
+        if expires_at is None:
+            return -1
+        return math.ceil(expires_at - time.monotonic())
+
+    def scan(self, pattern: str = "*") -> list[bytes]:
+        self.sweep()
+        # latin-1 maps every byte to one character, so binary keys match too.
+        return [
+            key
+            for key in self._data
+            if fnmatch.fnmatchcase(key.decode("latin-1"), pattern)
+        ]
+
+    # Strings
+
+    def get(self, key: Any) -> bytes | None:
+        return self._string(key)
+
+    def set(
+        self, key: Any, value: Any, ex: int | None = None, nx: bool = False
+    ) -> bool:
+        if nx and self._live(key) is not None:
+            return False
+        key = encode(key)
+        self._expires.pop(key, None)  # SET drops any previous TTL
+        self._write(key, encode(value))
+        if ex is not None:
+            self.expire(key, ex)
+        return True
+
+    def incr(self, key: Any, amount: int = 1) -> int:
+        current = self._string(key)
+        try:
+            value = int(current or 0) + amount
+        except ValueError:
+            raise ResponseError("value is not an integer or out of range") from None
+        self._write(encode(key), str(value).encode())  # keeps the TTL
+        return value
+
+    # Hashes
+
+    def hget(self, key: Any, field: Any) -> bytes | None:
+        return self._hash(key).get(encode(field))
+
+    def hset(self, key: Any, mapping: dict[Any, Any]) -> int:
+        fields = self._hash(key)
+        added = 0
+        for field, value in mapping.items():
+            added += encode(field) not in fields
+            fields[encode(field)] = encode(value)
+        self._write(encode(key), fields)
+        return added
+
+    def hsetnx(self, key: Any, field: Any, value: Any) -> bool:
+        if encode(field) in self._hash(key):
+            return False
+        return bool(self.hset(key, {field: value}))
+
+    def hdel(self, key: Any, *fields: Any) -> int:
+        existing = self._hash(key)
+        removed = sum(existing.pop(encode(field), None) is not None for field in fields)
+        if not existing:
+            self._drop(encode(key))
+        return removed
+
+    def hgetall(self, key: Any) -> dict[bytes, bytes]:
+        return dict(self._hash(key))
+
+    # Sets
+
+    def sadd(self, key: Any, *members: Any) -> int:
+        existing = self._set(key)
+        added = {encode(member) for member in members} - existing
+        existing |= added
+        self._write(encode(key), existing)
+        return len(added)
+
+    def smembers(self, key: Any) -> Members:
+        return set(self._set(key))
+
+    # Pub/sub
+
+    def publish(self, channel: Any, message: Any) -> int:
+        queues = self.channels.get(encode(channel), set())
+        for queue in queues:
+            queue.put_nowait((encode(channel), encode(message)))
+        return len(queues)
+
+
+LocalScript = Callable[[MemoryStore, list[Any], list[Any]], Any]
+
+
+class MemoryPubSub:
+    def __init__(self, client: "MemoryRedis"):
+        self._client = client
+        self._queue: asyncio.Queue[tuple[bytes, bytes]] = asyncio.Queue()
+        self._channels: set[bytes] = set()
+
+    async def subscribe(self, *channels: Any) -> None:
+        for channel in map(encode, channels):
+            self._client.store.channels.setdefault(channel, set()).add(self._queue)
+            self._channels.add(channel)
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: float | None = 0.0
+    ) -> dict[str, Any] | None:
+        try:
+            channel, data = await asyncio.wait_for(self._queue.get(), timeout)
+        except TimeoutError:
+            return None
+        return {
+            "type": "message",
+            "pattern": None,
+            "channel": self._client.decode(channel),
+            "data": self._client.decode(data),
+        }
+
+    async def aclose(self) -> None:
+        for channel in self._channels:
+            self._client.store.channels.get(channel, set()).discard(self._queue)
+        self._channels.clear()
+
+
+class MemoryPipeline:
+    """Queues client calls and runs them in order on execute()."""
+
+    def __init__(self, client: "MemoryRedis"):
+        self._client = client
+        self._calls: list[tuple[str, tuple, dict]] = []
+
+    async def __aenter__(self) -> "MemoryPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._calls.clear()
+
+    def __getattr__(self, name: str) -> Callable[..., "MemoryPipeline"]:
+        def queue(*args: Any, **kwargs: Any) -> "MemoryPipeline":
+            self._calls.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> list[Any]:
+        calls, self._calls = self._calls, []
+        return [await getattr(self._client, name)(*a, **kw) for name, a, kw in calls]
+
+
+class MemoryRedis:
+    """The redis.asyncio.Redis methods RedisManager calls, over a MemoryStore."""
+
+    def __init__(self, store: MemoryStore, decode_responses: bool = True):
+        self.store = store
+        self.decode_responses = decode_responses
+
+    def decode(self, value: Any) -> Any:
+        if not self.decode_responses:
+            return value
+        if isinstance(value, bytes):
+            return value.decode()
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        return value
+
+    async def ping(self) -> bool:
+        return True
+
+    async def aclose(self, close_connection_pool: bool | None = None) -> None:
+        pass
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        command, *rest = args
+        if command.upper() == "GET":
+            reply: Any = self.store.get(rest[0])
+        elif command.upper() == "MGET":
+            reply = [self.store.get(key) for key in rest]
+        else:
+            raise ResponseError(f"Unsupported command in memory mode: {command}")
+        return reply if NEVER_DECODE in options else self.decode(reply)
+
+    async def get(self, name: Any) -> Any:
+        return self.decode(self.store.get(name))
+
+    async def mget(self, keys: Any, *args: Any) -> list[Any]:
+        keys = [keys, *args] if isinstance(keys, (str, bytes)) else [*keys, *args]
+        return self.decode([self.store.get(key) for key in keys])
+
+    async def set(
+        self, name: Any, value: Any, ex: int | None = None, nx: bool = False
+    ) -> bool | None:
+        return self.store.set(name, value, ex=ex, nx=nx) or None
+
+    async def incr(self, name: Any, amount: int = 1) -> int:
+        return self.store.incr(name, amount)
+
+    async def expire(self, name: Any, time: int) -> bool:
+        return self.store.expire(name, time)
+
+    async def ttl(self, name: Any) -> int:
+        return self.store.ttl(name)
+
+    async def exists(self, *names: Any) -> int:
+        return self.store.exists(*names)
+
+    async def delete(self, *names: Any) -> int:
+        return self.store.delete(*names)
+
+    async def hset(
+        self,
+        name: Any,
+        key: Any = None,
+        value: Any = None,
+        mapping: dict | None = None,
+    ) -> int:
+        fields = dict(mapping or {})
+        if key is not None:
+            fields[key] = value
+        return self.store.hset(name, fields)
+
+    async def hget(self, name: Any, key: Any) -> Any:
+        return self.decode(self.store.hget(name, key))
+
+    async def hgetall(self, name: Any) -> dict[Any, Any]:
+        return {
+            self.decode(field): self.decode(value)
+            for field, value in self.store.hgetall(name).items()
+        }
+
+    async def hdel(self, name: Any, *keys: Any) -> int:
+        return self.store.hdel(name, *keys)
+
+    async def scan_iter(
+        self, match: str | None = None, count: int | None = None
+    ) -> AsyncIterator[Any]:
+        for key in self.store.scan(match or "*"):
+            yield self.decode(key)
+
+    async def publish(self, channel: Any, message: Any) -> int:
+        return self.store.publish(channel, message)
+
+    def pubsub(self, **kwargs: Any) -> MemoryPubSub:
+        return MemoryPubSub(self)
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    async def script_load(self, script: str) -> str:
+        return hashlib.sha1(script.encode()).hexdigest()  # nosec B324 - EVALSHA id
+
+    async def script_flush(self) -> bool:
+        return True
+
+    def run_script(self, script: LocalScript, keys: list[Any], args: list[Any]) -> Any:
+        """Run a script's Python version. Like ARGV, every argument is a string."""
+        return self.decode(script(self.store, keys, [str(arg) for arg in args]))
+
+
+# One keyspace per process: RedisManager.close() and reopening keep the data,
+# as a server would.
+memory_store = MemoryStore()
@@ -1,22 +1,38 @@
 import time
+from datetime import UTC, datetime
 
-from fastapi import Request, Response
+from fastapi import HTTPException, Request, Response
 from fastapi.responses import JSONResponse
+from fastapi.security.utils import get_authorization_scheme_param
+from starlette.datastructures import Headers
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from app.database import count_queries
+from app.dependencies import open_db_session
 from app.logger import logger
+from app.redis_manager import redis_manager
+from app.services import auth as auth_services
 from app.settings import settings
 
 
 async def log_request_middleware(request: Request, call_next):
     start = time.time()
 
-    response: Response = await call_next(request)
+    with (
+        redis_manager.count_round_trips() as redis_trips,
+        count_queries() as queries,
+    ):
+        # Handlers can read the running totals too.
+        request.state.query_stats = queries
+        response: Response = await call_next(request)
     log_dict = {
         "url": request.url.path,
         "method": request.method,
         "status_code": response.status_code,
         "process_time": f"{(time.time() - start):.2f}s",
+        "redis_round_trips": redis_trips.count,
+        **queries.as_dict(),
     }
 
     logger.info(log_dict)
@@ -69,8 +85,9 @@ class AllowAuthorizedDocAccess(BaseHTTPMiddleware):
         "127.0.0.1",  # allows Viewing Docs in Local Development Environment
     ]
     # The interactive docs, ReDoc, and the raw OpenAPI schema all expose the
-    # API surface, so all three must be gated - not just "/docs".
-    protected_paths = ("/docs", "/redoc", "/openapi.json")
+    # API surface, so all three must be gated - not just "/docs". The
+    # per-worker metrics expose internals too and sit behind the same gate.
+    protected_paths = ("/docs", "/redoc", "/openapi.json", "/health/metrics")
 
     async def dispatch(
         self, request: Request, call_next: RequestResponseEndpoint
@@ -93,3 +110,56 @@ class AllowAuthorizedDocAccess(BaseHTTPMiddleware):
 
         response = await call_next(request)
         return response
+
+
+class AuthenticationMiddleware:
+    """
+    Pure-ASGI authentication for the paths in AUTH_MIDDLEWARE_PROTECTED_PATHS.
+    Validates the bearer token (signature, type, revocation, token version)
+    and stores the principal in scope["state"] before routing, so
+    get_current_principal skips its dependency chain and a bad token is
+    rejected before the body is read. Other paths fall through to the
+    Depends-based checks.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        protected_paths: list[str] = settings.AUTH_MIDDLEWARE_PROTECTED_PATHS,
+    ):
+        self.app = app
+        self.protected_paths = tuple(protected_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(
+            self.protected_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        scheme, token = get_authorization_scheme_param(
+            Headers(scope=scope).get("authorization")
+        )
+        try:
+            if not token or scheme.lower() != "bearer":
+                raise HTTPException(status_code=401, detail="Not authenticated")
+            email = await auth_services.authenticate_access_token(token)
+            async with open_db_session(scope["app"]) as db:
+                principal = await auth_services.get_principal(email, db)
+            if principal is None:
+                raise auth_services.credentials_exception()
+        except HTTPException as exc:
+            response = JSONResponse(
+                status_code=exc.status_code,
+                content={
+                    "detail": exc.detail,
+                    "path": scope["path"],
+                    "timestamp": datetime.now(UTC).isoformat(),
+                },
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["principal"] = principal
+        await self.app(scope, receive, send)
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, String, false
+from sqlalchemy import Boolean, Index, String, false, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models._base import AbstractBase
@@ -17,3 +17,10 @@ class User(AbstractBase):
     is_verified: Mapped[bool] = mapped_column(
         Boolean, default=False, server_default=false(), nullable=False
     )
+
+
+# Lookups match on lower(email) (see services.auth.email_matches); this
+# expression index keeps them index scans rather than sequential scans. It is
+# unique, so emails are unique regardless of case and signup can insert with
+# ON CONFLICT (lower(email)) DO NOTHING.
+Index("uq_users_email_lower", func.lower(User.email), unique=True)
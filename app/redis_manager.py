@@ -1,50 +1,667 @@
+import asyncio
+import hashlib
 import json
-from typing import Any, cast
+from contextlib import asynccontextmanager, contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, cast
 
 import redis.asyncio as redis
+from redis.asyncio.client import PubSub
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.sentinel import Sentinel, SentinelConnectionPool
+from redis.exceptions import NoScriptError
 
+from app.cache import TTLCache
+from app.logger import logger
+from app.memory_redis import LocalScript, MemoryPubSub, MemoryRedis, memory_store
+from app.serializers import Serializer, get_serializer
 from app.settings import settings
 
 
+@dataclass
+class RoundTripCounter:
+    count: int = 0
+    # Enclosing counter, so a test block still sees trips made inside a
+    # request that the logging middleware counts on its own.
+    parent: "RoundTripCounter | None" = None
+
+
+# The counter for the current request (or test block). A mutable object rather
+# than an int so tasks spawned by middleware, which get a copy of the context,
+# still add to the same total.
+_round_trips: ContextVar[RoundTripCounter | None] = ContextVar(
+    "redis_round_trips", default=None
+)
+
+
+# How long subscribe() blocks on each read before polling again; an explicit
+# read timeout keeps idle subscriptions clear of REDIS_SOCKET_TIMEOUT_SECONDS.
+PUBSUB_POLL_SECONDS = 1.0
+
+
+class ClientSideCache:
+    """
+    Process-local copies of Redis reads, kept coherent by server-assisted
+    invalidation: every pooled connection runs CLIENT TRACKING with its
+    invalidations redirected to one listener connection subscribed to
+    __redis__:invalidate, and each message drops the named keys here. Until that
+    subscription is up, and whenever it is lost, reads bypass the cache.
+    """
+
+    CHANNEL = "__redis__:invalidate"
+
+    def __init__(self, max_entries: int, ttl: float):
+        # Raw values, wrapped in 1-tuples so a cached missing key (None) still
+        # counts as a hit. Keys are bytes, as named in invalidation messages.
+        self.values: TTLCache[tuple[Any]] = TTLCache(max_entries=max_entries, ttl=ttl)
+        # CLIENT ID of the listener connection; None while it isn't subscribed.
+        self.redirect_id: int | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.redirect_id is not None
+
+    async def track(self, connection: Any) -> None:
+        """Connect callback: send this connection's invalidations to the listener."""
+        connection.tracking_redirect = self.redirect_id
+        if self.redirect_id is not None:
+            await connection.send_command(
+                "CLIENT", "TRACKING", "ON", "REDIRECT", self.redirect_id
+            )
+            await connection.read_response()
+
+    def listener_reconnected(self, connection: Any) -> None:
+        # PubSub reconnects on its own, but under a new CLIENT ID that no
+        # tracking connection redirects to: fail instead, so listen() starts over.
+        raise redis.ConnectionError("Client-side cache listener reconnected")
+
+    def invalidate(self, keys: list[bytes] | None) -> None:
+        if keys is None:  # FLUSHDB/FLUSHALL
+            self.values.clear()
+            return
+        for key in keys:
+            self.values.invalidate(key)
+
+    async def listen(self, client: redis.Redis) -> None:
+        """Apply invalidations until cancelled (started by RedisManager)."""
+        while True:
+            pubsub = client.pubsub()
+            try:
+                await pubsub.connect()
+                connection = cast(Any, pubsub.connection)
+                await connection.send_command("CLIENT", "ID")
+                redirect_id = int(await connection.read_response())
+                await pubsub.subscribe(self.CHANNEL)
+                connection.register_connect_callback(self.listener_reconnected)
+                self.redirect_id = redirect_id
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=PUBSUB_POLL_SECONDS
+                    )
+                    if message is not None:
+                        self.invalidate(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"Client-side cache listener failed, retrying: {exc}")
+                await asyncio.sleep(1)
+            finally:
+                # Invalidations may be missed from here on.
+                self.redirect_id = None
+                self.values.clear()
+                with suppress(Exception):
+                    await pubsub.aclose()
+
+
+def cache_key(key: str | bytes) -> bytes:
+    return key if isinstance(key, bytes) else key.encode()
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """A BlockingConnectionPool that counts what it does, for /health/metrics."""
+
+    # Set when client-side caching is on: connections are tracked for it.
+    client_cache: ClientSideCache | None = None
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.created = 0
+        self.wait_timeouts = 0
+
+    def make_connection(self):
+        self.created += 1
+        connection = super().make_connection()
+        if self.client_cache is not None:
+            connection.register_connect_callback(self.client_cache.track)
+        return connection
+
+    async def get_connection(self, *args: Any, **kwargs: Any):
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except redis.ConnectionError as exc:
+            if isinstance(exc.__cause__, TimeoutError):
+                self.wait_timeouts += 1
+            raise
+        cache = self.client_cache
+        redirect = getattr(connection, "tracking_redirect", None)
+        if cache is not None and redirect != cache.redirect_id:
+            # Connected before the current listener subscribed: reconnect so
+            # the connect callback tracks it for that listener.
+            try:
+                await connection.disconnect()
+                await connection.connect()
+            except BaseException:
+                await self.release(connection)
+                raise
+        return connection
+
+    def stats(self) -> dict[str, int]:
+        connections = [*self._available_connections, *self._in_use_connections]
+        return {
+            "max_connections": self.max_connections,
+            **connection_counts(connections),
+            "in_use": len(self._in_use_connections),
+            "created": self.created,
+            "wait_timeouts": self.wait_timeouts,
+        }
+
+
+class InstrumentedSentinelPool(SentinelConnectionPool, InstrumentedConnectionPool):
+    """The same blocking, counted pool, resolving the master through Sentinel."""
+
+
+def connection_counts(connections: list[Any]) -> dict[str, int]:
+    connected = sum(1 for connection in connections if connection.is_connected)
+    # Pooled but disconnected connections reconnect on their next use.
+    return {"open": connected, "closed": len(connections) - connected}
+
+
+def parse_nodes(nodes: list[str]) -> list[tuple[str, int]]:
+    addresses = []
+    for node in nodes:
+        host, _, port = node.rpartition(":")
+        addresses.append((host, int(port)))
+    return addresses
+
+
+RedisClient = redis.Redis | RedisCluster | MemoryRedis
+
+
+# Placeholder for a BatchResult whose batch hasn't been sent.
+_PENDING: Any = object()
+
+# A command for a RedisBatch, queued by calling it with the pipeline, and
+# the conversion of its reply.
+Command = Callable[[Any], Any]
+type Convert[T] = Callable[[Any], T]
+
+
+class BatchResult[T]:
+    """The reply to one command queued on a RedisBatch."""
+
+    def __init__(self, convert: Convert[T]):
+        self._convert = convert
+        self._value: Any = _PENDING
+
+    @property
+    def value(self) -> T:
+        if self._value is _PENDING:
+            raise RuntimeError("The batch this command belongs to hasn't been sent")
+        return self._value
+
+    def resolve(self, reply: Any) -> None:
+        self._value = self._convert(reply)
+
+
+class RedisBatch:
+    """
+    Commands queued inside `async with redis_manager.batch() as batch:`, sent
+    in one pipeline (one round trip) when the block exits; nothing is sent if
+    it raises. Each method returns a BatchResult, readable once sent.
+
+    Not a transaction: the commands run in order, but another client's may run
+    in between. In cluster mode, multi-key commands need keys sharing a slot,
+    and publishes follow the pipeline one by one.
+    """
+
+    def __init__(self, manager: "RedisManager"):
+        self._manager = manager
+        self._commands: list[tuple[Command, BatchResult]] = []
+        self._publishes: list[tuple[str, dict[str, Any], BatchResult[int]]] = []
+
+    def __len__(self) -> int:
+        return len(self._commands) + len(self._publishes)
+
+    def _queue[T](self, command: Command, convert: Convert[T]) -> BatchResult[T]:
+        result = BatchResult(convert)
+        self._commands.append((command, result))
+        return result
+
+    def set_flag(self, key: str | bytes, ttl: int) -> BatchResult[None]:
+        return self._queue(lambda pipe: pipe.set(key, b"", ex=ttl), lambda _: None)
+
+    def cache_json_item(
+        self, key: str, value: dict[str, Any], ttl: int = 3600
+    ) -> BatchResult[None]:
+        raw = self._manager.serializer.dumps(value)
+        return self._queue(lambda pipe: pipe.set(key, raw, ex=ttl), lambda _: None)
+
+    def increment(self, key: str) -> BatchResult[int]:
+        return self._queue(lambda pipe: pipe.incr(key), int)
+
+    def delete_keys(self, *keys: str | bytes) -> BatchResult[int]:
+        return self._queue(lambda pipe: pipe.delete(*keys), int)
+
+    def delete_hash_fields(self, key: str, *fields: str) -> BatchResult[int]:
+        return self._queue(lambda pipe: pipe.hdel(key, *fields), int)
+
+    def publish(self, channel: str, message: dict[str, Any]) -> BatchResult[int]:
+        if self._manager.is_clustered:
+            # A cluster pipeline refuses PUBLISH; RedisManager.publish sends it
+            # through a node client once the pipeline has run.
+            result = BatchResult(int)
+            self._publishes.append((channel, message, result))
+            return result
+        payload = json.dumps(message)
+        return self._queue(lambda pipe: pipe.publish(channel, payload), int)
+
+    async def send(self) -> None:
+        if self._commands:
+            self._manager._record_round_trip()
+            client = self._manager.redis_client
+            async with client.pipeline(transaction=False) as pipe:
+                for command, _ in self._commands:
+                    command(pipe)
+                replies = await pipe.execute()
+            for (_, result), reply in zip(self._commands, replies):
+                result.resolve(reply)
+            self._commands.clear()
+        publishes, self._publishes = self._publishes, []
+        for channel, message, result in publishes:
+            result.resolve(await self._manager.publish(channel, message))
+
+
+# The batch open in the current context, which nested batch() blocks join.
+_batch: ContextVar[RedisBatch | None] = ContextVar("redis_batch", default=None)
+
+
 class RedisManager:
     def __init__(self):
-        self.redis_client = redis.Redis(
+        self._client: RedisClient | None = None
+        # Cluster mode only: RedisCluster has no pub/sub, so subscriptions go
+        # through a plain client on one node (PUBLISH reaches every node).
+        self._pubsub_client: redis.Redis | None = None
+        # name -> (Lua source, SHA1), run with EVALSHA
+        self._scripts: dict[str, tuple[str, str]] = {}
+        # name -> Python version, run instead in REDIS_MODE=memory
+        self._local_scripts: dict[str, LocalScript] = {}
+        # Opt-in (REDIS_CLIENT_CACHE_ENABLED): see ClientSideCache.
+        self.client_cache: ClientSideCache | None = None
+        self._client_cache_client: redis.Redis | None = None
+        self._client_cache_listener: asyncio.Task | None = None
+        # Codec for cache_json_item / get_json_item values (REDIS_SERIALIZER).
+        self.serializer: Serializer = get_serializer(settings.REDIS_SERIALIZER)
+
+    def _connection_options(self, decode_responses: bool = True) -> dict[str, Any]:
+        return {
+            "socket_timeout": settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+            "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS,
+            "socket_keepalive": settings.REDIS_SOCKET_KEEPALIVE,
+            "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+            "decode_responses": decode_responses,
+        }
+
+    def open(self) -> RedisClient:
+        """Create the client and its connection pool(s) (from the app lifespan)."""
+        if self._client is None:
+            client = self._client = self._build_client()
+            # Settings reject the client cache in cluster and memory modes.
+            if settings.REDIS_CLIENT_CACHE_ENABLED and isinstance(client, redis.Redis):
+                self.client_cache = ClientSideCache(
+                    max_entries=settings.REDIS_CLIENT_CACHE_SIZE,
+                    ttl=settings.REDIS_CLIENT_CACHE_TTL_SECONDS,
+                )
+                pool = cast(InstrumentedConnectionPool, client.connection_pool)
+                pool.client_cache = self.client_cache
+        return self._client
+
+    def _build_client(self, decode_responses: bool = True) -> RedisClient:
+        options = self._connection_options(decode_responses)
+        if settings.REDIS_MODE == "cluster":
+            nodes = settings.REDIS_CLUSTER_NODES or [
+                f"{settings.REDIS_HOST}:{settings.REDIS_PORT}"
+            ]
+            startup_nodes = [ClusterNode(h, p) for h, p in parse_nodes(nodes)]
+            # One pool per shard, each capped at REDIS_MAX_CONNECTIONS.
+            return RedisCluster(
+                startup_nodes=startup_nodes,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                **options,
+            )
+        elif settings.REDIS_MODE == "sentinel":
+            sentinel = Sentinel(parse_nodes(settings.REDIS_SENTINELS), **options)
+            return sentinel.master_for(
+                settings.REDIS_SENTINEL_SERVICE,
+                connection_pool_class=InstrumentedSentinelPool,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+            )
+        elif settings.REDIS_MODE == "memory":
+            return MemoryRedis(memory_store, decode_responses=decode_responses)
+        pool = InstrumentedConnectionPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
-            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+            **options,
         )
+        return redis.Redis(connection_pool=pool)
+
+    async def start_client_cache(self) -> None:
+        """
+        Start the invalidation listener (from the app lifespan) and wait briefly
+        for it to subscribe. A no-op unless REDIS_CLIENT_CACHE_ENABLED.
+        """
+        self.open()
+        if self.client_cache is None or self._client_cache_listener is not None:
+            return
+        # Its own non-decoding client: invalidations name keys as raw bytes,
+        # which revocation keys can't be decoded from.
+        self._client_cache_client = cast(
+            redis.Redis, self._build_client(decode_responses=False)
+        )
+        self._client_cache_listener = asyncio.create_task(
+            self.client_cache.listen(self._client_cache_client)
+        )
+        for _ in range(50):
+            if self.client_cache.active:
+                break
+            await asyncio.sleep(0.02)
+
+    async def close(self) -> None:
+        """Disconnect every pooled connection; the next use opens a new pool."""
+        if self._client_cache_listener is not None:
+            self._client_cache_listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._client_cache_listener
+        if self._client_cache_client is not None:
+            await self._client_cache_client.aclose(close_connection_pool=True)
+        self.client_cache = None
+        self._client_cache_client = self._client_cache_listener = None
+        if isinstance(self._client, RedisCluster):
+            await self._client.aclose()
+        elif self._client is not None:
+            await self._client.aclose(close_connection_pool=True)
+        if self._pubsub_client is not None:
+            await self._pubsub_client.aclose()
+        self._client = self._pubsub_client = None
+
+    @property
+    def redis_client(self) -> RedisClient:
+        # Opened lazily too, for scripts and tests that run without the lifespan.
+        return self._client or self.open()
+
+    @property
+    def is_clustered(self) -> bool:
+        return settings.REDIS_MODE == "cluster"
+
+    def pubsub(self) -> PubSub | MemoryPubSub:
+        client = self.redis_client
+        if isinstance(client, RedisCluster):
+            return self._node_client(client).pubsub(ignore_subscribe_messages=True)
+        return client.pubsub(ignore_subscribe_messages=True)
+
+    def _node_client(self, cluster: RedisCluster) -> redis.Redis:
+        # A plain client on the default node, for pub/sub: the cluster client
+        # has none, and any node relays a PUBLISH to the whole cluster.
+        if self._pubsub_client is None:
+            node = cluster.get_default_node()
+            self._pubsub_client = redis.Redis(
+                host=node.host, port=int(node.port), **self._connection_options()
+            )
+        return self._pubsub_client
+
+    def pool_stats(self) -> dict[str, int]:
+        client = self._client
+        if client is None or isinstance(client, MemoryRedis):
+            return {}
+        if isinstance(client, RedisCluster):
+            nodes = client.get_nodes()
+            connections = [conn for node in nodes for conn in node._connections]
+            idle = sum(len(node._free) for node in nodes)
+            return {
+                "max_connections": sum(node.max_connections for node in nodes),
+                **connection_counts(connections),
+                "in_use": len(connections) - idle,
+            }
+        return cast(InstrumentedConnectionPool, client.connection_pool).stats()
+
+    def client_cache_stats(self) -> dict[str, float | int]:
+        return self.client_cache.values.stats.as_dict() if self.client_cache else {}
+
+    @contextmanager
+    def count_round_trips(self) -> Iterator[RoundTripCounter]:
+        """Count the Redis round trips made inside the block."""
+        counter = RoundTripCounter(parent=_round_trips.get())
+        reset_token = _round_trips.set(counter)
+        try:
+            yield counter
+        finally:
+            _round_trips.reset(reset_token)
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[RedisBatch]:
+        """
+        Queue commands and send them in one pipeline on exit (see RedisBatch).
+        A batch() inside another joins it: everything goes out with the
+        outermost block, so a helper can batch its own writes and still be
+        combined with its caller's.
+        """
+        active = _batch.get()
+        if active is not None:
+            yield active
+            return
+
+        batch = RedisBatch(self)
+        reset_token = _batch.set(batch)
+        try:
+            yield batch
+        finally:
+            _batch.reset(reset_token)
+        await batch.send()
+
+    def _record_round_trip(self) -> None:
+        counter = _round_trips.get()
+        while counter is not None:
+            counter.count += 1
+            counter = counter.parent
 
     async def cache_json_item(
         self, key: str, value: dict[str, Any], ttl: int = 3600
     ) -> None:
-        value_as_string = json.dumps(value)
-        await self.redis_client.set(name=key, value=value_as_string, ex=ttl)
+        await self.set_bytes(key, self.serializer.dumps(value), ttl=ttl)
+
+    async def set_bytes(self, key: str, raw: bytes, ttl: int) -> None:
+        """SET EX of an already-encoded value."""
+        self._record_round_trip()
+        await self.redis_client.set(name=key, value=raw, ex=ttl)
+
+    async def _cached_read(
+        self, keys: tuple[str | bytes, ...], fetch: Callable[[], Awaitable[list[Any]]]
+    ) -> list[Any]:
+        """Serve `keys` from the client-side cache when every one is cached."""
+        cache = self.client_cache
+        if cache is None or not cache.active:
+            self._record_round_trip()
+            return await fetch()
+
+        cache_keys = [cache_key(key) for key in keys]
+        hits = [cache.values.get(key) for key in cache_keys]
+        if all(hit is not None for hit in hits):
+            return [cast(tuple, hit)[0] for hit in hits]
+
+        # An invalidation landing while the read is in flight bumps the
+        # generation, so the then-stale value isn't stored.
+        generation = cache.values.generation
+        self._record_round_trip()
+        values = await fetch()
+        for key, value in zip(cache_keys, values):
+            cache.values.set(key, (value,), generation=generation)
+        return values
+
+    async def _get_raw(self, *keys: str | bytes) -> list[bytes | None]:
+        """
+        GET/MGET returning the stored bytes: reads skip decode_responses, so a
+        value is only decoded by callers that need text.
+        """
+
+        async def fetch() -> list[Any]:
+            if len(keys) == 1:
+                command: tuple[Any, ...] = ("GET", keys[0])
+            else:
+                command = ("MGET", *keys)
+            value = await self.redis_client.execute_command(
+                *command, keys=list(keys), NEVER_DECODE=True
+            )
+            return [value] if len(keys) == 1 else value
+
+        return await self._cached_read(keys, fetch)
 
     async def get_json_item(
         self, key: str, default: None = None
     ) -> dict[str, Any] | None:
-        value = await self.redis_client.get(name=key)
+        (value,) = await self._get_raw(key)
 
         if value is None:
             return default
 
-        value_decoded = json.loads(cast(str, value))
-        return value_decoded
+        return self.serializer.loads(value)
+
+    async def get_many(self, *keys: str | bytes, decode: bool = True) -> list[Any]:
+        """
+        Fetch several values in a single round trip (MGET). With decode=False
+        the raw bytes come back, for callers that only test presence or parse
+        a number.
+        """
+        values = await self._get_raw(*keys)
+        if not decode:
+            return values
+        return [value.decode() if value is not None else None for value in values]
+
+    async def set_flag(self, key: str | bytes, ttl: int) -> None:
+        """Store a valueless marker that only carries presence and expiry."""
+        self._record_round_trip()
+        await self.redis_client.set(name=key, value=b"", ex=ttl)
 
     async def delete_key(self, key: str) -> None:
+        self._record_round_trip()
         await self.redis_client.delete(key)
 
+    async def delete_keys(self, *keys: str | bytes) -> int:
+        # Cluster clients split a multi-key DEL by slot.
+        self._record_round_trip()
+        return await self.redis_client.delete(*keys)
+
     async def get_int(self, key: str) -> int:
-        value = await self.redis_client.get(name=key)
+        (value,) = await self._get_raw(key)
         return int(value) if value is not None else 0
 
     async def increment(self, key: str, ttl: int | None = None) -> int:
         # Atomic INCR. When ttl is given, the expiry is set on first increment
         # so the counter decays as a fixed window (used for failure lockouts).
+        self._record_round_trip()
         value = await self.redis_client.incr(key)
         if ttl is not None and value == 1:
+            self._record_round_trip()
             await self.redis_client.expire(key, ttl)
         return value
 
+    async def get_json_hash(self, key: str) -> dict[str, dict[str, Any]]:
+        """Every field of a hash whose values are JSON objects (HGETALL)."""
+        self._record_round_trip()
+        fields = await self.redis_client.hgetall(key)  # type: ignore[misc]
+        return {field: json.loads(value) for field, value in fields.items()}
+
+    async def delete_hash_fields(self, key: str, *fields: str) -> int:
+        self._record_round_trip()
+        return await self.redis_client.hdel(key, *fields)  # type: ignore[misc]
+
+    async def scan_keys(self, pattern: str) -> AsyncIterator[str]:
+        """Iterate keys matching `pattern` with SCAN (never KEYS): admin use only."""
+        self._record_round_trip()
+        async for key in self.redis_client.scan_iter(match=pattern, count=1000):
+            yield key
+
+    async def set_if_absent(self, key: str, ttl: int) -> bool:
+        """SET NX EX: True if the key was created, False if it already existed."""
+        self._record_round_trip()
+        return bool(await self.redis_client.set(name=key, value=1, ex=ttl, nx=True))
+
+    def register_script(
+        self, name: str, source: str, local: LocalScript | None = None
+    ) -> None:
+        """
+        Register a Lua script under `name`. Scripts run server-side in a single
+        round trip and atomically, so multi-step check-then-write flows can't
+        race each other. `local` is the same logic over a MemoryStore, for
+        REDIS_MODE=memory (see app.memory_redis).
+        """
+        sha = hashlib.sha1(source.encode()).hexdigest()  # nosec B324 - EVALSHA id
+        self._scripts[name] = (source, sha)
+        if local is not None:
+            self._local_scripts[name] = local
+
+    async def load_scripts(self) -> None:
+        """Preload every registered script (called from the app lifespan)."""
+        for source, _ in self._scripts.values():
+            await self.redis_client.script_load(source)
+
+    async def run_script(
+        self, name: str, keys: list[str], args: list[str | int]
+    ) -> Any:
+        source, sha = self._scripts[name]
+        self._record_round_trip()
+        client = self.redis_client
+        if isinstance(client, MemoryRedis):
+            if name not in self._local_scripts:
+                raise RuntimeError(f"Script {name!r} has no in-memory version")
+            return client.run_script(self._local_scripts[name], keys, args)
+        # Redis receives every ARGV as a string anyway.
+        keys_and_args = [*keys, *(str(arg) for arg in args)]
+        try:
+            return await cast(
+                Awaitable[Any], client.evalsha(sha, len(keys), *keys_and_args)
+            )
+        except NoScriptError:
+            # The server's script cache was flushed (restart, failover); EVAL
+            # runs the script and caches it again.
+            self._record_round_trip()
+            return await cast(
+                Awaitable[Any], client.eval(source, len(keys), *keys_and_args)
+            )
+
+    async def publish(self, channel: str, message: dict[str, Any]) -> int:
+        """Publish a JSON message; returns the number of subscribers reached."""
+        self._record_round_trip()
+        client = self.redis_client
+        if isinstance(client, RedisCluster):
+            client = self._node_client(client)
+        return cast(int, await client.publish(channel, json.dumps(message)))
+
+    async def subscribe(self, channel: str) -> AsyncIterator[dict[str, Any]]:
+        """Yield JSON messages published on `channel` until cancelled."""
+        pubsub = self.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=PUBSUB_POLL_SECONDS
+                )
+                if message is not None:
+                    yield json.loads(message["data"])
+        finally:
+            await pubsub.aclose()
+
 
 redis_manager = RedisManager()
@@ -6,9 +6,8 @@ from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import EmailStr, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.dependencies import get_current_user, get_db
+from app.dependencies import get_current_principal, get_db
 from app.limiter import limiter
-from app.models import User as UserDB
 from app.schemas import auth as auth_schemas
 from app.services import auth as auth_services
 
@@ -18,7 +17,10 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 # Declare Depends for better reusuabilty
 DBDep = Annotated[AsyncSession, Depends(get_db)]
 EmailBody = Annotated[EmailStr, Body(embed=True)]
-CurrentUserDep = Annotated[UserDB, Depends(get_current_user)]
+# A cached, read-only snapshot of the user; depend on get_current_user_row when
+# a route needs the live ORM row.
+CurrentUserDep = Annotated[auth_schemas.Principal, Depends(get_current_principal)]
+TokenDep = Annotated[str, Depends(auth_services.oauth2_scheme)]
 
 
 @router.post("/signup")
@@ -93,19 +95,31 @@ async def signin(
             status_code=422,
             detail=e.errors(),  # preserves Pydantic-style error format
         )
-    return await auth_services.signin_user(login_data, db)
+    # Shown in the session list so users can tell their devices apart.
+    device = request.headers.get("user-agent", "")[:256] or None
+    return await auth_services.signin_user(login_data, db, device)
 
 
 @router.post("/logout")
 async def logout(
     user: CurrentUserDep,
-    token: Annotated[str, Depends(auth_services.oauth2_scheme)],
+    token: TokenDep,
     payload: auth_schemas.LogoutData | None = None,
 ):
     refresh = payload.refresh_token if payload else None
     return await auth_services.logout(token, refresh, user.email)
 
 
+@router.get("/sessions", response_model=list[auth_schemas.SessionModel])
+async def list_sessions(user: CurrentUserDep, token: TokenDep):
+    return await auth_services.list_sessions(user.email, token)
+
+
+@router.delete("/sessions/{session_id}")
+async def revoke_session(user: CurrentUserDep, session_id: str):
+    return await auth_services.revoke_session(user.email, session_id)
+
+
 @router.post("/refresh_token")
 @limiter.limit("10/minute")
 async def get_refresh_token(
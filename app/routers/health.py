@@ -4,8 +4,11 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import database
+from app.cached import two_tier_caches
 from app.dependencies import get_db
 from app.redis_manager import redis_manager
+from app.services import auth as auth_services
 
 router = APIRouter(tags=["Health"])
 
@@ -29,3 +32,23 @@ async def health(db: Annotated[AsyncSession, Depends(get_db)]):
         raise HTTPException(status_code=503, detail=checks)
 
     return {"status": "ok", "checks": checks}
+
+
+@router.get("/health/metrics")
+async def metrics():
+    """In-process cache, connection pool and invalidation statistics for this worker."""
+    return {
+        "database_pool": database.pool_stats(),
+        "database_replica_pools": [
+            database.pool_stats(engine) for engine in database.replica_engines
+        ],
+        "redis_pool": redis_manager.pool_stats(),
+        "redis_client_cache": redis_manager.client_cache_stats(),
+        "token_version_cache": auth_services.token_version_cache.stats.as_dict(),
+        "principal_cache": auth_services.principal_cache.stats.as_dict(),
+        "verified_token_cache": auth_services.verified_token_cache.stats.as_dict(),
+        "invalidation_lag": auth_services.invalidation_lag.as_dict(),
+        "two_tier_caches": {
+            name: cache.stats() for name, cache in two_tier_caches.items()
+        },
+    }
@@ -4,7 +4,11 @@ from httpx import AsyncClient, Response
 from app.models import User as UserDB
 from app.redis_manager import redis_manager
 from app.schemas import auth as auth_schemas
-from app.services.auth import GENERIC_SIGNUP_MESSAGE
+from app.services.auth import (
+    GENERIC_SIGNUP_MESSAGE,
+    activation_code_key,
+    reset_code_key,
+)
 
 
 async def test_signup_succeeds(client: AsyncClient, signup_data: dict[str, str]):
@@ -65,7 +69,7 @@ async def test_signup_fails(
 
 async def test_activate_user(client: AsyncClient, user: UserDB):
     await redis_manager.cache_json_item(
-        f"activation-code-{user.email}", {"code": "000000"}
+        activation_code_key(user.email), {"code": "000000"}
     )
     response: Response = await client.post(
         "/v1/auth/activation", json={"code": "000000", "email": user.email}
@@ -77,7 +81,7 @@ async def test_activate_user(client: AsyncClient, user: UserDB):
 
 async def test_resend_activation_code(client: AsyncClient, user: UserDB):
     await redis_manager.cache_json_item(
-        f"activation-code-{user.email}", {"code": "000000"}
+        activation_code_key(user.email), {"code": "000000"}
     )
     response: Response = await client.post(
         "/v1/auth/resend_activation", json={"email": user.email}
@@ -98,7 +102,7 @@ async def test_initiate_password_reset(client: AsyncClient, signup_data: dict):
 
 async def test_reset_password(client: AsyncClient, user: UserDB):
     # Seed the value to be validated against
-    await redis_manager.cache_json_item(f"reset-code-{user.email}", {"code": "000000"})
+    await redis_manager.cache_json_item(reset_code_key(user.email), {"code": "000000"})
     data = {"new_password": "password", "email": user.email, "code": "000000"}
     response: Response = await client.post("/v1/auth/reset_password", json=data)
     assert response.status_code == 200
@@ -107,7 +111,7 @@ async def test_reset_password(client: AsyncClient, user: UserDB):
 
 async def test_reset_password_fails(client: AsyncClient, user: UserDB):
     # Seed the value to be validated against
-    await redis_manager.cache_json_item(f"reset-code-{user.email}", {"code": "0000"})
+    await redis_manager.cache_json_item(reset_code_key(user.email), {"code": "0000"})
     data = {"new_password": "password", "email": user.email, "code": "1111"}
     response: Response = await client.post("/v1/auth/reset_password", json=data)
     assert response.status_code == 400
@@ -209,7 +213,7 @@ async def test_password_reset_revokes_existing_sessions(
     header = {"Authorization": f"Bearer {access}"}
     assert (await client.get("/v1/auth/me", headers=header)).status_code == 200
 
-    await redis_manager.cache_json_item(f"reset-code-{user.email}", {"code": "000000"})
+    await redis_manager.cache_json_item(reset_code_key(user.email), {"code": "000000"})
     reset = await client.post(
         "/v1/auth/reset_password",
         json={"code": "000000", "email": user.email, "new_password": "brandnewpass"},
@@ -220,24 +224,63 @@ async def test_password_reset_revokes_existing_sessions(
     assert (await client.get("/v1/auth/me", headers=header)).status_code == 401
 
 
-async def test_logout_invalidates_all_user_tokens(client: AsyncClient, user: UserDB):
+async def test_logout_ends_only_the_current_session(client: AsyncClient, user: UserDB):
     login = {"username": user.email, "password": "password"}
-    first = (await client.post("/v1/auth/token", data=login)).json()["access_token"]
-    second = (await client.post("/v1/auth/token", data=login)).json()["access_token"]
-    assert first != second  # jti makes each issued token unique
-
-    header_second = {"Authorization": f"Bearer {second}"}
-    assert (await client.get("/v1/auth/me", headers=header_second)).status_code == 200
+    first = (await client.post("/v1/auth/token", data=login)).json()
+    second = (await client.post("/v1/auth/token", data=login)).json()
+    assert first["access_token"] != second["access_token"]
 
-    # Log out using the FIRST token; this bumps the user's token version.
     logout = await client.post(
-        "/v1/auth/logout", headers={"Authorization": f"Bearer {first}"}
+        "/v1/auth/logout",
+        headers={"Authorization": f"Bearer {first['access_token']}"},
     )
     assert logout.status_code == 200
 
-    # The SECOND token was never blacklisted, but the version bump invalidates
-    # every token issued before the logout - a global "log out everywhere".
-    assert (await client.get("/v1/auth/me", headers=header_second)).status_code == 401
+    # The first device's refresh token died with its session ...
+    refreshed = await client.post(
+        "/v1/auth/refresh_token", json={"refresh_token": first["refresh_token"]}
+    )
+    assert refreshed.status_code == 401
+    # ... while the second device is still signed in.
+    header_second = {"Authorization": f"Bearer {second['access_token']}"}
+    assert (await client.get("/v1/auth/me", headers=header_second)).status_code == 200
+    refreshed = await client.post(
+        "/v1/auth/refresh_token", json={"refresh_token": second["refresh_token"]}
+    )
+    assert refreshed.status_code == 200
+
+
+async def test_list_and_revoke_sessions(client: AsyncClient, user: UserDB):
+    login = {"username": user.email, "password": "password"}
+    phone = (
+        await client.post("/v1/auth/token", data=login, headers={"User-Agent": "phone"})
+    ).json()
+    laptop = (
+        await client.post(
+            "/v1/auth/token", data=login, headers={"User-Agent": "laptop"}
+        )
+    ).json()
+    header = {"Authorization": f"Bearer {laptop['access_token']}"}
+
+    sessions = (await client.get("/v1/auth/sessions", headers=header)).json()
+    assert {s["device"]: s["current"] for s in sessions} == {
+        "phone": False,
+        "laptop": True,
+    }
+
+    # Revoke the phone from the laptop.
+    phone_id = next(s["id"] for s in sessions if s["device"] == "phone")
+    response = await client.delete(f"/v1/auth/sessions/{phone_id}", headers=header)
+    assert response.status_code == 200
+    refreshed = await client.post(
+        "/v1/auth/refresh_token", json={"refresh_token": phone["refresh_token"]}
+    )
+    assert refreshed.status_code == 401
+
+    sessions = (await client.get("/v1/auth/sessions", headers=header)).json()
+    assert [s["device"] for s in sessions] == ["laptop"]
+    response = await client.delete(f"/v1/auth/sessions/{phone_id}", headers=header)
+    assert response.status_code == 404
 
 
 async def test_get_user_detail(
@@ -251,6 +294,138 @@ async def test_get_user_detail(
     assert "email" in response_data
 
 
+async def test_authenticated_route_costs_one_redis_round_trip(
+    client: AsyncClient, auth_header: dict[str, str]
+):
+    await client.get("/v1/auth/me", headers=auth_header)  # warm up
+    with redis_manager.count_round_trips() as trips:
+        response = await client.get("/v1/auth/me", headers=auth_header)
+    assert response.status_code == 200
+    assert trips.count == 1
+
+
+async def test_activation_redis_round_trips(client: AsyncClient, user: UserDB):
+    await redis_manager.load_scripts()
+    await redis_manager.cache_json_item(
+        activation_code_key(user.email), {"code": "000000"}
+    )
+    with redis_manager.count_round_trips() as trips:
+        response = await client.post(
+            "/v1/auth/activation", json={"code": "999999", "email": user.email}
+        )
+    assert response.status_code == 400
+    assert trips.count == 1  # the consume_code script
+
+    with redis_manager.count_round_trips() as trips:
+        response = await client.post(
+            "/v1/auth/activation", json={"code": "000000", "email": user.email}
+        )
+    assert response.status_code == 200
+    assert trips.count == 2  # consume_code + principal invalidation
+
+
+async def test_reset_password_redis_round_trips(client: AsyncClient, user: UserDB):
+    await redis_manager.load_scripts()
+    await redis_manager.cache_json_item(reset_code_key(user.email), {"code": "000000"})
+    with redis_manager.count_round_trips() as trips:
+        response = await client.post(
+            "/v1/auth/reset_password",
+            json={"code": "000000", "email": user.email, "new_password": "newpass1"},
+        )
+    assert response.status_code == 200
+    # consume_code, then one pipeline: the principal broadcast, the version
+    # bump, dropping the session registry and its broadcast
+    assert trips.count == 2
+
+
+async def test_logout_redis_round_trips(client: AsyncClient, user: UserDB):
+    login = {"username": user.email, "password": "password"}
+    tokens = (await client.post("/v1/auth/token", data=login)).json()
+    with redis_manager.count_round_trips() as trips:
+        response = await client.post(
+            "/v1/auth/logout",
+            headers={"Authorization": f"Bearer {tokens['access_token']}"},
+            json={"refresh_token": tokens["refresh_token"]},
+        )
+    assert response.status_code == 200
+    # The revocation check, then one pipeline: both revocations and ending
+    # the session
+    assert trips.count == 2
+
+
+async def test_password_change_redis_round_trips(
+    client: AsyncClient, auth_header: dict[str, str]
+):
+    with redis_manager.count_round_trips() as trips:
+        response = await client.patch(
+            "/v1/auth/me",
+            json={"old_password": "password", "new_password": "new_password"},
+            headers=auth_header,
+        )
+    assert response.status_code == 202
+    # The revocation check, then one pipeline for both invalidations
+    assert trips.count == 2
+
+
+async def test_resend_activation_redis_round_trips(client: AsyncClient, user: UserDB):
+    with redis_manager.count_round_trips() as trips:
+        await client.post("/v1/auth/resend_activation", json={"email": user.email})
+    assert trips.count == 2  # cooldown SET NX + storing the new code
+
+    with redis_manager.count_round_trips() as trips:
+        await client.post("/v1/auth/resend_activation", json={"email": user.email})
+    assert trips.count == 1  # cooldown only
+
+
+async def test_signup_queries(
+    client: AsyncClient, user: UserDB, signup_data: dict[str, str], query_budget
+):
+    with query_budget(1) as queries:  # INSERT ... ON CONFLICT DO NOTHING RETURNING
+        response = await client.post("/v1/auth/signup", json=signup_data)
+    assert response.status_code == 200
+    assert queries.statements[0].startswith("INSERT")
+
+    # An email taken in another case costs the same and creates nothing.
+    with query_budget(1):
+        response = await client.post(
+            "/v1/auth/signup",
+            json={"email": user.email.upper(), "password": "password123"},
+        )
+    assert response.status_code == 200
+
+
+async def test_activation_queries(client: AsyncClient, user: UserDB, query_budget):
+    await redis_manager.cache_json_item(
+        activation_code_key(user.email), {"code": "000000"}
+    )
+    with query_budget(1) as queries:  # UPDATE ... RETURNING
+        response = await client.post(
+            "/v1/auth/activation", json={"code": "000000", "email": user.email}
+        )
+    assert response.status_code == 200
+    assert queries.statements[0].startswith("UPDATE")
+
+
+async def test_reset_password_queries(client: AsyncClient, user: UserDB, query_budget):
+    await redis_manager.cache_json_item(reset_code_key(user.email), {"code": "000000"})
+    with query_budget(1) as queries:  # UPDATE ... RETURNING
+        response = await client.post(
+            "/v1/auth/reset_password",
+            json={"code": "000000", "email": user.email, "new_password": "newpass1"},
+        )
+    assert response.status_code == 200
+    assert queries.statements[0].startswith("UPDATE")
+
+
+async def test_authenticated_route_queries(
+    client: AsyncClient, auth_header: dict[str, str], query_budget
+):
+    await client.get("/v1/auth/me", headers=auth_header)  # caches the principal
+    with query_budget(0):
+        response = await client.get("/v1/auth/me", headers=auth_header)
+    assert response.status_code == 200
+
+
 @pytest.mark.parametrize(
     "update_data,status_code,error_message",
     [
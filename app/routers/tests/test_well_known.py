@@ -0,0 +1,8 @@
+from httpx import AsyncClient
+
+
+async def test_jwks_is_public_and_cacheable(client: AsyncClient):
+    response = await client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert "keys" in response.json()
+    assert response.headers["cache-control"].startswith("public, max-age=")
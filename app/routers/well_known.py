@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+
+from app.settings import settings
+from app.signing_keys import key_ring
+
+router = APIRouter(prefix="/.well-known", tags=["Keys"])
+
+
+@router.get("/jwks.json")
+async def jwks(response: Response):
+    """Public keys for verifying our tokens locally (RFC 7517 key set)."""
+    # Cacheable, but briefly: a rotated-in key must reach verifiers before
+    # JWT_SIGNING_KEY_ID switches to it.
+    response.headers[
+        "Cache-Control"
+    ] = f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}"
+    return key_ring.jwks()
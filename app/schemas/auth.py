@@ -2,7 +2,14 @@ from datetime import datetime
 from typing import Annotated
 from uuid import UUID
 
-from pydantic import AfterValidator, BaseModel, EmailStr, Field, model_validator
+from pydantic import (
+    AfterValidator,
+    BaseModel,
+    ConfigDict,
+    EmailStr,
+    Field,
+    model_validator,
+)
 
 
 class Token(BaseModel):
@@ -26,6 +33,15 @@ class LogoutData(BaseModel):
     refresh_token: Annotated[str, Field(min_length=32)] | None = None
 
 
+class SessionModel(BaseModel):
+    # A signed-in device: one refresh-token family, rotated on every refresh.
+    id: str
+    device: str | None = None
+    created_at: datetime
+    last_used_at: datetime
+    current: bool = False
+
+
 class UserSignUpData(BaseModel):
     password: Annotated[str, Field(min_length=8, max_length=50)]
     email: Annotated[EmailStr, Field(max_length=254), AfterValidator(str.lower)]
@@ -56,6 +72,12 @@ class UserModel(BaseModel):
     date_updated: datetime
 
 
+class Principal(UserModel):
+    # The authenticated user as cached by get_current_user: a detached, frozen
+    # snapshot with no password hash and no ORM session attached.
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+
 class UpdateUserModel(BaseModel):
     old_password: Annotated[str | None, Field(min_length=8, max_length=50)] = None
     new_password: Annotated[str | None, Field(min_length=8, max_length=50)] = None
@@ -1,22 +1,32 @@
+import asyncio
+import hashlib
+import json
 import secrets
+import time
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from typing import Literal, cast
 
-import bcrypt
-import jwt
 from fastapi import BackgroundTasks, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic.networks import EmailStr
-from sqlalchemy import func, select, update
+from sqlalchemy import func, lambda_stmt, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 
+from app import database
+from app.cache import TTLCache
+from app.hashing import check_password, hash_password, needs_rehash, password_hasher
 from app.logger import logger
 from app.mailer import send_mail
+from app.memory_redis import MemoryStore
 from app.models import User as UserDB
 from app.redis_manager import redis_manager
 from app.schemas import auth as auth_schema
 from app.settings import settings
+from app.signing_keys import key_ring
 
 JWT_SECRET = settings.JWT_SECRET
 JWT_ALGORITHM = settings.JWT_ALGORITHM
@@ -38,77 +48,520 @@ CODE_EMAIL_COOLDOWN_SECONDS = 60
 GENERIC_SIGNUP_MESSAGE = "Please check your email to activate your account."
 VERIFICATION_CODE_LENGTH = settings.VERIFICATION_CODE_LENGTH
 
+REVOKED_TOKEN_PREFIX = b"rv:"
+
+# Every worker subscribes to this channel (see listen_for_invalidations) to drop
+# its in-process copies of per-user state the moment another worker changes it.
+INVALIDATION_CHANNEL = "auth-invalidations"
+
+# Token versions only change in invalidate_all_sessions, so each worker keeps a
+# small LRU of them. Pub/sub invalidation keeps it fresh; the TTL bounds how
+# long a lost message can leave a worker with a stale version.
+token_version_cache: TTLCache[int] = TTLCache(
+    max_entries=settings.TOKEN_VERSION_CACHE_SIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS,
+)
+
+# Authenticated principals by (lower-cased) email. Invalidated explicitly on
+# every user write and across workers through INVALIDATION_CHANNEL.
+principal_cache: TTLCache[auth_schema.Principal] = TTLCache(
+    max_entries=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+
+# Verified access-token payloads by token digest, each kept until its own exp,
+# so a token reused across requests is HMAC-checked and parsed only once.
+# Revocation and version checks still run on every request.
+verified_token_cache: TTLCache[dict] = TTLCache(
+    max_entries=settings.VERIFIED_TOKEN_CACHE_SIZE
+)
+
+
+@dataclass
+class InvalidationLag:
+    """Publish-to-receive delay of invalidation messages, in milliseconds."""
+
+    received: int = 0
+    last_ms: float = 0.0
+    max_ms: float = 0.0
+    total_ms: float = 0.0
+
+    def record(self, sent_at: float) -> None:
+        lag_ms = max(0.0, (time.time() - sent_at) * 1000)
+        self.received += 1
+        self.last_ms = lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+        self.total_ms += lag_ms
+
+    def as_dict(self) -> dict[str, float | int]:
+        avg_ms = self.total_ms / self.received if self.received else 0.0
+        return {
+            "received": self.received,
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "avg_ms": round(avg_ms, 3),
+        }
+
+
+invalidation_lag = InvalidationLag()
+
 
 # --- Redis key builders (single source of truth for key formats) ------------
+# Every per-user key carries the user's `{email}` hash tag, so in cluster mode a
+# user's keys share one slot and multi-key commands/scripts stay on one node.
+def user_tag(email: str) -> str:
+    # Lower-cased, like the lower(email) user lookups: one user, one slot.
+    return "{" + email.lower() + "}"
+
+
 def token_version_key(email: str) -> str:
-    return f"token-version-{email}"
+    return f"token-version-{user_tag(email)}"
 
 
 def activation_code_key(email: str) -> str:
-    return f"activation-code-{email}"
+    return f"activation-code-{user_tag(email)}"
 
 
 def reset_code_key(email: str) -> str:
-    return f"reset-code-{email}"
+    return f"reset-code-{user_tag(email)}"
 
 
 def failed_attempts_key(scope: str, email: str) -> str:
-    return f"failed-{scope}-{email}"
+    return f"failed-{scope}-{user_tag(email)}"
 
 
 def email_cooldown_key(scope: str, email: str) -> str:
-    return f"cooldown-{scope}-{email}"
+    return f"cooldown-{scope}-{user_tag(email)}"
+
+
+def sessions_key(email: str) -> str:
+    return f"sessions-{user_tag(email)}"
+
+
+def revoked_token_key(jti: str, email: str) -> bytes:
+    # The 32-char hex jti packed into its 16 raw bytes, behind the owner's tag:
+    # the size of the entry doesn't grow with the JWT.
+    return REVOKED_TOKEN_PREFIX + user_tag(email).encode() + bytes.fromhex(jti)
+
+
+def revocation_keys(token: str, payload: dict) -> list[str | bytes]:
+    """Keys whose presence marks the token as revoked."""
+    keys: list[str | bytes] = []
+    jti, email = payload.get("jti"), payload.get("sub")
+    if isinstance(jti, str) and isinstance(email, str):
+        keys.append(revoked_token_key(jti, email))
+    # Tokens blacklisted before revocation moved to tagged jti keys were stored
+    # under the untagged jti or, earlier, the full encoded JWT; honour those until
+    # they have all expired. They hash to other slots, so never in cluster mode.
+    if not redis_manager.is_clustered and (
+        settings.REVOCATION_CHECK_LEGACY_KEYS or not keys
+    ):
+        if isinstance(jti, str):
+            keys.append(REVOKED_TOKEN_PREFIX + bytes.fromhex(jti))
+        keys.append(token)
+    return keys
 
 
 async def email_cooldown_active(scope: str, email: str) -> bool:
     """
     Rate-limit code emails per account: True if one was sent within the last
     CODE_EMAIL_COOLDOWN_SECONDS (and the caller should skip sending another).
+    Check and arm happen in one SET NX, so concurrent requests can't both send.
     """
     key = email_cooldown_key(scope, email)
-    if await redis_manager.get_int(key):
-        return True
-    await redis_manager.increment(key, ttl=CODE_EMAIL_COOLDOWN_SECONDS)
-    return False
+    return not await redis_manager.set_if_absent(key, ttl=CODE_EMAIL_COOLDOWN_SECONDS)
+
+
+async def get_token_version(email: str) -> int:
+    version = token_version_cache.get(email)
+    if version is None:
+        generation = token_version_cache.generation
+        version = await redis_manager.get_int(token_version_key(email))
+        token_version_cache.set(email, version, generation=generation)
+    return version
+
+
+async def is_token_revoked(token: str, payload: dict) -> bool:
+    values = await redis_manager.get_many(
+        *revocation_keys(token, payload), decode=False
+    )
+    return any(value is not None for value in values)
+
+
+async def get_token_state(token: str, payload: dict) -> tuple[bool, int]:
+    """
+    Return (revoked, token version) for a decoded access token in a single
+    round trip: the version comes from the local cache when it can.
+    """
+    email = payload["sub"]
+    keys = revocation_keys(token, payload)
+    version = token_version_cache.get(email)
+    if version is not None:
+        values = await redis_manager.get_many(*keys, decode=False)
+        return any(value is not None for value in values), version
+
+    generation = token_version_cache.generation
+    *values, raw_version = await redis_manager.get_many(
+        *keys, token_version_key(email), decode=False
+    )
+    version = int(raw_version or 0)
+    token_version_cache.set(email, version, generation=generation)
+    return any(value is not None for value in values), version
 
 
 async def invalidate_all_sessions(email: str) -> None:
     """Bump the user's token version so every existing token is rejected."""
-    await redis_manager.increment(token_version_key(email))
+    token_version_cache.invalidate(email)
+    async with redis_manager.batch() as batch:
+        batch.increment(token_version_key(email))
+        batch.delete_keys(sessions_key(email))
+        batch.publish(
+            INVALIDATION_CHANNEL,
+            {"kind": "token-version", "email": email, "sent_at": time.time()},
+        )
+
+
+async def invalidate_principal(email: str) -> None:
+    """
+    Drop the cached principal in this and every other worker, which also read
+    the user from the primary database for a while (read-your-writes).
+    """
+    principal_cache.invalidate(email.lower())
+    database.mark_written(email.lower())
+    async with redis_manager.batch() as batch:
+        batch.publish(
+            INVALIDATION_CHANNEL,
+            {"kind": "principal", "email": email.lower(), "sent_at": time.time()},
+        )
 
 
-async def guard_code_attempts(scope: str, email: str) -> str:
+def handle_invalidation(message: dict) -> None:
+    if message.get("kind") == "token-version":
+        token_version_cache.invalidate(message.get("email"))
+    elif message.get("kind") == "principal":
+        principal_cache.invalidate(message.get("email"))
+        database.mark_written(message.get("email", ""))
+    if "sent_at" in message:
+        invalidation_lag.record(message["sent_at"])
+
+
+async def listen_for_invalidations() -> None:
+    """
+    Apply invalidations published by any worker. Runs for the app's lifetime
+    (started from the lifespan); on a dropped connection it flushes the local
+    caches, since messages may have been missed, and resubscribes.
+    """
+    while True:
+        try:
+            async for message in redis_manager.subscribe(INVALIDATION_CHANNEL):
+                handle_invalidation(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Invalidation listener failed, resubscribing: {exc}")
+            token_version_cache.clear()
+            principal_cache.clear()
+            await asyncio.sleep(1)
+
+
+# Check the failure counter, compare the submitted code, then either consume the
+# code (clearing the counter) or count the failure - atomically and in a single
+# round trip, so two concurrent submissions can't both redeem one code.
+#   KEYS: code key, failed-attempts key
+#   ARGV: submitted code, MAX_CODE_ATTEMPTS, CODE_LOCKOUT_SECONDS
+CONSUME_CODE_SCRIPT = """
+local attempts = tonumber(redis.call("GET", KEYS[2]) or "0")
+if attempts >= tonumber(ARGV[2]) then
+    return -1
+end
+local stored = redis.call("GET", KEYS[1])
+if stored then
+    -- "{" opens JSON text (json/orjson); anything else is msgpack.
+    if string.byte(stored, 1) == 123 then
+        stored = cjson.decode(stored)
+    else
+        stored = cmsgpack.unpack(stored)
+    end
+end
+if stored and stored["code"] == ARGV[1] then
+    redis.call("DEL", KEYS[1], KEYS[2])
+    return 1
+end
+if redis.call("INCR", KEYS[2]) == 1 then
+    redis.call("EXPIRE", KEYS[2], ARGV[3])
+end
+return 0
+"""
+CODE_LOCKED_OUT, CODE_INVALID, CODE_CONSUMED = -1, 0, 1
+
+
+def consume_code_locally(store: MemoryStore, keys: list, args: list) -> int:
+    code_key, attempts_key = keys
+    code, max_attempts, lockout_seconds = args
+    if int(store.get(attempts_key) or 0) >= int(max_attempts):
+        return CODE_LOCKED_OUT
+    stored = store.get(code_key)
+    if stored is not None and redis_manager.serializer.loads(stored)["code"] == code:
+        store.delete(code_key, attempts_key)
+        return CODE_CONSUMED
+    if store.incr(attempts_key) == 1:
+        store.expire(attempts_key, int(lockout_seconds))
+    return CODE_INVALID
+
+
+redis_manager.register_script(
+    "consume_code", CONSUME_CODE_SCRIPT, local=consume_code_locally
+)
+
+
+async def consume_code(
+    scope: Literal["activation", "reset"], email: str, code: str
+) -> bool:
     """
-    Throttle brute-forcing of the 6-digit codes: after MAX_CODE_ATTEMPTS wrong
-    submissions for (scope, email), lock the account out for CODE_LOCKOUT_SECONDS.
-    Returns the counter key so the caller can register a failure or clear it.
+    Redeem a one-time code. Throttles brute-forcing of the codes: after
+    MAX_CODE_ATTEMPTS wrong submissions for (scope, email) the account is locked
+    out for CODE_LOCKOUT_SECONDS. Returns False for a wrong or expired code.
     """
-    key = failed_attempts_key(scope, email)
-    if await redis_manager.get_int(key) >= MAX_CODE_ATTEMPTS:
+    code_key = (
+        activation_code_key(email) if scope == "activation" else reset_code_key(email)
+    )
+    result = await redis_manager.run_script(
+        "consume_code",
+        keys=[code_key, failed_attempts_key(scope, email)],
+        args=[code, MAX_CODE_ATTEMPTS, CODE_LOCKOUT_SECONDS],
+    )
+    if result == CODE_LOCKED_OUT:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Too many attempts. Please try again later.",
         )
-    return key
+    return result == CODE_CONSUMED
+
+
+# Sessions: each sign-in opens a refresh-token family, stored as one field of a
+# per-user hash (family id -> JSON with the family's current refresh jti). A
+# refresh must present that jti; rotation swaps it atomically, so a replayed
+# (already rotated) token is detected and ends just that device's session.
+SESSION_MISSING, SESSION_REUSED, SESSION_ROTATED = -1, 0, 1
+#   KEYS: sessions hash
+#   ARGV: family id, family JSON, ttl
+OPEN_SESSION_SCRIPT = """
+redis.call("HSET", KEYS[1], ARGV[1], ARGV[2])
+if redis.call("TTL", KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call("EXPIRE", KEYS[1], ARGV[3])
+end
+return 1
+"""
+#   KEYS: sessions hash
+#   ARGV: family id, presented jti, new jti, now, ttl
+ROTATE_SESSION_SCRIPT = """
+local raw = redis.call("HGET", KEYS[1], ARGV[1])
+if not raw then
+    return -1
+end
+local family = cjson.decode(raw)
+if family["jti"] ~= ARGV[2] then
+    redis.call("HDEL", KEYS[1], ARGV[1])
+    return 0
+end
+family["jti"] = ARGV[3]
+family["last_used_at"] = tonumber(ARGV[4])
+family["expires_at"] = tonumber(ARGV[4]) + tonumber(ARGV[5])
+redis.call("HSET", KEYS[1], ARGV[1], cjson.encode(family))
+if redis.call("TTL", KEYS[1]) < tonumber(ARGV[5]) then
+    redis.call("EXPIRE", KEYS[1], ARGV[5])
+end
+return 1
+"""
+
+
+def extend_ttl_locally(store: MemoryStore, key: str, ttl: int) -> None:
+    if store.ttl(key) < ttl:
+        store.expire(key, ttl)
+
+
+def open_session_locally(store: MemoryStore, keys: list, args: list) -> int:
+    family_id, family, ttl = args
+    store.hset(keys[0], {family_id: family})
+    extend_ttl_locally(store, keys[0], int(ttl))
+    return 1
+
+
+def rotate_session_locally(store: MemoryStore, keys: list, args: list) -> int:
+    family_id, jti, new_jti, now, ttl = args
+    raw = store.hget(keys[0], family_id)
+    if raw is None:
+        return SESSION_MISSING
+    family = json.loads(raw)
+    if family["jti"] != jti:
+        store.hdel(keys[0], family_id)
+        return SESSION_REUSED
+    family.update(jti=new_jti, last_used_at=int(now), expires_at=int(now) + int(ttl))
+    store.hset(keys[0], {family_id: json.dumps(family)})
+    extend_ttl_locally(store, keys[0], int(ttl))
+    return SESSION_ROTATED
+
+
+redis_manager.register_script(
+    "open_session", OPEN_SESSION_SCRIPT, local=open_session_locally
+)
+redis_manager.register_script(
+    "rotate_session", ROTATE_SESSION_SCRIPT, local=rotate_session_locally
+)
+
+
+async def open_session(email: str, refresh_jti: str, device: str | None) -> str:
+    """Register a new refresh-token family and return its id."""
+    family_id = secrets.token_hex(16)
+    now = int(time.time())
+    ttl = int(REFRESH_TOKEN_LIFESPAN.total_seconds())
+    family = {
+        "jti": refresh_jti,
+        "device": device,
+        "created_at": now,
+        "last_used_at": now,
+        "expires_at": now + ttl,
+    }
+    await redis_manager.run_script(
+        "open_session",
+        keys=[sessions_key(email)],
+        args=[family_id, json.dumps(family), ttl],
+    )
+    return family_id
+
+
+async def rotate_session(email: str, family_id: str, jti: str, new_jti: str) -> int:
+    return await redis_manager.run_script(
+        "rotate_session",
+        keys=[sessions_key(email)],
+        args=[
+            family_id,
+            jti,
+            new_jti,
+            int(time.time()),
+            int(REFRESH_TOKEN_LIFESPAN.total_seconds()),
+        ],
+    )
 
 
-def verify_password(plain_password: str, hashed_password: str):
-    return bcrypt.checkpw(
-        bytes(plain_password, encoding="utf-8"),
-        bytes(hashed_password, encoding="utf-8"),
-    )
+async def list_sessions(
+    email: str, access_token: str | None = None
+) -> list[auth_schema.SessionModel]:
+    families = await redis_manager.get_json_hash(sessions_key(email))
+    current = decode_access_token(access_token).get("fid") if access_token else None
+    now = time.time()
+    expired = [fid for fid, family in families.items() if family["expires_at"] <= now]
+    if expired:
+        await redis_manager.delete_hash_fields(sessions_key(email), *expired)
+
+    sessions = [
+        auth_schema.SessionModel(
+            id=fid,
+            device=family.get("device"),
+            created_at=datetime.fromtimestamp(family["created_at"], UTC),
+            last_used_at=datetime.fromtimestamp(family["last_used_at"], UTC),
+            current=fid == current,
+        )
+        for fid, family in families.items()
+        if fid not in expired
+    ]
+    return sorted(sessions, key=lambda s: s.last_used_at, reverse=True)
+
+
+async def revoke_session(email: str, session_id: str):
+    """
+    End one device's session: its refresh token stops working at once. Access
+    tokens it already holds stay valid until they expire (ACCESS_TOKEN_LIFESPAN).
+    """
+    if not await redis_manager.delete_hash_fields(sessions_key(email), session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"detail": "Session Revoked"}
+
+
+# Moves a key written before keys were hash-tagged to its tagged name, keeping
+# the higher token version / merging session families, then drops the old key.
+#   KEYS: untagged key, tagged key
+MIGRATE_KEY_SCRIPT = """
+local kind = redis.call("TYPE", KEYS[1])["ok"]
+if kind == "string" then
+    local current = tonumber(redis.call("GET", KEYS[2]) or "0")
+    local old = tonumber(redis.call("GET", KEYS[1]))
+    if old > current then
+        redis.call("SET", KEYS[2], old)
+    end
+elseif kind == "hash" then
+    local fields = redis.call("HGETALL", KEYS[1])
+    for i = 1, #fields, 2 do
+        redis.call("HSETNX", KEYS[2], fields[i], fields[i + 1])
+    end
+    local ttl = redis.call("TTL", KEYS[1])
+    if ttl > redis.call("TTL", KEYS[2]) then
+        redis.call("EXPIRE", KEYS[2], ttl)
+    end
+end
+redis.call("DEL", KEYS[1])
+return kind
+"""
+
+
+def migrate_key_locally(store: MemoryStore, keys: list, args: list) -> str:
+    old_key, new_key = keys
+    kind = store.type(old_key)
+    if kind == "string":
+        old = int(store.get(old_key) or 0)
+        if old > int(store.get(new_key) or 0):
+            store.set(new_key, old)
+    elif kind == "hash":
+        for field, value in store.hgetall(old_key).items():
+            store.hsetnx(new_key, field, value)
+        ttl = store.ttl(old_key)
+        if ttl > store.ttl(new_key):
+            store.expire(new_key, ttl)
+    store.delete(old_key)
+    return kind
+
+
+redis_manager.register_script(
+    "migrate_key", MIGRATE_KEY_SCRIPT, local=migrate_key_locally
+)
+
+# Long-lived per-user keys that must survive the move to tagged key names.
+# Codes, attempt counters and cooldowns expire within the hour and are left be.
+UNTAGGED_KEY_BUILDERS = {
+    "token-version-": token_version_key,
+    "sessions-": sessions_key,
+}
+
+
+async def migrate_untagged_keys() -> int:
+    """
+    One-off for standalone/sentinel deployments upgrading to hash-tagged keys
+    (`make migrate-redis-keys`): run it before the new code serves traffic, or a
+    bumped token version would read as 0. Returns the number of keys moved.
+    """
+    moved = 0
+    for prefix, key_builder in UNTAGGED_KEY_BUILDERS.items():
+        async for key in redis_manager.scan_keys(f"{prefix}*"):
+            if "{" in key:
+                continue
+            email = key.removeprefix(prefix)
+            await redis_manager.run_script(
+                "migrate_key", keys=[key, key_builder(email)], args=[]
+            )
+            moved += 1
+    return moved
 
 
-def get_password_hash(password: str):
-    return bcrypt.hashpw(
-        bytes(password, encoding="utf-8"),
-        bcrypt.gensalt(),
-    ).decode()
+# Synchronous bcrypt primitives, for scripts and fixtures. Request paths must
+# go through `password_hasher` so hashing never blocks the event loop.
+verify_password = check_password
+get_password_hash = hash_password
 
 
 # A real hash to verify against when the account doesn't exist, so a missing
 # user costs the same bcrypt work as a wrong password - defeating timing-based
-# user enumeration on the login endpoint.
+# user enumeration on the login endpoint. Hashed at BCRYPT_ROUNDS so it keeps
+# matching the cost of real hashes when that setting changes.
 _DUMMY_PASSWORD_HASH = get_password_hash(secrets.token_urlsafe(32))
 
 
@@ -118,30 +571,143 @@ def generate_random_code(n: int = 4) -> str:
     return "".join(secrets.choice("0123456789") for _ in range(n))
 
 
+def email_matches(email: str):
+    # Always compare on lower(email) so lookups and keyed UPDATEs hit the
+    # uq_users_email_lower expression index.
+    return func.lower(UserDB.email) == email.lower()
+
+
+# The hot users statements are lambda statements: SQLAlchemy caches each one by
+# its code location, so a call neither rebuilds the construct nor walks it for
+# the compiled-SQL cache key. Closure variables become bound parameters, so
+# they must be plain values (lower-case the email before, not inside).
+def user_by_email(email: str) -> StatementLambdaElement:
+    email = email.lower()
+    return lambda_stmt(lambda: select(UserDB).where(func.lower(UserDB.email) == email))
+
+
+def set_password_hash(email: str, password_hash: str) -> StatementLambdaElement:
+    email = email.lower()
+    return lambda_stmt(
+        lambda: update(UserDB)
+        .where(func.lower(UserDB.email) == email)
+        .values(password_hash=password_hash)
+        .returning(UserDB.id)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def mark_verified(email: str) -> StatementLambdaElement:
+    email = email.lower()
+    return lambda_stmt(
+        lambda: update(UserDB)
+        .where(func.lower(UserDB.email) == email)
+        .values(is_verified=True)
+        .returning(UserDB.email)
+    )
+
+
 async def get_user(email: EmailStr, session: AsyncSession) -> UserDB | None:
-    stmt = select(UserDB).where(func.lower(UserDB.email) == email.lower())
-    result = await session.execute(stmt)
+    result = await session.execute(
+        user_by_email(email), bind_arguments=database.read_binding(email.lower())
+    )
     return result.scalar_one_or_none()
 
 
+def credentials_exception(
+    detail: str = "Could not validate credentials",
+) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def authenticate_access_token(token: str) -> str:
+    """
+    Run every check an access token must pass - signature and expiry, token
+    type, revocation and the user's token version - and return its subject.
+    Raises a 401 HTTPException otherwise.
+    """
+    try:
+        payload = decode_access_token(token)
+    except InvalidTokenError as err:
+        raise credentials_exception(str(err))
+    username = payload.get("sub")
+    if username is None:
+        raise credentials_exception()
+    # Reject refresh tokens (or any non-access token) on authenticated routes.
+    if payload.get("type") != "access":
+        raise credentials_exception()
+
+    # Blacklist entry and token version in (at most) a single round trip.
+    blacklisted, version = await get_token_state(token, payload)
+    # check if the user token has been added to the list of logged out tokens
+    if blacklisted:
+        raise credentials_exception("Invalid or Expired credentials")
+    # Reject tokens issued before the user's last global logout.
+    if payload.get("ver", 0) != version:
+        raise credentials_exception()
+    return auth_schema.TokenData(email=username).email
+
+
+async def get_principal(
+    email: str, session: AsyncSession
+) -> auth_schema.Principal | None:
+    """Resolve the authenticated user, hitting the users table only on a miss."""
+    key = email.lower()
+    principal = principal_cache.get(key)
+    if principal is None:
+        generation = principal_cache.generation
+        user = await get_user(email, session)
+        if user is None:
+            return None
+        principal = auth_schema.Principal.model_validate(user)
+        principal_cache.set(key, principal, generation=generation)
+    return principal
+
+
+async def insert_user(
+    email: str, password_hash: str, session: AsyncSession
+) -> UserDB | None:
+    """
+    Create and commit the user in a single INSERT ... ON CONFLICT DO NOTHING
+    RETURNING, or return None if the email is taken (in any case: see the
+    unique lower(email) index).
+    """
+    # ON CONFLICT is dialect-specific: the production database's and the tests'.
+    insert: postgresql.Insert | sqlite.Insert
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert(UserDB)
+    elif dialect == "sqlite":
+        insert = sqlite.insert(UserDB)
+    else:
+        raise RuntimeError(f"{dialect} has no INSERT ... ON CONFLICT for insert_user")
+    stmt = (
+        insert.values(email=email, password_hash=password_hash)
+        .on_conflict_do_nothing()
+        .returning(UserDB)
+    )
+    user = (await session.execute(stmt)).scalar_one_or_none()
+    await session.commit()
+    if user is not None and database.replica_engines:
+        # Nothing is cached for a new user yet, but activation may reach any
+        # worker before the replicas have the row.
+        await invalidate_principal(email)
+    return user
+
+
 async def create_user(
     user_data: auth_schema.UserSignUpData,
     session: AsyncSession,
 ):
-    user = await get_user(user_data.email, session)
-    if user:
+    hashed_password = await password_hasher.hash(user_data.password)
+    user = await insert_user(user_data.email, hashed_password, session)
+    if user is None:
         raise HTTPException(status_code=400, detail="Email already registered")
-
-    hashed_password = get_password_hash(user_data.password)
-    new_user = UserDB(
-        email=user_data.email,
-        password_hash=hashed_password,
-    )
-
-    session.add(new_user)
-    await session.commit()
-    await session.refresh(new_user)
-    return new_user
+    return user
 
 
 async def initiate_password_reset(
@@ -170,33 +736,19 @@ async def initiate_password_reset(
 async def reset_password(
     reset_data: auth_schema.PasswordResetData, session: AsyncSession
 ):
-    attempt_key = await guard_code_attempts("reset", reset_data.email)
-    data = await redis_manager.get_json_item(reset_code_key(reset_data.email))
-    if not data or data.get("code") != reset_data.code:
-        await redis_manager.increment(attempt_key, ttl=CODE_LOCKOUT_SECONDS)
+    if not await consume_code("reset", reset_data.email, reset_data.code):
         raise HTTPException(status_code=400, detail="Invalid Reset Code")
 
-    user = await get_user(reset_data.email, session)
-    if not user:
+    hashed_password = await password_hasher.hash(reset_data.new_password)
+    result = await session.execute(set_password_hash(reset_data.email, hashed_password))
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Invalid Reset Code")
-
-    hashed_password = get_password_hash(reset_data.new_password)
-    stmt = (
-        update(UserDB)
-        .where(UserDB.email == reset_data.email)
-        .values(password_hash=hashed_password)
-        .execution_options(synchronize_session="fetch")
-    )
-
-    await session.execute(stmt)
     await session.commit()
-
-    # Consume the code and clear the failure counter on success.
-    await redis_manager.delete_key(reset_code_key(reset_data.email))
-    await redis_manager.delete_key(attempt_key)
-    # A password reset must revoke every existing session (the point of a reset
-    # is often that the old credentials/tokens are compromised).
-    await invalidate_all_sessions(reset_data.email)
+    async with redis_manager.batch():
+        await invalidate_principal(reset_data.email)
+        # A password reset must revoke every existing session (the point of a
+        # reset is often that the old credentials/tokens are compromised).
+        await invalidate_all_sessions(reset_data.email)
 
     return {"detail": "Password Reset Successfully"}
 
@@ -222,23 +774,42 @@ async def update_user(
                 detail="Incorrect Old Password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        data.update({"password_hash": get_password_hash(new_password)})
+        data.update({"password_hash": await password_hasher.hash(new_password)})
 
     stmt = (
         update(UserDB)
-        .where(UserDB.email == email)
+        .where(email_matches(email))
         .values(**data)
         .returning(UserDB)
         .execution_options(synchronize_session="fetch")
     )
     result = await session.execute(stmt)
     await session.commit()
-    # Changing the password revokes existing sessions on other devices.
-    if new_password:
-        await invalidate_all_sessions(email)
+    async with redis_manager.batch():
+        await invalidate_principal(email)
+        # Changing the password revokes existing sessions on other devices.
+        if new_password:
+            await invalidate_all_sessions(email)
     return result.scalar_one()
 
 
+def decode_access_token(token: str) -> dict:
+    """
+    Verify a token with a cache of verified payloads. Raises InvalidTokenError
+    like jwt.decode. The returned dict is shared with the cache - don't mutate
+    it.
+    """
+    digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = verified_token_cache.get(digest)
+    if payload is None:
+        payload = key_ring.decode(token)
+        exp = payload.get("exp")
+        ttl = exp - datetime.now(UTC).timestamp() if exp else 0
+        if ttl > 0:
+            verified_token_cache.set(digest, payload, ttl=ttl)
+    return payload
+
+
 def create_access_token(
     data: dict[str, str | int | datetime], expires_delta: timedelta | None = None
 ) -> str:
@@ -247,7 +818,7 @@ def create_access_token(
     # jti makes every token unique (so distinct logins never collide); type and
     # the caller-supplied ver drive access/refresh and global-logout checks.
     to_encode.update({"exp": expire, "type": "access", "jti": secrets.token_hex(16)})
-    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return key_ring.encode(to_encode)
 
 
 def create_refresh_token(
@@ -255,8 +826,10 @@ def create_refresh_token(
 ) -> str:
     to_encode = data.copy()
     expire = datetime.now(UTC) + (expires_delta or REFRESH_TOKEN_LIFESPAN)
-    to_encode.update({"exp": expire, "type": "refresh", "jti": secrets.token_hex(16)})
-    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    to_encode.update({"exp": expire, "type": "refresh"})
+    # Session families pick the jti up front so it can be registered first.
+    to_encode.setdefault("jti", secrets.token_hex(16))
+    return key_ring.encode(to_encode)
 
 
 async def authenticate_user(
@@ -266,10 +839,15 @@ async def authenticate_user(
     if not user:
         # Spend the same bcrypt time as a real comparison so response timing
         # doesn't reveal whether the account exists.
-        verify_password(password, _DUMMY_PASSWORD_HASH)
+        await password_hasher.verify(password, _DUMMY_PASSWORD_HASH)
         return False
-    if not verify_password(password, user.password_hash):
+    if not await password_hasher.verify(password, user.password_hash):
         return False
+    if needs_rehash(user.password_hash):
+        # The plaintext is only available here, so this is where a stored hash
+        # moves to the configured cost.
+        user.password_hash = await password_hasher.hash(password)
+        await session.commit()
     return user
 
 
@@ -278,16 +856,14 @@ async def signup_user(
     session: AsyncSession,
     bg_task: BackgroundTasks,
 ):
-    # Non-enumerable: respond identically whether or not the email is taken.
-    existing = await get_user(data.email, session)
-    if existing:
-        # Match the bcrypt cost of a real signup so timing doesn't leak, and
-        # send nothing (the real owner already has an account).
-        get_password_hash(data.password)
+    # Non-enumerable: respond identically whether or not the email is taken,
+    # after the same work (a bcrypt hash and one INSERT) so timing doesn't leak.
+    hashed_password = await password_hasher.hash(data.password)
+    user = await insert_user(data.email, hashed_password, session)
+    if user is None:
+        # Send nothing: the real owner already has an account.
         return {"detail": GENERIC_SIGNUP_MESSAGE}
 
-    user = await create_user(data, session)
-
     code = generate_random_code(VERIFICATION_CODE_LENGTH)
     await redis_manager.cache_json_item(
         activation_code_key(data.email), {"code": code}, ttl=60 * 30
@@ -331,39 +907,32 @@ async def activate_user(
     session: AsyncSession,
     bg_task: BackgroundTasks,
 ):
-    attempt_key = await guard_code_attempts("activation", verification_data.email)
-    data = await redis_manager.get_json_item(
-        activation_code_key(verification_data.email)
-    )
-
-    if not data or data.get("code") != verification_data.code:
-        await redis_manager.increment(attempt_key, ttl=CODE_LOCKOUT_SECONDS)
+    if not await consume_code(
+        "activation", verification_data.email, verification_data.code
+    ):
         raise HTTPException(status_code=400, detail="Invalid Activation Code")
 
-    user = await get_user(verification_data.email, session)
-    if not user:
+    result = await session.execute(mark_verified(verification_data.email))
+    email = result.scalar_one_or_none()
+    if email is None:
         raise HTTPException(status_code=400, detail="Invalid Activation Code")
-
-    user.is_verified = True
-    session.add(user)
     await session.commit()
-
-    # Consume the code and clear the failure counter on success.
-    await redis_manager.delete_key(activation_code_key(verification_data.email))
-    await redis_manager.delete_key(attempt_key)
+    await invalidate_principal(verification_data.email)
 
     bg_task.add_task(
         send_mail,
         subject="Welcome to {{ project_name }}",
-        receipients=[user.email],
-        payload={"username": user.email.split("@")[0].title()},
+        receipients=[email],
+        payload={"username": email.split("@")[0].title()},
         template="auth/welcome.html",
     )
 
     return {"detail": "Email Activation Successful"}
 
 
-async def signin_user(data: auth_schema.UserSignInData, session: AsyncSession):
+async def signin_user(
+    data: auth_schema.UserSignInData, session: AsyncSession, device: str | None = None
+):
     user = await authenticate_user(
         password=data.password, username=data.email, session=session
     )
@@ -378,42 +947,53 @@ async def signin_user(data: auth_schema.UserSignInData, session: AsyncSession):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Email not verified",
         )
-    version = await redis_manager.get_int(token_version_key(data.email))
-    access_token = create_access_token(
-        data={"sub": data.email, "ver": version}, expires_delta=ACCESS_TOKEN_LIFESPAN
-    )
-    refresh_token = create_refresh_token(
-        data={"sub": data.email, "ver": version}, expires_delta=REFRESH_TOKEN_LIFESPAN
-    )
-
+    version = await get_token_version(data.email)
+    refresh_jti = secrets.token_hex(16)
+    family_id = await open_session(data.email, refresh_jti, device)
+    return issue_tokens(data.email, version, family_id, refresh_jti)
+
+
+def issue_tokens(
+    email: str,
+    version: int,
+    family_id: str | None = None,
+    refresh_jti: str | None = None,
+) -> auth_schema.Token:
+    claims: dict[str, str | int | datetime] = {"sub": email, "ver": version}
+    if family_id:
+        claims["fid"] = family_id
+    refresh_claims = {**claims, "jti": refresh_jti} if refresh_jti else claims
     return auth_schema.Token(
         token_type="Bearer",
-        access_token=access_token,
-        refresh_token=refresh_token,
+        access_token=create_access_token(claims, ACCESS_TOKEN_LIFESPAN),
+        refresh_token=create_refresh_token(refresh_claims, REFRESH_TOKEN_LIFESPAN),
         access_expires_at=datetime.now(UTC) + ACCESS_TOKEN_LIFESPAN,
         refresh_expires_at=datetime.now(UTC) + REFRESH_TOKEN_LIFESPAN,
     )
 
 
-async def blacklist_token(token: str) -> None:
+async def blacklist_token(token: str) -> dict | None:
     """
-    Blacklist a token for the remainder of its lifetime so it cannot be reused.
+    Revoke a token for the remainder of its lifetime so it cannot be reused.
     A fixed TTL would either expire the entry early (re-enabling the token) or
     linger long after the token itself has expired, so the TTL is derived from
-    the token's own `exp` claim.
+    the token's own `exp` claim. The entry is keyed by the token's jti rather
+    than the token itself, so its size doesn't grow with the JWT.
+    Returns the token's claims, or None if it was already invalid.
     """
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = key_ring.decode(token)
     except InvalidTokenError:
         # Already invalid; get_current_user / refresh_token will reject it anyway.
-        return
+        return None
 
     exp = payload.get("exp")
     ttl = int(exp - datetime.now(UTC).timestamp()) if exp else 0
-    if ttl > 0:
-        await redis_manager.cache_json_item(
-            token, {"timestamp": str(datetime.now(UTC))}, ttl=ttl
-        )
+    jti, email = payload.get("jti"), payload.get("sub")
+    if ttl > 0 and isinstance(jti, str) and isinstance(email, str):
+        async with redis_manager.batch() as batch:
+            batch.set_flag(revoked_token_key(jti, email), ttl=ttl)
+    return payload
 
 
 async def refresh_token(
@@ -421,26 +1001,24 @@ async def refresh_token(
 ):
     # A refresh token already blacklisted (by logout or a prior rotation) but
     # presented again is a reuse signal - a rotated token should never come back.
-    # Treat it as possible theft and kill the whole session family.
-    if await redis_manager.get_json_item(token_data.refresh_token):
-        try:
-            stale = jwt.decode(
-                token_data.refresh_token,
-                JWT_SECRET,
-                algorithms=[JWT_ALGORITHM],
-                options={"verify_exp": False},
-            )
-            stale_sub = stale.get("sub")
-            if isinstance(stale_sub, str):
-                await invalidate_all_sessions(stale_sub)
-        except InvalidTokenError:
-            pass
+    # Treat it as possible theft and kill the whole session family. Tokens from
+    # a session family (`fid`) get the same check inside rotate_session instead.
+    try:
+        claims = key_ring.decode(token_data.refresh_token, verify_exp=False)
+    except InvalidTokenError:
+        claims = None
+    if (
+        claims
+        and "fid" not in claims
+        and await is_token_revoked(token_data.refresh_token, claims)
+    ):
+        stale_sub = claims.get("sub")
+        if isinstance(stale_sub, str):
+            await invalidate_all_sessions(stale_sub)
         raise HTTPException(status_code=401, detail="Invalid Refresh Token")
 
     try:
-        payload = jwt.decode(
-            token_data.refresh_token, JWT_SECRET, algorithms=[JWT_ALGORITHM]
-        )
+        payload = key_ring.decode(token_data.refresh_token)
     except Exception:
         logger.error("JWT Decode Failed!")
         raise HTTPException(detail="Invalid Refresh Token", status_code=400)
@@ -463,26 +1041,26 @@ async def refresh_token(
         )
 
     # Reject tokens issued before the user's last global logout.
-    version = await redis_manager.get_int(token_version_key(email))
+    version = await get_token_version(email)
     if payload.get("ver", 0) != version:
         raise HTTPException(status_code=401, detail="Invalid Refresh Token")
 
+    family_id = payload.get("fid")
+    if isinstance(family_id, str):
+        new_jti = secrets.token_hex(16)
+        rotated = await rotate_session(
+            email, family_id, str(payload.get("jti")), new_jti
+        )
+        # SESSION_REUSED has just revoked the family; SESSION_MISSING means the
+        # device was logged out or its session revoked.
+        if rotated != SESSION_ROTATED:
+            raise HTTPException(status_code=401, detail="Invalid Refresh Token")
+        return issue_tokens(email, version, family_id, new_jti)
+
     # Rotate: invalidate the presented refresh token and issue a fresh pair so a
     # leaked refresh token has a single, one-time use.
     await blacklist_token(token_data.refresh_token)
-    new_access_token = create_access_token(
-        data={"sub": email, "ver": version}, expires_delta=ACCESS_TOKEN_LIFESPAN
-    )
-    new_refresh_token = create_refresh_token(
-        data={"sub": email, "ver": version}, expires_delta=REFRESH_TOKEN_LIFESPAN
-    )
-    return auth_schema.Token(
-        token_type="Bearer",
-        access_token=new_access_token,
-        refresh_token=new_refresh_token,
-        access_expires_at=datetime.now(UTC) + ACCESS_TOKEN_LIFESPAN,
-        refresh_expires_at=datetime.now(UTC) + REFRESH_TOKEN_LIFESPAN,
-    )
+    return issue_tokens(email, version)
 
 
 async def logout(
@@ -491,11 +1069,17 @@ async def logout(
     # Blacklist the access token, and the refresh token too when the client
     # supplies it - otherwise the refresh token would outlive the logout and
     # could still mint new access tokens.
-    await blacklist_token(access_token)
-    if refresh_token:
-        await blacklist_token(refresh_token)
-    # Bump the user's token version so EVERY token issued before now (across all
-    # devices) is invalidated, not just the pair presented here.
-    if email:
-        await invalidate_all_sessions(email)
+    families = set()
+    async with redis_manager.batch() as batch:
+        for token in filter(None, (access_token, refresh_token)):
+            payload = await blacklist_token(token)
+            if payload and isinstance(payload.get("fid"), str):
+                families.add(payload["fid"])
+        if email and families:
+            # End this device's session only; other devices stay signed in.
+            batch.delete_hash_fields(sessions_key(email), *families)
+        elif email:
+            # Tokens issued before session families: fall back to invalidating
+            # every token issued before now, across all devices.
+            await invalidate_all_sessions(email)
     return {"detail": "User Logged Out Successfully"}
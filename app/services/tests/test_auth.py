@@ -1,18 +1,27 @@
+import asyncio
+import secrets
+import time
 from datetime import timedelta
 from typing import Any
 from unittest.mock import patch
 
+import jwt
 import pytest
 from faker import Faker
 from fastapi import BackgroundTasks, HTTPException
+from redis.crc import key_slot
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.hashing import hash_rounds
 from app.models import User as UserDB
 from app.redis_manager import redis_manager
 from app.routers.tests.conftest import signup_data  # noqa
 from app.schemas import auth as auth_schemas
 from app.schemas.auth import UserSignUpData
+from app.serializers import MsgpackSerializer
 from app.services import auth as auth_services
+from app.settings import settings
 
 faker = Faker()
 
@@ -27,6 +36,17 @@ async def test_get_user(user: UserDB, session: AsyncSession):
     assert isinstance(result, UserDB)
 
 
+def test_user_by_email_is_one_cached_statement():
+    first = auth_services.user_by_email("A@example.com")
+    second = auth_services.user_by_email("b@example.com")
+    # Same compiled-SQL cache entry; only the bound email differs.
+    first_key = first._generate_cache_key()
+    second_key = second._generate_cache_key()
+    assert first_key.key == second_key.key
+    assert [p.value for p in first_key.bindparams] == ["a@example.com"]
+    assert [p.value for p in second_key.bindparams] == ["b@example.com"]
+
+
 async def test_get_user_return_none(session: AsyncSession):
     result = await auth_services.get_user(faker.email(), session)
     assert result is None
@@ -40,13 +60,19 @@ async def test_create_user(session: AsyncSession, signup_data: dict[str, str]):
 async def test_create_user_fails(
     session: AsyncSession, signup_data: dict[str, Any], user: UserDB  # noqa
 ):  # noqa
-    signup_data["email"] = user.email
+    signup_data["email"] = user.email.upper()  # emails are unique in any case
     with pytest.raises(HTTPException) as err:
         await auth_services.create_user(UserSignUpData(**signup_data), session)
 
     assert "Email already registered" in str(err.value)
 
 
+async def test_insert_user_rejects_dialects_without_on_conflict(session: AsyncSession):
+    with patch.object(session.bind.dialect, "name", "mysql"):
+        with pytest.raises(RuntimeError, match="ON CONFLICT"):
+            await auth_services.insert_user("new@example.com", "hash", session)
+
+
 async def test_initiate_password_reset_for_user(user: UserDB, session: AsyncSession):
     result = await auth_services.initiate_password_reset(
         user.email, session, BackgroundTasks(tasks=[])
@@ -62,7 +88,9 @@ async def test_initiate_password_reset_for_none_user(session: AsyncSession):
 
 
 async def test_reset_password_for_user(user: UserDB, session: AsyncSession):
-    await redis_manager.cache_json_item(f"reset-code-{user.email}", {"code": "000000"})
+    await redis_manager.cache_json_item(
+        auth_services.reset_code_key(user.email), {"code": "000000"}
+    )
     result = await auth_services.reset_password(
         auth_schemas.PasswordResetData(
             code="000000", email=user.email, new_password="newpassword"
@@ -82,7 +110,7 @@ async def test_reset_password_for_user(user: UserDB, session: AsyncSession):
 async def test_reset_password_fails(user: UserDB, session: AsyncSession, code: str):
     none_existence_email = faker.email()
     await redis_manager.cache_json_item(
-        f"reset-code-{none_existence_email}", {"code": "000000"}
+        auth_services.reset_code_key(none_existence_email), {"code": "000000"}
     )
     with pytest.raises(HTTPException) as err:
         await auth_services.reset_password(
@@ -203,7 +231,7 @@ async def test_activate_user(
     user: UserDB, session: AsyncSession, code: str, response_message: str
 ):
     await redis_manager.cache_json_item(
-        f"activation-code-{user.email}", {"code": "000000"}
+        auth_services.activation_code_key(user.email), {"code": "000000"}
     )
     if code != "000000":
         with pytest.raises(HTTPException) as err:
@@ -308,7 +336,7 @@ async def test_refresh_token_fails(
 
 async def test_refresh_token_payload_return_none(session: AsyncSession):
     invalid_refresh_token = auth_services.create_refresh_token({"sub": faker.email()})  # type: ignore
-    with patch("app.services.auth.jwt.decode") as mock_decode:
+    with patch("app.signing_keys.jwt.decode") as mock_decode:
         mock_decode.return_value = None
 
         with pytest.raises(HTTPException) as err:
@@ -346,7 +374,9 @@ async def test_refresh_reuse_kills_session_family(user: UserDB, session: AsyncSe
 async def test_reset_password_locks_out_after_max_attempts(
     user: UserDB, session: AsyncSession
 ):
-    await redis_manager.cache_json_item(f"reset-code-{user.email}", {"code": "000000"})
+    await redis_manager.cache_json_item(
+        auth_services.reset_code_key(user.email), {"code": "000000"}
+    )
 
     # MAX_CODE_ATTEMPTS wrong codes each fail with 400 ...
     for _ in range(auth_services.MAX_CODE_ATTEMPTS):
@@ -370,6 +400,40 @@ async def test_reset_password_locks_out_after_max_attempts(
     assert err.value.status_code == 429
 
 
+async def test_code_is_redeemed_only_once_under_concurrency(user: UserDB):
+    await redis_manager.cache_json_item(
+        auth_services.reset_code_key(user.email), {"code": "000000"}
+    )
+    results = await asyncio.gather(
+        *(auth_services.consume_code("reset", user.email, "000000") for _ in range(5))
+    )
+    assert results.count(True) == 1
+
+
+async def test_wrong_code_is_counted_and_code_kept(user: UserDB):
+    await redis_manager.cache_json_item(
+        auth_services.reset_code_key(user.email), {"code": "000000"}
+    )
+    assert not await auth_services.consume_code("reset", user.email, "999999")
+    key = auth_services.failed_attempts_key("reset", user.email)
+    assert await redis_manager.get_int(key) == 1
+    assert 0 < await redis_manager.redis_client.ttl(key)
+
+    # A later correct submission still works and clears the counter.
+    assert await auth_services.consume_code("reset", user.email, "000000")
+    assert await redis_manager.get_int(key) == 0
+
+
+async def test_consume_code_reads_msgpack_values(user: UserDB, monkeypatch):
+    pytest.importorskip("msgpack")
+    monkeypatch.setattr(redis_manager, "serializer", MsgpackSerializer())
+    await redis_manager.cache_json_item(
+        auth_services.reset_code_key(user.email), {"code": "000000"}
+    )
+    assert not await auth_services.consume_code("reset", user.email, "999999")
+    assert await auth_services.consume_code("reset", user.email, "000000")
+
+
 async def test_refresh_token_is_single_use(user: UserDB, session: AsyncSession):
     initial_token = auth_services.create_refresh_token(
         {"sub": user.email}, auth_services.REFRESH_TOKEN_LIFESPAN
@@ -387,3 +451,217 @@ async def test_refresh_token_is_single_use(user: UserDB, session: AsyncSession):
         )
     assert err.value.status_code == 401
     assert err.value.detail == "Invalid Refresh Token"
+
+
+async def test_refresh_token_reuse_ends_only_its_session(
+    user: UserDB, session: AsyncSession
+):
+    sign_in = auth_schemas.UserSignInData(email=user.email, password="password")
+    stolen = await auth_services.signin_user(sign_in, session)
+    other = await auth_services.signin_user(sign_in, session)
+
+    rotated = await auth_services.refresh_token(
+        auth_schemas.RefreshTokenModel(refresh_token=stolen.refresh_token), session
+    )
+    with pytest.raises(HTTPException):
+        await auth_services.refresh_token(
+            auth_schemas.RefreshTokenModel(refresh_token=stolen.refresh_token), session
+        )
+
+    # The replay revoked that family, including its newest refresh token ...
+    with pytest.raises(HTTPException) as err:
+        await auth_services.refresh_token(
+            auth_schemas.RefreshTokenModel(refresh_token=rotated.refresh_token),
+            session,
+        )
+    assert err.value.status_code == 401
+    # ... but the other device's session is untouched.
+    assert await auth_services.refresh_token(
+        auth_schemas.RefreshTokenModel(refresh_token=other.refresh_token), session
+    )
+
+
+async def test_session_refresh_costs_one_redis_round_trip(
+    user: UserDB, session: AsyncSession
+):
+    await redis_manager.load_scripts()
+    tokens = await auth_services.signin_user(
+        auth_schemas.UserSignInData(email=user.email, password="password"), session
+    )
+    with redis_manager.count_round_trips() as trips:
+        await auth_services.refresh_token(
+            auth_schemas.RefreshTokenModel(refresh_token=tokens.refresh_token), session
+        )
+    assert trips.count == 1  # the rotate_session script
+
+
+async def test_token_version_is_served_from_local_cache(user: UserDB):
+    assert await auth_services.get_token_version(user.email) == 0
+    with redis_manager.count_round_trips() as trips:
+        assert await auth_services.get_token_version(user.email) == 0
+    assert trips.count == 0
+
+
+async def test_invalidate_all_sessions_drops_cached_version(user: UserDB):
+    assert await auth_services.get_token_version(user.email) == 0
+    await auth_services.invalidate_all_sessions(user.email)
+    assert await auth_services.get_token_version(user.email) == 1
+
+
+async def test_invalidation_message_from_another_worker_drops_cached_version(
+    user: UserDB,
+):
+    auth_services.token_version_cache.set(user.email, 7)
+    listener = asyncio.create_task(auth_services.listen_for_invalidations())
+    try:
+        await asyncio.sleep(0.1)  # let the subscription register
+        await redis_manager.publish(
+            auth_services.INVALIDATION_CHANNEL,
+            {"kind": "token-version", "email": user.email, "sent_at": time.time()},
+        )
+        for _ in range(50):
+            if auth_services.token_version_cache.get(user.email) is None:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        listener.cancel()
+
+    assert auth_services.token_version_cache.get(user.email) is None
+    assert auth_services.invalidation_lag.received >= 1
+
+
+async def test_blacklist_token_stores_compact_jti_key(user: UserDB):
+    token = auth_services.create_access_token({"sub": user.email})
+    payload = jwt.decode(
+        token, auth_services.JWT_SECRET, algorithms=[auth_services.JWT_ALGORITHM]
+    )
+    await auth_services.blacklist_token(token)
+
+    key = auth_services.revoked_token_key(payload["jti"], user.email)
+    tag = auth_services.user_tag(user.email)
+    assert len(key) == len(auth_services.REVOKED_TOKEN_PREFIX) + len(tag) + 16
+    assert await redis_manager.redis_client.get(key) == ""
+    assert await redis_manager.redis_client.get(token) is None
+    assert await auth_services.is_token_revoked(token, payload)
+
+
+async def test_legacy_full_token_blacklist_entry_is_honoured(user: UserDB):
+    token = auth_services.create_access_token({"sub": user.email})
+    payload = jwt.decode(
+        token, auth_services.JWT_SECRET, algorithms=[auth_services.JWT_ALGORITHM]
+    )
+    assert not await auth_services.is_token_revoked(token, payload)
+
+    await redis_manager.cache_json_item(token, {"timestamp": "legacy"}, ttl=60)
+    assert await auth_services.is_token_revoked(token, payload)
+
+
+async def test_untagged_jti_blacklist_entry_is_honoured(user: UserDB):
+    token = auth_services.create_access_token({"sub": user.email})
+    payload = auth_services.decode_access_token(token)
+    untagged = auth_services.REVOKED_TOKEN_PREFIX + bytes.fromhex(payload["jti"])
+    await redis_manager.set_flag(untagged, ttl=60)
+    assert await auth_services.is_token_revoked(token, payload)
+
+
+def test_user_keys_share_one_cluster_slot():
+    email = "Someone@Example.com"
+    keys = [
+        auth_services.token_version_key(email),
+        auth_services.activation_code_key(email),
+        auth_services.reset_code_key(email),
+        auth_services.failed_attempts_key("reset", email),
+        auth_services.email_cooldown_key("activation", email),
+        auth_services.sessions_key(email),
+        auth_services.revoked_token_key(secrets.token_hex(16), email),
+    ]
+    assert len({key_slot(k if isinstance(k, bytes) else k.encode()) for k in keys}) == 1
+    # Tags are case-insensitive, like the user lookups.
+    assert auth_services.token_version_key(email.lower()) == keys[0]
+
+
+async def test_migrate_untagged_keys(user: UserDB):
+    await redis_manager.redis_client.set(f"token-version-{user.email}", 3)
+    await redis_manager.redis_client.hset(  # type: ignore[misc]
+        f"sessions-{user.email}", "family", '{"jti": "x"}'
+    )
+
+    assert await auth_services.migrate_untagged_keys() >= 2
+    assert await auth_services.get_token_version(user.email) == 3
+    sessions = await redis_manager.get_json_hash(auth_services.sessions_key(user.email))
+    assert sessions == {"family": {"jti": "x"}}
+    assert await redis_manager.redis_client.exists(f"token-version-{user.email}") == 0
+
+
+async def test_update_user_invalidates_cached_principal(
+    user: UserDB, session: AsyncSession
+):
+    assert await auth_services.get_principal(user.email, session)
+    assert auth_services.principal_cache.get(user.email) is not None
+
+    await auth_services.update_user(
+        user.email,
+        auth_schemas.UpdateUserModel(
+            old_password="password", new_password="new_password"
+        ),
+        session,
+    )
+    assert auth_services.principal_cache.get(user.email) is None
+
+
+async def explain_query_plan(session: AsyncSession, stmt) -> str:
+    # The test database is SQLite; its EXPLAIN QUERY PLAN names the index used.
+    connection = await session.connection()
+    compiled = stmt.compile(connection.sync_connection)
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {compiled}", tuple(compiled.params.values())
+    )
+    return " ".join(row[-1] for row in result.all())
+
+
+@pytest.mark.parametrize(
+    "stmt",
+    [
+        select(UserDB).where(auth_services.email_matches("User@Example.com")),
+        update(UserDB)
+        .where(auth_services.email_matches("User@Example.com"))
+        .values(is_verified=True),
+    ],
+)
+async def test_email_lookups_use_lower_email_index(session: AsyncSession, stmt):
+    plan = await explain_query_plan(session, stmt)
+    assert "USING INDEX uq_users_email_lower" in plan
+
+
+async def test_decode_access_token_verifies_once_per_token(user: UserDB):
+    token = auth_services.create_access_token({"sub": user.email})
+    first = auth_services.decode_access_token(token)
+    with patch("app.signing_keys.jwt.decode") as mock_decode:
+        second = auth_services.decode_access_token(token)
+    mock_decode.assert_not_called()
+    assert second == first
+
+
+async def test_decode_access_token_does_not_cache_invalid_tokens():
+    token = auth_services.create_access_token(
+        {"sub": faker.email()}, expires_delta=timedelta(seconds=-1)
+    )
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidTokenError):
+            auth_services.decode_access_token(token)
+    assert len(auth_services.verified_token_cache) == 0
+
+
+async def test_authenticate_user_rehashes_at_configured_cost(
+    user: UserDB, session: AsyncSession, monkeypatch
+):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    assert hash_rounds(user.password_hash) != 4
+
+    result = await auth_services.authenticate_user(user.email, "password", session)
+    assert isinstance(result, UserDB)
+
+    stored = await auth_services.get_user(user.email, session)
+    assert stored is not None
+    assert hash_rounds(stored.password_hash) == 4
+    assert auth_services.verify_password("password", stored.password_hash)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -8,17 +10,126 @@ class Settings(BaseSettings):
     DATABASE_URL: str  # required environment variable
     DEBUG: bool = False
 
+    # SQLAlchemy pool, per worker process: DB_POOL_SIZE connections kept open,
+    # up to DB_MAX_OVERFLOW more under load. Beyond that a checkout waits up to
+    # DB_POOL_TIMEOUT_SECONDS, then fails. Keep workers x (size + overflow)
+    # under the server's max_connections. Sizing is ignored for SQLite.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    # Replace connections older than this (-1: never), before a proxy or
+    # firewall drops them idle; pre-ping tests each one on checkout.
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # asyncpg only: prepared statements cached per connection (0 disables),
+    # and how long a statement may run before it's cancelled (None: no limit).
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_COMMAND_TIMEOUT_SECONDS: float | None = None
+    # Behind pgbouncer in transaction mode, prepared statements can't be
+    # cached per connection: True turns the asyncpg caches off (overriding
+    # DB_STATEMENT_CACHE_SIZE). SQLAlchemy's compiled-SQL cache still applies.
+    DB_PGBOUNCER: bool = False
+    # Optional read replicas (same form as DATABASE_URL), pooled like the
+    # primary. Plain SELECTs go to a random one; writes, and a session's reads
+    # after its first write, to DATABASE_URL. After a write to a user's row,
+    # every worker reads that user from the primary for
+    # DB_READ_YOUR_WRITES_SECONDS: keep it above the replicas' usual lag.
+    DATABASE_REPLICA_URLS: list[str] = []
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+    # Statements slower than this are logged with their parameters redacted
+    # (type names only). DB_SLOW_QUERY_EXPLAIN adds the query plan, at the cost
+    # of an EXPLAIN (plan only, nothing re-run) per slow statement.
+    DB_SLOW_QUERY_MS: float = 200.0
+    DB_SLOW_QUERY_EXPLAIN: bool = False
+
     ACCESS_TOKEN_LIFESPAN_MIN: int = 15
     REFRESH_TOKEN_LIFESPAN_DAYS: int = 28
 
     JWT_SECRET: str = ""  # REQUIRED in production (DEBUG=False); see validator below
     JWT_ALGORITHM: str = "HS256"  # optional environement variable with default value
 
+    # Asymmetric signing, so other services can verify tokens locally from
+    # /.well-known/jwks.json. JWT_SIGNING_KEYS maps kid -> PEM private key
+    # (Ed25519 for EdDSA, P-256 for ES256), as JSON; every listed key is
+    # published and accepted. Tokens are signed with JWT_SIGNING_KEY_ID, or with
+    # the HS256 JWT_SECRET while it is empty. Rotate by adding the new key,
+    # switching the id, and removing the old key once its tokens have expired.
+    JWT_SIGNING_KEYS: dict[str, str] = {}
+    JWT_SIGNING_KEY_ID: str = ""
+    # Keep accepting HS256 tokens (no kid) during the migration window.
+    JWT_ACCEPT_HS256: bool = True
+    JWKS_MAX_AGE_SECONDS: int = 300
+
     # ensures the length of the otp codes used across the app is consistent
     VERIFICATION_CODE_LENGTH: int = 6
 
+    # bcrypt cost factor (4-31, +1 doubles the work). Pick it per host with
+    # `make calibrate-bcrypt`; stored hashes at another cost are upgraded (or
+    # downgraded) transparently on the user's next successful login.
+    BCRYPT_ROUNDS: int = 12
+
+    # bcrypt runs in a process pool off the event loop. Callers beyond
+    # WORKERS + MAX_QUEUE, or waiting longer than the timeout, get a 503.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = 2.0
+
+    # Per-worker LRU of token versions, kept fresh by pub/sub invalidation.
+    # The TTL bounds staleness if an invalidation message is ever lost.
+    TOKEN_VERSION_CACHE_SIZE: int = 10_000
+    TOKEN_VERSION_CACHE_TTL_SECONDS: float = 5.0
+
+    # Per-worker cache of the authenticated principal, so protected routes
+    # don't query the users table. Explicitly invalidated on user writes.
+    PRINCIPAL_CACHE_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0
+
+    # Per-worker cache of verified access-token payloads (valid until exp).
+    VERIFIED_TOKEN_CACHE_SIZE: int = 10_000
+
+    # Authenticate these path prefixes in a pure-ASGI layer before routing
+    # instead of through the get_current_user dependency chain.
+    AUTH_MIDDLEWARE_ENABLED: bool = False
+    AUTH_MIDDLEWARE_PROTECTED_PATHS: list[str] = ["/v1/auth/me", "/v1/auth/logout"]
+
+    # Revocations are stored under the token's jti. Tokens blacklisted before
+    # that were keyed by the full JWT; keep checking those keys until the
+    # longest-lived of them (REFRESH_TOKEN_LIFESPAN_DAYS) has expired.
+    REVOCATION_CHECK_LEGACY_KEYS: bool = True
+
+    # "standalone" talks to REDIS_HOST:REDIS_PORT. "sentinel" asks
+    # REDIS_SENTINELS ("host:port" entries) for the current master of
+    # REDIS_SENTINEL_SERVICE and follows failovers. "cluster" discovers the
+    # shards from REDIS_CLUSTER_NODES (default: REDIS_HOST:REDIS_PORT).
+    # "memory" keeps everything in-process with no server: single-worker
+    # deployments and tests only, as each worker would get its own data.
+    REDIS_MODE: Literal["standalone", "sentinel", "cluster", "memory"] = "standalone"
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    REDIS_SENTINELS: list[str] = []
+    REDIS_SENTINEL_SERVICE: str = "mymaster"
+    REDIS_CLUSTER_NODES: list[str] = []
+    # Connections per worker process. The pool blocks callers for up to
+    # REDIS_POOL_TIMEOUT_SECONDS when all are busy, then fails the command.
+    # The invalidation listener holds one connection for the app's lifetime.
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT_SECONDS: float = 1.0
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 2.0
+    REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS: float = 2.0
+    REDIS_SOCKET_KEEPALIVE: bool = True
+    # PING connections idle for longer than this before reusing them.
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS: int = 30
+    # Serve repeated reads (token versions, revocation markers, codes) from
+    # process memory, invalidated by the server through CLIENT TRACKING. The TTL
+    # only bounds staleness if the invalidation connection silently stalls.
+    # Standalone and sentinel modes only.
+    REDIS_CLIENT_CACHE_ENABLED: bool = False
+    REDIS_CLIENT_CACHE_SIZE: int = 10_000
+    REDIS_CLIENT_CACHE_TTL_SECONDS: float = 60.0
+    # Codec for cached JSON values (verification codes). "orjson" and "msgpack"
+    # need the package of that name installed; every codec still reads values
+    # already written as JSON text, so switching needs no migration.
+    REDIS_SERIALIZER: Literal["json", "orjson", "msgpack"] = "json"
 
     # Reject request bodies larger than this (anti memory-exhaustion DoS).
     MAX_REQUEST_BODY_BYTES: int = 1024 * 1024  # 1 MB
@@ -40,8 +151,14 @@ class Settings(BaseSettings):
     @model_validator(mode="after")
     def _require_strong_jwt_secret_in_production(self) -> "Settings":
         # Enforced only outside DEBUG so local/dev stays frictionless; production
-        # refuses to boot on a missing or weak secret.
-        if not self.DEBUG and len(self.JWT_SECRET) < self.MIN_JWT_SECRET_LENGTH:
+        # refuses to boot on a missing or weak secret - unless HS256 is fully
+        # retired in favour of asymmetric keys.
+        uses_hs256 = not self.JWT_SIGNING_KEY_ID or self.JWT_ACCEPT_HS256
+        if (
+            not self.DEBUG
+            and uses_hs256
+            and len(self.JWT_SECRET) < self.MIN_JWT_SECRET_LENGTH
+        ):
             raise ValueError(
                 "JWT_SECRET must be set to at least "
                 f"{self.MIN_JWT_SECRET_LENGTH} characters when DEBUG is False. "
@@ -50,6 +167,26 @@ class Settings(BaseSettings):
             )
         return self
 
+    @model_validator(mode="after")
+    def _require_known_signing_key_id(self) -> "Settings":
+        kid = self.JWT_SIGNING_KEY_ID
+        if kid and kid not in self.JWT_SIGNING_KEYS:
+            raise ValueError(
+                f"JWT_SIGNING_KEY_ID {kid!r} is not one of "
+                "the keys in JWT_SIGNING_KEYS"
+            )
+        return self
+
+    @model_validator(mode="after")
+    def _check_redis_mode(self) -> "Settings":
+        if self.REDIS_MODE == "sentinel" and not self.REDIS_SENTINELS:
+            raise ValueError("REDIS_SENTINELS must be set when REDIS_MODE is sentinel")
+        if self.REDIS_MODE in ("cluster", "memory") and self.REDIS_CLIENT_CACHE_ENABLED:
+            raise ValueError(
+                f"REDIS_CLIENT_CACHE_ENABLED is not supported in {self.REDIS_MODE} mode"
+            )
+        return self
+
 
 # Shared, import-once settings instance. Import this rather than calling
 # Settings() again - each call re-reads and re-parses the .env file.
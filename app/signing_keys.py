@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from typing import Any
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+from jwt.exceptions import InvalidTokenError
+from jwt.types import Options
+
+from app.settings import settings
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    algorithm: str  # "EdDSA" or "ES256", derived from the key type
+    private_key: Any
+    public_key: Any
+
+    @classmethod
+    def from_pem(cls, kid: str, pem: str) -> "SigningKey":
+        private_key = load_pem_private_key(pem.encode(), password=None)
+        if isinstance(private_key, ed25519.Ed25519PrivateKey):
+            algorithm = "EdDSA"
+        elif isinstance(private_key, ec.EllipticCurvePrivateKey) and isinstance(
+            private_key.curve, ec.SECP256R1
+        ):
+            algorithm = "ES256"
+        else:
+            raise ValueError(f"JWT signing key {kid!r} must be Ed25519 or P-256")
+        return cls(kid, algorithm, private_key, private_key.public_key())
+
+    def jwk(self) -> dict[str, Any]:
+        if self.algorithm == "EdDSA":
+            jwk = OKPAlgorithm.to_jwk(self.public_key, as_dict=True)
+        else:
+            jwk = ECAlgorithm.to_jwk(self.public_key, as_dict=True)
+        return {**jwk, "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+
+class KeyRing:
+    """
+    Signs tokens with the active asymmetric key (tagging them with its `kid`)
+    and verifies against every configured key, so keys can be rotated with an
+    overlap: publish the new key, switch the active kid, then drop the old key
+    once the tokens it signed have expired.
+
+    With no active key, or while `accept_hs256` is on, tokens without a kid are
+    signed/verified with the shared HS256 secret as before.
+    """
+
+    def __init__(
+        self,
+        keys: dict[str, str],
+        active_kid: str,
+        hs256_secret: str,
+        hs256_algorithm: str = "HS256",
+        accept_hs256: bool = True,
+    ):
+        self.keys = {kid: SigningKey.from_pem(kid, pem) for kid, pem in keys.items()}
+        self.active = self.keys[active_kid] if active_kid else None
+        self.hs256_secret = hs256_secret
+        self.hs256_algorithm = hs256_algorithm
+        self.accept_hs256 = accept_hs256 or self.active is None
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        if self.active is None:
+            return jwt.encode(claims, self.hs256_secret, algorithm=self.hs256_algorithm)
+        return jwt.encode(
+            claims,
+            self.active.private_key,
+            algorithm=self.active.algorithm,
+            headers={"kid": self.active.kid},
+        )
+
+    def decode(self, token: str, verify_exp: bool = True) -> dict[str, Any]:
+        options: Options = {"verify_exp": verify_exp}
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            if not self.accept_hs256:
+                raise InvalidTokenError("Token is missing a key id")
+            return jwt.decode(
+                token,
+                self.hs256_secret,
+                algorithms=[self.hs256_algorithm],
+                options=options,
+            )
+        key = self.keys.get(kid)
+        if key is None:
+            raise InvalidTokenError("Unknown signing key")
+        # Pin the algorithm to the key's own, never the header's claim.
+        return jwt.decode(
+            token, key.public_key, algorithms=[key.algorithm], options=options
+        )
+
+    def jwks(self) -> dict[str, list[dict[str, Any]]]:
+        return {"keys": [key.jwk() for key in self.keys.values()]}
+
+
+key_ring = KeyRing(
+    keys=settings.JWT_SIGNING_KEYS,
+    active_kid=settings.JWT_SIGNING_KEY_ID,
+    hs256_secret=settings.JWT_SECRET,
+    hs256_algorithm=settings.JWT_ALGORITHM,
+    accept_hs256=settings.JWT_ACCEPT_HS256,
+)
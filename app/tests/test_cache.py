@@ -0,0 +1,59 @@
+import time
+
+from app.cache import TTLCache
+
+
+def test_get_returns_cached_value_and_counts_hits():
+    cache: TTLCache[int] = TTLCache(max_entries=2)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats.as_dict() == {
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "invalidations": 0,
+        "hit_ratio": 0.5,
+    }
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache: TTLCache[int] = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats.evictions == 1
+
+
+def test_entries_expire_after_ttl():
+    cache: TTLCache[int] = TTLCache(max_entries=2, ttl=0.01)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+def test_stale_write_after_invalidation_is_dropped():
+    cache: TTLCache[int] = TTLCache(max_entries=2)
+    generation = cache.generation
+    cache.invalidate("a")  # lands while the caller's read was in flight
+    cache.set("a", 1, generation=generation)
+    assert cache.get("a") is None
+
+
+def test_byte_budget_evicts_least_recently_used():
+    cache: TTLCache[str] = TTLCache(max_entries=10, max_bytes=10)
+    cache.set("a", "aaaa", size=4)
+    cache.set("b", "bbbb", size=4)
+    cache.set("a", "aaaaa", size=5)  # replacing an entry frees its old size
+    assert cache.bytes == 9
+    cache.set("c", "cc", size=2)
+    assert cache.get("b") is None
+    assert cache.bytes == 7
+    cache.set("d", "d" * 11, size=11)  # over the whole budget: not cached
+    assert cache.get("d") is None
+    assert cache.get("a") == "aaaaa"
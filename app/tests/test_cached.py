@@ -0,0 +1,175 @@
+import asyncio
+import secrets
+from unittest.mock import patch
+
+import pytest
+
+from app.cached import (
+    WORKER_ID,
+    TwoTierCache,
+    cached,
+    handle_invalidation,
+    invalidate_tags,
+    refresh_early,
+    two_tier_caches,
+)
+from app.redis_manager import redis_manager
+
+
+@pytest.fixture
+def scope() -> str:
+    # Redis isn't flushed between tests: keep each test's keys apart.
+    return secrets.token_hex(4)
+
+
+@pytest.fixture
+def two_tier(scope: str):
+    cache = TwoTierCache(scope, ttl=60)
+    yield cache
+    two_tier_caches.pop(cache.name)
+
+
+async def test_thundering_herd_makes_one_backend_call(scope: str):
+    calls = 0
+
+    @cached(key=scope + "-profile-{user_id}", ttl=60)
+    async def load(user_id: int) -> dict:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"id": user_id}
+
+    results = await asyncio.gather(*(load(7) for _ in range(50)))
+    assert results == [{"id": 7}] * 50
+    assert calls == 1
+
+    with redis_manager.count_round_trips() as trips:
+        assert await load(7) == {"id": 7}
+    assert calls == 1
+    assert trips.count == 1
+
+
+async def test_none_results_are_cached(scope: str):
+    calls = 0
+
+    async def missing(user_id: int) -> None:
+        nonlocal calls
+        calls += 1
+
+    cached_missing = cached(key=scope + "-missing-{user_id}", ttl=60)(missing)
+    assert await cached_missing(1) is None
+    assert await cached_missing(1) is None
+    assert calls == 1
+
+    uncached = cached(key=scope + "-uncached-{user_id}", ttl=60, negative_ttl=0)
+    uncached_missing = uncached(missing)
+    await uncached_missing(1)
+    await uncached_missing(1)
+    assert calls == 3
+
+
+async def test_invalidation_by_key_and_tag(scope: str):
+    calls = 0
+
+    @cached(key=scope + "-item-{item_id}", ttl=60, tags=[scope + "-owner-{owner}"])
+    async def load(item_id: int, owner: str = "ann") -> int:
+        nonlocal calls
+        calls += 1
+        return item_id
+
+    await load(1)
+    await load(2)
+    await load(1)
+    assert calls == 2
+
+    await load.invalidate(1)
+    await load(1)
+    assert calls == 3
+
+    assert await invalidate_tags(scope + "-owner-ann") == 2
+    await load(1)
+    await load(2)
+    assert calls == 5
+
+
+async def test_load_overlapping_an_invalidation_is_not_stored(scope: str):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    @cached(key=scope + "-slow", ttl=60)
+    async def load() -> str:
+        started.set()
+        await release.wait()
+        return "stale"
+
+    pending = asyncio.create_task(load())
+    await started.wait()
+    await load.invalidate()
+    release.set()
+    assert await pending == "stale"
+    assert await redis_manager.get_json_item(load.cache_key()) is None
+
+
+def test_refresh_early_grows_towards_expiry():
+    entry = {"delta": 1.0, "expires_at": 1_000.0}
+    with patch("app.cached.time.time", return_value=999.0):
+        # -log(1 - 0.5) * delta ~ 0.69 s of headroom: not yet.
+        with patch("app.cached.random.random", return_value=0.5):
+            assert not refresh_early(entry, beta=1.0)
+        # An unlucky draw (or a bigger beta) refreshes a second early.
+        with patch("app.cached.random.random", return_value=0.9):
+            assert refresh_early(entry, beta=1.0)
+        with patch("app.cached.random.random", return_value=0.5):
+            assert refresh_early(entry, beta=2.0)
+
+
+async def test_two_tier_reads_local_then_redis(two_tier: TwoTierCache):
+    await two_tier.set("plan", {"tier": "pro"})
+
+    with redis_manager.count_round_trips() as trips:
+        assert await two_tier.get("plan") == {"tier": "pro"}
+    assert trips.count == 0
+
+    # Another worker: an empty local tier, filled from Redis once.
+    two_tier.local.clear()
+    with redis_manager.count_round_trips() as trips:
+        assert await two_tier.get("plan") == {"tier": "pro"}
+        assert await two_tier.get("plan") == {"tier": "pro"}
+    assert trips.count == 1
+    assert await two_tier.get("missing") is None
+
+    stats = two_tier.stats()
+    assert stats["local"]["hits"] == 2
+    assert stats["local"]["entries"] == 1
+    assert stats["local"]["invalidations"] == 0  # a write replaces, not invalidates
+    assert stats["redis"]["hits"] == 1
+    assert stats["redis"]["misses"] == 1
+
+
+async def test_two_tier_get_or_load_writes_through(two_tier: TwoTierCache):
+    calls = 0
+
+    async def loader() -> list[int]:
+        nonlocal calls
+        calls += 1
+        return [1, 2]
+
+    assert await two_tier.get_or_load("ids", loader) == [1, 2]
+    two_tier.local.clear()
+    assert await two_tier.get_or_load("ids", loader) == [1, 2]
+    assert calls == 1
+
+
+async def test_two_tier_invalidation_reaches_other_workers(two_tier: TwoTierCache):
+    await two_tier.set("plan", {"tier": "pro"})
+
+    # Our own broadcast is ignored: the write already updated this worker.
+    handle_invalidation({"cache": two_tier.name, "key": "plan", "origin": WORKER_ID})
+    assert two_tier.local.get("plan") == {"tier": "pro"}
+
+    handle_invalidation({"cache": two_tier.name, "key": "plan", "origin": "other"})
+    assert two_tier.local.get("plan") is None
+    assert await two_tier.get("plan") == {"tier": "pro"}  # back from Redis
+
+    await two_tier.invalidate("plan")
+    assert await two_tier.get("plan") is None
@@ -0,0 +1,242 @@
+import asyncio
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import exc, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import database, dependencies
+from app.database import (
+    InstrumentedQueuePool,
+    RoutingSession,
+    engine_options,
+    pool_stats,
+)
+from app.models import User
+from app.models._base import AbstractBase
+from app.schemas import auth as auth_schemas
+from app.services import auth as auth_services
+from app.settings import settings
+
+
+def test_engine_options_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(settings, "DB_STATEMENT_CACHE_SIZE", 0)
+    monkeypatch.setattr(settings, "DB_COMMAND_TIMEOUT_SECONDS", 5.0)
+
+    options = engine_options("postgresql+asyncpg://app@db/app")
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == 20
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {
+        "prepared_statement_cache_size": 0,
+        "command_timeout": 5.0,
+    }
+
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+    connect_args = engine_options("postgresql+asyncpg://app@pgbouncer/app")[
+        "connect_args"
+    ]
+    assert connect_args["prepared_statement_cache_size"] == 0
+    assert connect_args["statement_cache_size"] == 0
+    name_statement = connect_args["prepared_statement_name_func"]
+    assert name_statement() != name_statement()
+
+    sqlite = engine_options("sqlite+aiosqlite:///:memory:")
+    assert "pool_size" not in sqlite and "connect_args" not in sqlite
+
+
+def test_sqlite_engine_has_no_pool_stats():
+    assert pool_stats() == {}
+
+
+async def test_pool_counts_waits_and_checkout_timeouts(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    try:
+        async with engine.connect() as held:
+            await held.execute(text("SELECT 1"))
+            stats = engine.pool.stats()
+            assert stats["checked_out"] == 1 and stats["overflow"] == 0
+
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+            # A waiter gets the connection as soon as it's returned.
+            async def wait_for_connection() -> None:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+
+            waiter = asyncio.create_task(wait_for_connection())
+            await asyncio.sleep(0.01)
+        await waiter
+
+        stats = engine.pool.stats()
+        assert stats["checkout_timeouts"] == 1
+        assert stats["waits"] == 2
+        assert stats["wait_ms_max"] >= 50
+        assert stats["checked_out"] == 0 and stats["idle"] == 1
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture
+async def routed(tmp_path, monkeypatch):
+    """A primary and a replica that hold different rows, and a sessionmaker."""
+    primary, replica = (
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}")
+        for name in ("primary.db", "replica.db")
+    )
+    rows = {primary: "primary@example.com", replica: "replica@example.com"}
+    for engine, email in rows.items():
+        async with engine.begin() as conn:
+            await conn.run_sync(AbstractBase.metadata.create_all)
+            await conn.execute(
+                User.__table__.insert().values(email=email, password_hash="x")
+            )
+    # Read-your-writes marks are only kept while replicas are configured.
+    monkeypatch.setattr(database, "replica_engines", [replica])
+    database.recent_writes.clear()
+    yield async_sessionmaker(
+        bind=primary,
+        expire_on_commit=False,
+        sync_session_class=RoutingSession,
+        replicas=[replica],
+    )
+    database.recent_writes.clear()
+    await primary.dispose()
+    await replica.dispose()
+
+
+async def emails(session) -> set[str]:
+    return set((await session.scalars(select(User.email))).all())
+
+
+async def test_reads_go_to_replicas_and_writes_to_the_primary(routed):
+    async with routed() as session:
+        assert await emails(session) == {"replica@example.com"}
+        forced = await session.scalars(
+            select(User.email), bind_arguments={"primary": True}
+        )
+        assert set(forced) == {"primary@example.com"}
+        # Still routed: forcing one read doesn't pin the session.
+        assert await emails(session) == {"replica@example.com"}
+
+        session.add(User(email="new@example.com", password_hash="x"))
+        await session.commit()
+        # After a write the session reads its own changes from the primary.
+        assert await emails(session) == {"primary@example.com", "new@example.com"}
+
+    async with routed() as session:
+        assert await emails(session) == {"replica@example.com"}
+        locked = await session.scalars(select(User.email).with_for_update())
+        assert set(locked) == {"primary@example.com", "new@example.com"}
+
+
+async def test_reads_of_a_recently_written_user_use_the_primary(routed):
+    async with routed() as session:
+        assert await auth_services.get_user("primary@example.com", session) is None
+
+        auth_services.handle_invalidation(
+            {"kind": "principal", "email": "primary@example.com"}
+        )
+        user = await auth_services.get_user("PRIMARY@example.com", session)
+        assert user is not None
+        # Other users are still read from the replica.
+        assert await auth_services.get_user("replica@example.com", session)
+
+    database.recent_writes.clear()  # the window has passed
+    async with routed() as session:
+        assert await auth_services.get_user("primary@example.com", session) is None
+
+
+async def test_lambda_statements_route_like_the_statements_they_build(routed):
+    async with routed() as session:
+        assert await auth_services.get_user("replica@example.com", session)
+        await session.execute(
+            auth_services.set_password_hash("primary@example.com", "y")
+        )
+        # The UPDATE went to the primary, which the session now reads from.
+        assert await emails(session) == {"primary@example.com"}
+
+
+async def test_current_user_row_is_read_from_the_primary(routed):
+    async with routed() as session:
+        row = await session.scalar(
+            select(User).where(User.email == "primary@example.com"),
+            bind_arguments={"primary": True},
+        )
+        principal = auth_schemas.Principal.model_validate(row)
+        session.expunge_all()
+        # The replica doesn't have the row (yet); the primary does.
+        live = await dependencies.get_current_user_row(principal, session)
+        assert live.email == "primary@example.com"
+
+
+def test_query_stats_keep_the_slowest_statements():
+    stats = database.QueryStats()
+    for seconds, statement in [(0.01, "a"), (0.05, "b"), (0.02, "c"), (0.03, "d")]:
+        stats.record(statement, seconds)
+    assert stats.count == 4
+    assert [statement for _, statement in stats.slowest] == ["b", "d", "c"]
+    assert stats.as_dict()["db_time"] == "110.0ms"
+
+
+def test_redacted_parameters_keep_only_types():
+    assert database.redact(("a@example.com", 3)) == ["str", "int"]
+    assert database.redact({"email": "a@example.com"}) == {"email": "str"}
+
+
+async def test_slow_statements_are_logged_with_a_plan(
+    session, user, monkeypatch, query_budget
+):
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_MS", 0.0)
+    monkeypatch.setattr(settings, "DB_SLOW_QUERY_EXPLAIN", True)
+    with patch.object(database.logger, "warning") as warning:
+        with query_budget(1) as queries:  # the EXPLAIN isn't counted
+            await auth_services.get_user(user.email, session)
+
+    assert queries.count == 1 and queries.seconds > 0
+    (entry,), _ = warning.call_args
+    assert entry["parameters"] == ["str"]  # the email itself isn't logged
+    assert user.email.lower() not in str(entry)
+    assert any("uq_users_email_lower" in line for line in entry["plan"])
+
+
+def test_failed_postgres_explain_is_rolled_back_to_a_savepoint():
+    conn = MagicMock()
+    conn.dialect.name = "postgresql"
+    conn.get_execution_options.return_value = {}
+
+    def execute(sql: str, *args: Any) -> None:
+        if sql.startswith("EXPLAIN"):
+            raise RuntimeError("permission denied")
+
+    cursor = conn.connection.cursor.return_value
+    cursor.execute.side_effect = execute
+
+    plan = database.explain(conn, "SELECT 1", ())
+
+    assert plan == ["EXPLAIN failed: permission denied"]
+    assert [call.args[0] for call in cursor.execute.call_args_list] == [
+        "SAVEPOINT explain_plan",
+        "EXPLAIN SELECT 1",
+        "ROLLBACK TO SAVEPOINT explain_plan",
+        "RELEASE SAVEPOINT explain_plan",
+    ]
+    cursor.close.assert_called_once()
+
+
+async def test_query_counts_nest(session):
+    with database.count_queries() as outer:
+        await session.execute(text("SELECT 1"))
+        with database.count_queries() as inner:
+            await session.execute(text("SELECT 2"))
+    assert (outer.count, inner.count) == (2, 1)
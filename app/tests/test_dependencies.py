@@ -6,7 +6,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import dependencies
 from app.models import User as UserDB
+from app.redis_manager import redis_manager
 from app.routers.tests.conftest import access_token  # noqa
+from app.schemas import auth as auth_schemas
 from app.services import auth as auth_services
 
 
@@ -31,20 +33,41 @@ async def test_get_db_yields_session():
 class TestCurrentUserDependency:
     async def test_get_current_user_success(self, access_token, session, user):  # noqa
         # Ensure the user exists in DB and JWT is valid
-        user = await dependencies.get_current_user(access_token, session)
-        assert isinstance(user, UserDB)
-        assert user.email == user.email
+        principal = await dependencies.get_current_user(access_token, session)
+        assert isinstance(principal, auth_schemas.Principal)
+        assert principal.email == user.email
+
+    async def test_get_current_user_caches_principal(
+        self, access_token, session, user  # noqa
+    ):
+        await dependencies.get_current_user(access_token, session)
+        with patch("app.services.auth.get_user") as mock_get_user:
+            principal = await dependencies.get_current_user(access_token, session)
+        mock_get_user.assert_not_called()
+        assert principal.id == user.id
+
+    async def test_get_current_user_row_returns_live_row(self, session, user):
+        principal = auth_schemas.Principal.model_validate(user)
+        row = await dependencies.get_current_user_row(principal, session)
+        assert isinstance(row, UserDB)
+        assert row.id == user.id
 
     async def test_get_current_user_blacklisted_token(
         self, access_token, session  # noqa
     ):  # noqa
-        with patch("app.dependencies.redis_manager.get_json_item") as mock_redis:
-            mock_redis.return_value = {"status": "logged_out"}
+        await auth_services.blacklist_token(access_token)
 
-            with pytest.raises(HTTPException) as exc:
-                await dependencies.get_current_user(access_token, session)
-            assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
-            assert "Invalid or Expired credentials" in exc.value.detail
+        with pytest.raises(HTTPException) as exc:
+            await dependencies.get_current_user(access_token, session)
+        assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
+        assert "Invalid or Expired credentials" in exc.value.detail
+
+    async def test_get_current_user_costs_one_redis_round_trip(
+        self, access_token, session  # noqa
+    ):
+        with redis_manager.count_round_trips() as trips:
+            await dependencies.get_current_user(access_token, session)
+        assert trips.count == 1
 
     async def test_get_current_user_invalid_token(self, session):
         invalid_token = "not-a-real-token"
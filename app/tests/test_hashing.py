@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.hashing import (
+    PasswordHasher,
+    calibrate,
+    check_password,
+    hash_password,
+    hash_rounds,
+    needs_rehash,
+    password_hasher,
+)
+from app.settings import settings
+
+
+async def test_hash_and_verify_run_in_pool():
+    password_hash = await password_hasher.hash("password")
+    assert check_password("password", password_hash)
+    assert await password_hasher.verify("password", password_hash)
+    assert not await password_hasher.verify("wrong-password", password_hash)
+
+
+async def test_full_queue_is_rejected_with_503():
+    hasher = PasswordHasher(max_workers=1, max_queue=0, queue_timeout=5)
+    try:
+        busy = asyncio.create_task(hasher._run(time.sleep, 0.5))
+        await asyncio.sleep(0.05)  # let the first call take the only worker
+
+        with pytest.raises(HTTPException) as err:
+            await hasher._run(time.sleep, 0)
+        assert err.value.status_code == 503
+        await busy
+    finally:
+        hasher.shutdown()
+
+
+async def test_queue_deadline_is_rejected_with_503():
+    hasher = PasswordHasher(max_workers=1, max_queue=4, queue_timeout=0.1)
+    try:
+        busy = asyncio.create_task(hasher._run(time.sleep, 0.5))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(HTTPException) as err:
+            await hasher._run(time.sleep, 0)
+        assert err.value.status_code == 503
+        assert err.value.headers == {"Retry-After": "1"}
+        await busy
+    finally:
+        hasher.shutdown()
+
+
+async def test_cancelled_caller_holds_its_worker_until_the_job_ends():
+    hasher = PasswordHasher(max_workers=1, max_queue=0, queue_timeout=5)
+    try:
+        caller = asyncio.create_task(hasher._run(time.sleep, 1))
+        await asyncio.sleep(0.2)
+        caller.cancel()  # the client went away; the job keeps running
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(HTTPException) as err:
+            await hasher._run(time.sleep, 0)
+        assert err.value.status_code == 503
+
+        await asyncio.sleep(1)
+        await hasher._run(time.sleep, 0)
+    finally:
+        hasher.shutdown()
+
+
+async def test_event_loop_stays_responsive_while_hashing():
+    # A ticker on the loop keeps firing while bcrypt runs in the pool.
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.gather(*(password_hasher.hash("password") for _ in range(2)))
+    task.cancel()
+    assert ticks > 1
+
+
+def test_hash_uses_configured_rounds(monkeypatch):
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    password_hash = hash_password("password")
+    assert hash_rounds(password_hash) == 5
+    assert not needs_rehash(password_hash)
+
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 6)
+    assert needs_rehash(password_hash)
+
+
+def test_calibrate_stops_at_first_cost_over_target():
+    timings = calibrate(target_ms=5, samples=1)
+    assert timings[0][0] == 4
+    assert all(elapsed_ms <= 5 for _, elapsed_ms in timings[:-1])
@@ -1,16 +1,31 @@
 from datetime import datetime
+from unittest.mock import AsyncMock
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 
+from app import main
 from app.main import app
+from app.redis_manager import redis_manager
 
 
+@pytest.mark.usefixtures("redis_server")
 async def test_lifespan():
     # We use ASGITransport to trigger the lifespan events
     async with app.router.lifespan_context(app):
         # assert any item you expect to be on the app instance like a lifespan
-        pass
+        assert redis_manager.pool_stats()["max_connections"] > 0
+    # The pool is closed on shutdown.
+    assert redis_manager.pool_stats() == {}
+
+
+@pytest.mark.usefixtures("redis_server")
+async def test_lifespan_disposes_replica_engines(monkeypatch):
+    replica = AsyncMock()
+    monkeypatch.setattr(main, "replica_engines", [replica])
+    async with app.router.lifespan_context(app):
+        replica.dispose.assert_not_awaited()
+    replica.dispose.assert_awaited_once()
 
 
 async def test_health_endpoint_ok(client):
@@ -21,6 +36,18 @@ async def test_health_endpoint_ok(client):
     assert body["checks"] == {"database": "ok", "redis": "ok"}
 
 
+@pytest.mark.usefixtures("redis_server")
+async def test_health_metrics_endpoint(client):
+    await redis_manager.redis_client.ping()
+    response = await client.get("/health/metrics")
+    assert response.status_code == 200
+    body = response.json()
+    assert "hit_ratio" in body["token_version_cache"]
+    assert "avg_ms" in body["invalidation_lag"]
+    assert "in_use" in body["redis_pool"]
+    assert body["database_pool"] == {}  # SQLite in tests: no sized pool
+
+
 async def test_security_headers_present(client):
     response = await client.get("/health")
     assert response.headers["x-content-type-options"] == "nosniff"
@@ -0,0 +1,118 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from redis.exceptions import ResponseError
+
+from app.cached import cached, invalidate_tags
+from app.limiter import storage_uri
+from app.memory_redis import MemoryRedis, MemoryStore
+from app.redis_manager import redis_manager
+from app.services import auth as auth_services
+from app.settings import settings
+
+
+@pytest.fixture
+def store() -> MemoryStore:
+    return MemoryStore()
+
+
+@pytest.fixture
+async def memory_mode(monkeypatch):
+    await redis_manager.close()
+    monkeypatch.setattr(settings, "REDIS_MODE", "memory")
+    yield redis_manager.open()
+    await redis_manager.close()
+
+
+def test_expiry(store: MemoryStore):
+    with patch("app.memory_redis.time.monotonic", return_value=100.0):
+        store.set("code", "1", ex=10)
+        store.set("counter", 1, ex=10)
+        store.incr("counter")  # keeps the TTL
+        assert store.ttl("code") == store.ttl("counter") == 10
+        store.set("code", "2")  # a plain SET drops it
+        assert store.ttl("code") == -1
+        assert store.ttl("missing") == -2
+
+    with patch("app.memory_redis.time.monotonic", return_value=110.0):
+        assert store.get("counter") is None
+        assert store.get("code") == b"2"
+        assert len(store) == 1
+
+
+def test_set_nx_hashes_and_types(store: MemoryStore):
+    assert store.set("flag", b"", nx=True)
+    assert not store.set("flag", b"x", nx=True)
+
+    assert store.hset("sessions", {"a": "1", "b": "2"}) == 2
+    assert store.hdel("sessions", "a", "missing") == 1
+    assert store.hgetall("sessions") == {b"b": b"2"}
+    store.hdel("sessions", "b")
+    assert store.type("sessions") == "none"  # empty hashes are removed
+
+    with pytest.raises(ResponseError, match="WRONGTYPE"):
+        store.hset("flag", {"a": "1"})
+    assert store.scan("fl*") == [b"flag"]
+
+
+async def test_client_decodes_pipelines_and_pubsub(store: MemoryStore):
+    client = MemoryRedis(store)
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.set("a", 1, ex=60)
+        pipe.incr("a")
+        pipe.delete("a")
+        assert await pipe.execute() == [True, 2, 1]
+
+    await client.set("raw", b"\x00\xff")
+    assert await client.execute_command("GET", "raw", NEVER_DECODE=True) == b"\x00\xff"
+
+    pubsub = client.pubsub()
+    await pubsub.subscribe("events")
+    assert await client.publish("events", '{"kind": "test"}') == 1
+    message = await pubsub.get_message(timeout=1)
+    assert message is not None and message["data"] == '{"kind": "test"}'
+    assert await pubsub.get_message(timeout=0.01) is None
+    await pubsub.aclose()
+    assert await client.publish("events", "unheard") == 0
+
+
+async def test_scripts_run_their_python_versions(memory_mode, user):
+    email = user.email
+    await redis_manager.cache_json_item(
+        auth_services.reset_code_key(email), {"code": "000000"}
+    )
+    results = await asyncio.gather(
+        *(auth_services.consume_code("reset", email, "000000") for _ in range(3))
+    )
+    assert results.count(True) == 1
+
+    family_id = await auth_services.open_session(email, "jti-1", "phone")
+    assert await auth_services.rotate_session(email, family_id, "jti-1", "jti-2") == 1
+    # Replaying the rotated jti ends the family.
+    assert await auth_services.rotate_session(email, family_id, "jti-1", "jti-3") == 0
+    assert await auth_services.rotate_session(email, family_id, "jti-2", "jti-3") == -1
+
+    await redis_manager.redis_client.set(f"token-version-{email}", 3)
+    assert await auth_services.migrate_untagged_keys() == 1
+    assert await redis_manager.get_int(auth_services.token_version_key(email)) == 3
+
+
+async def test_tagged_cache_entries_in_memory_mode(memory_mode):
+    calls = 0
+
+    @cached(key="memory-item-{item_id}", ttl=60, tags=["memory-items"])
+    async def load(item_id: int) -> int:
+        nonlocal calls
+        calls += 1
+        return item_id
+
+    await load(1)
+    await load(1)
+    assert await invalidate_tags("memory-items") == 1
+    await load(1)
+    assert calls == 2
+
+
+async def test_limiter_uses_in_process_storage(memory_mode):
+    assert storage_uri() == "memory://"
@@ -1,10 +1,13 @@
 import uuid
+from unittest.mock import patch
 
+import pytest
 from httpx import ASGITransport, AsyncClient
 
 from app import middlewares
 from app.limiter import limiter
-from app.main import app
+from app.main import app, initiate_app
+from app.routers.tests.conftest import access_token, auth_header  # noqa
 
 
 def make_client(ip: str, host: str = "localhost") -> AsyncClient:
@@ -61,3 +64,48 @@ async def test_rate_limit_returns_429(monkeypatch):
         ]
     assert statuses.count(200) == 3
     assert statuses.count(429) == 2
+
+
+@pytest.fixture
+async def auth_layer_client(monkeypatch):
+    monkeypatch.setattr(middlewares.settings, "AUTH_MIDDLEWARE_ENABLED", True)
+    auth_app = initiate_app()
+    auth_app.dependency_overrides = app.dependency_overrides
+    transport = ASGITransport(app=auth_app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+async def test_auth_layer_resolves_principal_before_routing(
+    auth_layer_client: AsyncClient, auth_header: dict[str, str]  # noqa: F811
+):
+    with patch("app.dependencies.get_current_user") as mock_get_current_user:
+        response = await auth_layer_client.get("/v1/auth/me", headers=auth_header)
+    assert response.status_code == 200
+    # The middleware attached the principal, so the Depends chain never ran.
+    mock_get_current_user.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [{}, {"Authorization": "Bearer not-a-real-token"}, {"Authorization": "Basic x"}],
+)
+async def test_auth_layer_rejects_bad_tokens_before_routing(
+    auth_layer_client: AsyncClient, headers: dict[str, str]
+):
+    response = await auth_layer_client.post(
+        "/v1/auth/logout", headers=headers, json={"refresh_token": "x" * 32}
+    )
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+    assert response.json()["path"] == "/v1/auth/logout"
+
+
+async def test_access_log_reports_queries_and_round_trips(client: AsyncClient):
+    with patch.object(middlewares.logger, "info") as info:
+        response = await client.get("/health")
+    assert response.status_code == 200
+    (entry,), _ = info.call_args
+    assert entry["db_queries"] == 1  # SELECT 1
+    assert entry["slowest_queries"][0]["statement"] == "SELECT 1"
+    assert "redis_round_trips" in entry
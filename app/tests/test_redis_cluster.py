@@ -0,0 +1,91 @@
+"""
+Runs the per-user Redis flows against a real multi-node cluster, to prove each
+user's keys stay on one node. Skipped unless REDIS_CLUSTER_TEST_NODES lists the
+nodes of a local cluster ("host:port,host:port,..."); see `make test-redis-cluster`.
+"""
+import json
+import os
+
+import pytest
+from redis.asyncio.cluster import RedisCluster
+
+from app.redis_manager import redis_manager
+from app.services import auth as auth_services
+from app.settings import settings
+
+CLUSTER_NODES = [
+    node for node in os.environ.get("REDIS_CLUSTER_TEST_NODES", "").split(",") if node
+]
+
+pytestmark = pytest.mark.skipif(
+    not CLUSTER_NODES, reason="REDIS_CLUSTER_TEST_NODES is not set"
+)
+
+
+@pytest.fixture
+async def cluster(monkeypatch):
+    await redis_manager.close()
+    monkeypatch.setattr(settings, "REDIS_MODE", "cluster")
+    monkeypatch.setattr(settings, "REDIS_CLUSTER_NODES", CLUSTER_NODES)
+    client = redis_manager.open()
+    await client.initialize()
+    yield client
+    await redis_manager.close()
+
+
+async def test_user_keys_live_on_one_node(cluster: RedisCluster):
+    assert len(cluster.get_primaries()) > 1
+    email = "cluster@example.com"
+    keys = [
+        auth_services.token_version_key(email),
+        auth_services.reset_code_key(email),
+        auth_services.failed_attempts_key("reset", email),
+        auth_services.sessions_key(email),
+    ]
+    nodes = set()
+    for key in keys:
+        node = cluster.get_node_from_key(key)
+        assert node is not None
+        nodes.add(node.name)
+    assert len(nodes) == 1
+
+
+async def test_scripts_and_multi_key_reads_run_in_cluster(cluster: RedisCluster):
+    email = "cluster@example.com"
+    await redis_manager.load_scripts()
+    await redis_manager.cache_json_item(
+        auth_services.reset_code_key(email), {"code": "000000"}
+    )
+    assert not await auth_services.consume_code("reset", email, "999999")
+    assert await auth_services.consume_code("reset", email, "000000")
+
+    token = auth_services.create_access_token({"sub": email, "ver": 0})
+    payload = auth_services.decode_access_token(token)
+    await auth_services.blacklist_token(token)
+    assert await auth_services.get_token_state(token, payload) == (True, 0)
+
+
+async def test_publish_reaches_subscribers_in_cluster(cluster: RedisCluster):
+    pubsub = redis_manager.pubsub()
+    await pubsub.subscribe("events")
+    await redis_manager.publish("events", {"kind": "test"})
+    message = None
+    for _ in range(10):  # the first reply is the subscribe confirmation
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.5)
+        if message is not None:
+            break
+    await pubsub.aclose()
+    assert message is not None and json.loads(message["data"]) == {"kind": "test"}
+
+
+async def test_session_and_principal_invalidation_publish_in_cluster(
+    cluster: RedisCluster,
+):
+    email = "cluster-invalidation@example.com"
+    key = auth_services.token_version_key(email)
+    await cluster.delete(key)
+    # Both batch a PUBLISH, which a cluster pipeline refuses.
+    await auth_services.invalidate_all_sessions(email)
+    await auth_services.invalidate_principal(email)
+    assert int(await cluster.get(key) or 0) == 1
+    await cluster.delete(key)
@@ -1,4 +1,12 @@
+import asyncio
+import json
+
+import pytest
+import redis.asyncio as redis
+
 from app.redis_manager import redis_manager
+from app.serializers import get_serializer
+from app.settings import settings
 
 
 async def test_cache_and_get_json_item_method():
@@ -12,3 +20,206 @@ async def test_delete_key_method():
     await redis_manager.delete_key("test_item")
     test_item = await redis_manager.get_json_item("test_item")
     assert test_item is None
+
+
+async def test_get_many_method():
+    await redis_manager.cache_json_item("test-item", {"item": 41})
+    values = await redis_manager.get_many("test-item", "missing-test-item")
+    assert values == ['{"item": 41}', None]
+
+    raw = await redis_manager.get_many("test-item", "missing-test-item", decode=False)
+    assert raw == [b'{"item": 41}', None]
+
+
+async def test_json_item_written_as_text_reads_with_any_serializer(monkeypatch):
+    pytest.importorskip("msgpack")
+    await redis_manager.cache_json_item("test-serialized-item", {"item": 41})
+    monkeypatch.setattr(redis_manager, "serializer", get_serializer("msgpack"))
+    assert await redis_manager.get_json_item("test-serialized-item") == {"item": 41}
+
+    await redis_manager.cache_json_item("test-serialized-item", {"item": 42})
+    (raw,) = await redis_manager.get_many("test-serialized-item", decode=False)
+    assert raw[:1] != b"{"  # stored as msgpack now
+    assert await redis_manager.get_json_item("test-serialized-item") == {"item": 42}
+    await redis_manager.delete_key("test-serialized-item")
+
+
+async def test_count_round_trips():
+    with redis_manager.count_round_trips() as outer:
+        await redis_manager.get_int("test-counter")
+        with redis_manager.count_round_trips() as inner:
+            await redis_manager.get_many("test-item", "test-counter")
+    # Nested blocks roll up into the enclosing counter.
+    assert inner.count == 1
+    assert outer.count == 2
+
+
+async def test_run_script_method():
+    redis_manager.register_script(
+        "test-echo",
+        "return ARGV[1] .. KEYS[1]",
+        local=lambda store, keys, args: args[0] + keys[0],
+    )
+    await redis_manager.load_scripts()
+    with redis_manager.count_round_trips() as trips:
+        assert await redis_manager.run_script("test-echo", ["b"], ["a"]) == "ab"
+    assert trips.count == 1
+
+
+@pytest.mark.usefixtures("redis_server")
+async def test_run_script_reloads_after_script_flush():
+    redis_manager.register_script(
+        "test-echo",
+        "return ARGV[1] .. KEYS[1]",
+        local=lambda store, keys, args: args[0] + keys[0],
+    )
+    await redis_manager.redis_client.script_flush()
+    assert await redis_manager.run_script("test-echo", ["b"], ["a"]) == "ab"
+    # The EVAL fallback cached it again, so EVALSHA hits from now on.
+    with redis_manager.count_round_trips() as trips:
+        await redis_manager.run_script("test-echo", ["d"], ["c"])
+    assert trips.count == 1
+
+
+async def test_set_if_absent_method():
+    await redis_manager.delete_key("test-flag")
+    assert await redis_manager.set_if_absent("test-flag", ttl=60) is True
+    assert await redis_manager.set_if_absent("test-flag", ttl=60) is False
+
+
+@pytest.mark.usefixtures("redis_server")
+async def test_pool_is_built_from_settings(monkeypatch):
+    await redis_manager.close()
+    monkeypatch.setattr(settings, "REDIS_MAX_CONNECTIONS", 3)
+    await redis_manager.redis_client.ping()
+    stats = redis_manager.pool_stats()
+    assert stats["max_connections"] == 3
+    assert stats["open"] == 1
+    assert stats["in_use"] == 0
+
+
+@pytest.mark.usefixtures("redis_server")
+async def test_exhausted_pool_fails_after_wait_timeout(monkeypatch):
+    await redis_manager.close()
+    monkeypatch.setattr(settings, "REDIS_MAX_CONNECTIONS", 1)
+    monkeypatch.setattr(settings, "REDIS_POOL_TIMEOUT_SECONDS", 0.05)
+    pool = redis_manager.open().connection_pool
+    held = await pool.get_connection()
+    try:
+        with pytest.raises(redis.ConnectionError):
+            await redis_manager.get_int("test-counter")
+        assert redis_manager.pool_stats()["wait_timeouts"] == 1
+    finally:
+        await pool.release(held)
+
+
+@pytest.fixture
+async def client_cache(monkeypatch, redis_server):
+    await redis_manager.close()
+    monkeypatch.setattr(settings, "REDIS_CLIENT_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "REDIS_CLIENT_CACHE_SIZE", 3)
+    await redis_manager.start_client_cache()
+    assert redis_manager.client_cache and redis_manager.client_cache.active
+    other = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    yield other
+    await other.aclose()
+
+
+async def test_client_cache_serves_repeated_reads(client_cache: redis.Redis):
+    await client_cache.set("test-cached", 1)
+    assert await redis_manager.get_int("test-cached") == 1
+    with redis_manager.count_round_trips() as trips:
+        assert await redis_manager.get_int("test-cached") == 1
+        assert await redis_manager.get_many("test-cached") == ["1"]
+    assert trips.count == 0
+
+
+async def test_client_cache_is_invalidated_by_other_clients(
+    client_cache: redis.Redis,
+):
+    await client_cache.set("test-cached", 1)
+    assert await redis_manager.get_int("test-cached") == 1
+
+    await client_cache.set("test-cached", 2)
+    # The invalidation arrives asynchronously, on the listener connection.
+    for _ in range(100):
+        if await redis_manager.get_int("test-cached") == 2:
+            break
+        await asyncio.sleep(0.01)
+    assert await redis_manager.get_int("test-cached") == 2
+
+    # Missing keys are cached (and invalidated) too, including raw-byte keys.
+    key = b"test-rv:" + bytes.fromhex("ff" * 16)
+    await client_cache.delete(key)
+    assert await redis_manager.get_many(key) == [None]
+    await client_cache.set(key, b"")
+    for _ in range(100):
+        if await redis_manager.get_many(key) == [""]:
+            break
+        await asyncio.sleep(0.01)
+    assert await redis_manager.get_many(key) == [""]
+
+
+async def test_client_cache_is_bounded(client_cache: redis.Redis):
+    for n in range(5):
+        await redis_manager.get_int(f"test-cached-{n}")
+    assert redis_manager.client_cache is not None
+    assert len(redis_manager.client_cache.values) == 3
+
+
+async def test_batch_sends_one_pipeline_with_typed_results():
+    await redis_manager.delete_keys("test-batch-counter", "test-batch-flag")
+    with redis_manager.count_round_trips() as trips:
+        async with redis_manager.batch() as batch:
+            first = batch.increment("test-batch-counter")
+            second = batch.increment("test-batch-counter")
+            batch.set_flag("test-batch-flag", ttl=60)
+            deleted = batch.delete_keys("test-batch-flag", "test-batch-counter")
+            with pytest.raises(RuntimeError):
+                assert first.value  # not sent yet
+    assert trips.count == 1
+    assert (first.value, second.value, deleted.value) == (1, 2, 2)
+
+
+async def test_nested_batches_join_the_outermost():
+    with redis_manager.count_round_trips() as trips:
+        async with redis_manager.batch() as outer:
+            async with redis_manager.batch() as inner:
+                assert inner is outer
+                result = inner.increment("test-batch-nested")
+            assert await redis_manager.get_int("test-batch-nested") == 0
+    assert trips.count == 2  # the read above, then the batch
+    assert result.value == 1
+    await redis_manager.delete_keys("test-batch-nested")
+
+
+async def test_batch_is_dropped_when_the_block_raises():
+    with pytest.raises(ValueError), redis_manager.count_round_trips() as trips:
+        async with redis_manager.batch() as batch:
+            batch.increment("test-batch-dropped")
+            raise ValueError
+    assert trips.count == 0
+    assert await redis_manager.get_int("test-batch-dropped") == 0
+
+
+async def test_cluster_batch_publishes_after_the_pipeline(monkeypatch):
+    # A cluster pipeline refuses PUBLISH, so batches send it on its own.
+    monkeypatch.setattr(type(redis_manager), "is_clustered", True)
+    await redis_manager.delete_keys("test-batch-published")
+    pubsub = redis_manager.pubsub()
+    await pubsub.subscribe("test-batch-events")
+    with redis_manager.count_round_trips() as trips:
+        async with redis_manager.batch() as batch:
+            counter = batch.increment("test-batch-published")
+            reached = batch.publish("test-batch-events", {"kind": "test"})
+    assert trips.count == 2  # the pipeline, then the PUBLISH
+    assert (counter.value, reached.value) == (1, 1)
+
+    message = None
+    for _ in range(10):  # the first reply may be the subscribe confirmation
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.5)
+        if message is not None:
+            break
+    await pubsub.aclose()
+    assert message is not None and json.loads(message["data"]) == {"kind": "test"}
+    await redis_manager.delete_keys("test-batch-published")
@@ -0,0 +1,31 @@
+import json
+import sys
+
+import pytest
+
+from app.serializers import SERIALIZERS, get_serializer
+
+PAYLOAD = {"code": "042133", "attempts": 2, "nested": {"ok": True, "tags": ["a"]}}
+
+
+@pytest.fixture(params=list(SERIALIZERS))
+def serializer(request):
+    if request.param != "json":
+        pytest.importorskip(request.param)
+    return get_serializer(request.param)
+
+
+def test_round_trip(serializer):
+    raw = serializer.dumps(PAYLOAD)
+    assert isinstance(raw, bytes)
+    assert serializer.loads(raw) == PAYLOAD
+
+
+def test_reads_values_written_as_json_text(serializer):
+    assert serializer.loads(json.dumps(PAYLOAD).encode()) == PAYLOAD
+
+
+def test_missing_package_is_reported(monkeypatch):
+    monkeypatch.setitem(sys.modules, "msgpack", None)
+    with pytest.raises(RuntimeError, match="pip install msgpack"):
+        get_serializer("msgpack")
@@ -0,0 +1,76 @@
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+
+from app.signing_keys import KeyRing
+
+SECRET = "s" * 64
+
+
+def pem(private_key) -> str:
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+@pytest.fixture
+def ed_pem() -> str:
+    return pem(ed25519.Ed25519PrivateKey.generate())
+
+
+@pytest.fixture
+def ec_pem() -> str:
+    return pem(ec.generate_private_key(ec.SECP256R1()))
+
+
+def test_signs_with_active_key_and_kid(ed_pem):
+    ring = KeyRing({"k1": ed_pem}, "k1", SECRET)
+    token = ring.encode({"sub": "a@example.com"})
+    assert jwt.get_unverified_header(token) == {
+        "alg": "EdDSA",
+        "kid": "k1",
+        "typ": "JWT",
+    }
+    assert ring.decode(token) == {"sub": "a@example.com"}
+
+
+def test_overlapping_rotation_accepts_tokens_from_both_keys(ed_pem, ec_pem):
+    old = KeyRing({"k1": ed_pem}, "k1", SECRET)
+    old_token = old.encode({"sub": "a@example.com"})
+
+    rotated = KeyRing({"k1": ed_pem, "k2": ec_pem}, "k2", SECRET)
+    new_token = rotated.encode({"sub": "a@example.com"})
+
+    assert jwt.get_unverified_header(new_token)["alg"] == "ES256"
+    assert rotated.decode(old_token) == rotated.decode(new_token)
+    assert [key["kid"] for key in rotated.jwks()["keys"]] == ["k1", "k2"]
+
+
+def test_hs256_tokens_accepted_only_during_migration(ed_pem):
+    legacy = jwt.encode({"sub": "a@example.com"}, SECRET, algorithm="HS256")
+
+    migrating = KeyRing({"k1": ed_pem}, "k1", SECRET, accept_hs256=True)
+    assert migrating.decode(legacy) == {"sub": "a@example.com"}
+
+    migrated = KeyRing({"k1": ed_pem}, "k1", SECRET, accept_hs256=False)
+    with pytest.raises(jwt.InvalidTokenError):
+        migrated.decode(legacy)
+
+
+def test_unknown_kid_is_rejected(ed_pem):
+    other_pem = pem(ed25519.Ed25519PrivateKey.generate())
+    stranger = KeyRing({"other": other_pem}, "other", "")
+    token = stranger.encode({"sub": "a@example.com"})
+    with pytest.raises(jwt.InvalidTokenError):
+        KeyRing({"k1": ed_pem}, "k1", SECRET).decode(token)
+
+
+def test_jwks_exposes_public_keys_only(ed_pem):
+    [jwk] = KeyRing({"k1": ed_pem}, "k1", SECRET).jwks()["keys"]
+    assert jwk["kty"] == "OKP"
+    assert jwk["kid"] == "k1"
+    assert jwk["use"] == "sig"
+    assert "d" not in jwk
@@ -0,0 +1,58 @@
+"""
+Compare `/v1/auth/me` served through the Depends chain (oauth2_scheme ->
+get_db -> get_current_user) against the pure-ASGI AuthenticationMiddleware.
+
+Runs in-process over ASGITransport, so it measures framework overhead without
+network noise; it still needs the configured database and Redis, and an
+existing verified user:
+
+    python -m benchmarks.auth_layer --email user@example.com --password password
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import ASGITransport, AsyncClient
+
+from app.limiter import limiter
+from app.main import initiate_app
+from app.settings import settings
+
+
+async def run(middleware: bool, form: dict, requests: int) -> list[float]:
+    settings.AUTH_MIDDLEWARE_ENABLED = middleware
+    transport = ASGITransport(app=initiate_app())
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        token = (await client.post("/v1/auth/token", data=form)).json()
+        header = {"Authorization": f"Bearer {token['access_token']}"}
+        for _ in range(100):  # warm the caches
+            await client.get("/v1/auth/me", headers=header)
+
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get("/v1/auth/me", headers=header)
+            samples.append((time.perf_counter() - start) * 1e6)
+            assert response.status_code == 200
+    return samples
+
+
+async def main(args: argparse.Namespace) -> None:
+    limiter.enabled = False
+    form = {"username": args.email, "password": args.password}
+    for label, middleware in (("depends", False), ("asgi layer", True)):
+        samples = sorted(await run(middleware, form, args.requests))
+        print(
+            f"{label:<11} mean={statistics.fmean(samples):8.1f}us "
+            f"p50={samples[len(samples) // 2]:8.1f}us "
+            f"p99={samples[int(len(samples) * 0.99)]:8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--requests", type=int, default=5_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""
+Load test: backend calls for one hot key under a thundering herd, through
+@cached versus a hand-rolled get_json_item / cache_json_item read-through.
+
+Each worker process runs --clients concurrent callers in a tight loop for
+--seconds; the backend takes --load-ms. The ideal is one backend call per TTL
+period in total, however many workers and callers there are; early refreshes
+land a little before expiry, so expect slightly more than one. Needs the app's
+Redis (the key is namespaced and removed afterwards):
+
+    python -m benchmarks.cache_stampede --workers 4 --clients 40 --ttl 5
+"""
+import argparse
+import asyncio
+import multiprocessing
+import secrets
+import time
+from typing import Any, cast
+
+import redis
+
+from app.cached import CACHE_KEY_PREFIX, cached
+from app.redis_manager import redis_manager
+from app.settings import settings
+
+
+async def herd(
+    args: argparse.Namespace, key: str, naive: bool, prime: bool = False
+) -> None:
+    calls_key = key + "-calls"
+
+    async def backend() -> dict:
+        await redis_manager.increment(calls_key)
+        await asyncio.sleep(args.load_ms / 1000)
+        return {"value": 42}
+
+    decorated = cached(key=key, ttl=args.ttl)(backend)
+
+    async def read_through() -> dict:
+        value = await redis_manager.get_json_item(key)
+        if value is None:
+            value = await backend()
+            await redis_manager.cache_json_item(key, value, ttl=args.ttl)
+        return value
+
+    read = read_through if naive else decorated
+    deadline = time.monotonic() + args.seconds
+
+    async def client() -> None:
+        while time.monotonic() < deadline:
+            await read()
+
+    if prime:
+        await read()
+    else:
+        await asyncio.gather(*(client() for _ in range(args.clients)))
+    await redis_manager.close()
+
+
+def worker(
+    args: argparse.Namespace, key: str, naive: bool, ready: Any, go: Any
+) -> None:
+    ready.wait()
+    go.wait()
+    asyncio.run(herd(args, key, naive))
+
+
+def run(args: argparse.Namespace, naive: bool) -> int:
+    key = f"bench-stampede-{secrets.token_hex(4)}"
+    context = multiprocessing.get_context("spawn")
+    ready, go = context.Barrier(args.workers + 1), context.Event()
+    workers = [
+        context.Process(target=worker, args=(args, key, naive, ready, go))
+        for _ in range(args.workers)
+    ]
+    for process in workers:
+        process.start()
+    # Steady state: once every worker is up, the herd starts on a cached key.
+    ready.wait()
+    asyncio.run(herd(args, key, naive, prime=True))
+    go.set()
+    for process in workers:
+        process.join()
+
+    client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+    # The synchronous client: the reply itself, not an awaitable.
+    calls = int(cast(bytes | None, client.get(key + "-calls")) or 0)
+    client.delete(key, CACHE_KEY_PREFIX + key, key + "-calls")
+    return calls
+
+
+def main(args: argparse.Namespace) -> None:
+    periods = args.seconds / args.ttl
+    print(f"{'mode':<12} {'backend calls':>14} {'per key per TTL':>16}")
+    for label, naive in (("read-through", True), ("@cached", False)):
+        calls = run(args, naive)
+        print(f"{label:<12} {calls:>14} {calls / periods:>16.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--ttl", type=int, default=5)
+    parser.add_argument("--load-ms", type=float, default=50.0)
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+"""
+Microbenchmark: full jwt.decode on every request versus the verified-token
+cache used by get_current_user, across token reuse ratios.
+
+A reuse ratio of 0.95 means 95% of requests present a token the worker has
+already seen (a client reusing its access token for its whole lifespan).
+
+    python -m benchmarks.jwt_verify_cache --requests 200000
+"""
+import argparse
+import hashlib
+import random
+import secrets
+import time
+
+import jwt
+
+from app.cache import TTLCache
+
+SECRET = secrets.token_urlsafe(64)
+
+
+def mint() -> str:
+    return jwt.encode(
+        {
+            "sub": f"user-{secrets.token_hex(4)}@example.com",
+            "ver": 0,
+            "exp": int(time.time()) + 900,
+            "type": "access",
+            "jti": secrets.token_hex(16),
+        },
+        SECRET,
+        algorithm="HS256",
+    )
+
+
+def workload(requests: int, reuse: float) -> list[str]:
+    rng = random.Random(42)
+    seen: list[str] = []
+    tokens = []
+    for _ in range(requests):
+        if seen and rng.random() < reuse:
+            tokens.append(rng.choice(seen))
+        else:
+            token = mint()
+            seen.append(token)
+            tokens.append(token)
+    return tokens
+
+
+def plain(tokens: list[str]) -> float:
+    start = time.perf_counter()
+    for token in tokens:
+        jwt.decode(token, SECRET, algorithms=["HS256"])
+    return time.perf_counter() - start
+
+
+def cached(tokens: list[str]) -> float:
+    cache: TTLCache[dict] = TTLCache(max_entries=10_000)
+    start = time.perf_counter()
+    for token in tokens:
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        payload = cache.get(digest)
+        if payload is None:
+            payload = jwt.decode(token, SECRET, algorithms=["HS256"])
+            cache.set(digest, payload, ttl=payload["exp"] - time.time())
+    return time.perf_counter() - start
+
+
+def main(args: argparse.Namespace) -> None:
+    print(f"{'reuse':>6} {'plain us/req':>13} {'cached us/req':>14} {'speedup':>8}")
+    for reuse in args.reuse:
+        tokens = workload(args.requests, reuse)
+        base = plain(tokens) / args.requests * 1e6
+        fast = cached(tokens) / args.requests * 1e6
+        print(f"{reuse:>6.2f} {base:>13.2f} {fast:>14.2f} {base / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--reuse", type=float, nargs="+", default=[0.0, 0.5, 0.9, 0.99])
+    main(parser.parse_args())
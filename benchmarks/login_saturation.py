@@ -0,0 +1,88 @@
+"""
+Measure `/v1/auth/me` latency while `/v1/auth/token` traffic saturates the
+password-hashing pool.
+
+Run against a live server (rate limiting relaxed or disabled for the test):
+
+    python -m benchmarks.login_saturation --base-url http://127.0.0.1:8000 \\
+        --email user@example.com --password password
+
+Before bcrypt moved off the event loop, the "under load" p99 grew with the
+login concurrency; with the pool it should stay close to the idle baseline.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def probe_me(
+    client: httpx.AsyncClient, header: dict, duration: float
+) -> list[float]:
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get("/v1/auth/me", headers=header)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def hammer_login(
+    client: httpx.AsyncClient, form: dict, duration: float
+) -> dict[int, int]:
+    statuses: dict[int, int] = {}
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        response = await client.post("/v1/auth/token", data=form)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return statuses
+
+
+def report(label: str, samples: list[float]) -> None:
+    print(
+        f"{label:<12} n={len(samples):<6} "
+        f"p50={statistics.median(samples):7.2f}ms "
+        f"p99={percentile(samples, 99):7.2f}ms "
+        f"max={max(samples):7.2f}ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    form = {"username": args.email, "password": args.password}
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30) as client:
+        token = (await client.post("/v1/auth/token", data=form)).json()
+        header = {"Authorization": f"Bearer {token['access_token']}"}
+
+        report("idle", await probe_me(client, header, args.duration))
+
+        login_tasks = [
+            asyncio.create_task(hammer_login(client, form, args.duration))
+            for _ in range(args.login_concurrency)
+        ]
+        loaded = await probe_me(client, header, args.duration)
+        statuses: dict[int, int] = {}
+        for result in await asyncio.gather(*login_tasks):
+            for code, count in result.items():
+                statuses[code] = statuses.get(code, 0) + count
+
+        report("under load", loaded)
+        print(f"login responses: {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--login-concurrency", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
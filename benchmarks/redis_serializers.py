@@ -0,0 +1,79 @@
+"""
+Microbenchmark: encode/decode cost and stored size of the REDIS_SERIALIZER
+codecs, for the value shapes the app keeps in Redis.
+
+"json (text)" is the path before serializers: json.dumps to str, then on read a
+UTF-8 decode (decode_responses=True) before json.loads. Codecs whose package
+isn't installed are skipped.
+
+    python -m benchmarks.redis_serializers --rounds 200000
+"""
+import argparse
+import json
+import secrets
+import time
+from datetime import UTC, datetime
+from functools import partial
+from typing import Any, Callable
+
+from app.serializers import SERIALIZERS, get_serializer
+
+NOW = int(time.time())
+PAYLOADS: dict[str, dict[str, Any]] = {
+    # cache_json_item: activation / reset codes.
+    "code": {"code": "042133"},
+    # Legacy revocation entries (full JWT as key).
+    "revocation": {"timestamp": str(datetime.now(UTC))},
+    # One refresh-token family in a user's session registry.
+    "session": {
+        "jti": secrets.token_hex(16),
+        "device": "Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/128.0",
+        "created_at": NOW,
+        "last_used_at": NOW,
+        "expires_at": NOW + 7 * 24 * 3600,
+    },
+}
+
+
+def per_call_ns(func: Callable[[], Any], rounds: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter_ns() - start) / rounds
+
+
+Codec = tuple[Callable[[Any], Any], Callable[[Any], Any]]
+
+
+def codecs() -> dict[str, Codec]:
+    found: dict[str, Codec] = {
+        "json (text)": (json.dumps, lambda raw: json.loads(raw.decode()))
+    }
+    for name in SERIALIZERS:
+        try:
+            serializer = get_serializer(name)
+        except RuntimeError as exc:
+            print(f"skipping {name}: {exc}")
+            continue
+        found[name] = (serializer.dumps, serializer.loads)
+    return found
+
+
+def main(args: argparse.Namespace) -> None:
+    available = codecs()
+    header = f"{'payload':<11} {'codec':<12} {'encode ns':>10} {'decode ns':>10}"
+    print(f"{header} {'bytes':>6}")
+    for label, payload in PAYLOADS.items():
+        for name, (dumps, loads) in available.items():
+            stored = dumps(payload)
+            raw = stored.encode() if isinstance(stored, str) else stored
+            encode = per_call_ns(partial(dumps, payload), args.rounds)
+            decode = per_call_ns(partial(loads, raw), args.rounds)
+            row = f"{label:<11} {name:<12} {encode:>10.0f} {decode:>10.0f}"
+            print(f"{row} {len(raw):>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=200_000)
+    main(parser.parse_args())
@@ -0,0 +1,76 @@
+"""
+Compare Redis memory for N token revocations stored the legacy way (the full
+JWT as key, a JSON timestamp as value) against compact jti keys.
+
+Uses a scratch logical database which it FLUSHES before and after each run:
+
+    python -m benchmarks.revocation_memory --count 1000000 --db 15
+"""
+import argparse
+import json
+import secrets
+import time
+from datetime import UTC, datetime
+from typing import Any, cast
+
+import jwt
+import redis
+
+REVOKED_TOKEN_PREFIX = b"rv:"
+TTL = 60 * 60
+
+
+def sample_token(jti: str) -> str:
+    # Same claim shape as create_access_token / create_refresh_token.
+    claims = {
+        "sub": f"user-{secrets.token_hex(4)}@example.com",
+        "ver": 3,
+        "exp": int(time.time()) + TTL,
+        "type": "refresh",
+        "jti": jti,
+    }
+    return jwt.encode(claims, secrets.token_urlsafe(64), algorithm="HS256")
+
+
+def used_memory(client: redis.Redis) -> int:
+    # The synchronous client: the result is the reply itself, not an awaitable.
+    info = cast(dict[str, Any], client.info("memory"))
+    return int(info["used_memory"])
+
+
+def fill(client: redis.Redis, count: int, legacy: bool, batch: int = 10_000) -> int:
+    client.flushdb()
+    baseline = used_memory(client)
+    timestamp = json.dumps({"timestamp": str(datetime.now(UTC))})
+    for start in range(0, count, batch):
+        pipe = client.pipeline(transaction=False)
+        for _ in range(min(batch, count - start)):
+            jti = secrets.token_hex(16)
+            if legacy:
+                pipe.set(sample_token(jti), timestamp, ex=TTL)
+            else:
+                pipe.set(REVOKED_TOKEN_PREFIX + bytes.fromhex(jti), b"", ex=TTL)
+        pipe.execute()
+    grown = used_memory(client) - baseline
+    client.flushdb()
+    return grown
+
+
+def main(args: argparse.Namespace) -> None:
+    client = redis.Redis(host=args.host, port=args.port, db=args.db)
+    legacy = fill(client, args.count, legacy=True)
+    compact = fill(client, args.count, legacy=False)
+    print(f"revocations:  {args.count:,}")
+    for label, grown in (("legacy keys", legacy), ("jti keys", compact)):
+        per_entry = grown / args.count
+        print(f"{label + ':':<13} {grown / 2**20:8.1f} MiB ({per_entry:.0f} B each)")
+    print(f"saving:       {1 - compact / legacy:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=15)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    main(parser.parse_args())
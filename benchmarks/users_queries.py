@@ -0,0 +1,91 @@
+"""
+Microbenchmark: per-call overhead of the hot users statements, built afresh
+with select()/update() (before) and as the lambda statements in
+app.services.auth (after).
+
+"build + key" is constructing the statement and generating the cache key
+SQLAlchemy looks its compiled SQL up by, which happens on every execution;
+"execute" is a whole session.execute. "compile" is the one-off cost a cache
+miss pays. Against the default in-memory SQLite, execute is almost all Python
+overhead; pass --url to measure a real database (already migrated: only an
+absent email is queried and updated).
+
+    python -m benchmarks.users_queries --rounds 20000
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Callable
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models import User
+from app.models._base import AbstractBase
+from app.services.auth import email_matches, set_password_hash, user_by_email
+
+EMAIL = "bench-absent@example.com"
+
+
+def select_before(email: str) -> Any:
+    return select(User).where(email_matches(email))
+
+
+def update_before(email: str, password_hash: str) -> Any:
+    return (
+        update(User)
+        .where(email_matches(email))
+        .values(password_hash=password_hash)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+STATEMENTS: dict[str, Callable[[], Any]] = {
+    "select (before)": lambda: select_before(EMAIL),
+    "select lambda": lambda: user_by_email(EMAIL),
+    "update (before)": lambda: update_before(EMAIL, "x"),
+    "update lambda": lambda: set_password_hash(EMAIL, "x"),
+}
+
+
+def per_call_us(func: Callable[[], Any], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) * 1e6 / rounds
+
+
+async def execute_us(sessions: Any, build: Callable[[], Any], rounds: int) -> float:
+    async with sessions() as session:
+        await session.execute(build())  # compile once, as a warm worker would
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await session.execute(build())
+        elapsed = time.perf_counter() - start
+        await session.rollback()
+    return elapsed * 1e6 / rounds
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_async_engine(args.url)
+    if args.url.startswith("sqlite"):
+        async with engine.begin() as conn:
+            await conn.run_sync(AbstractBase.metadata.create_all)
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+    dialect = engine.dialect
+
+    header = f"{'statement':<16} {'build + key us':>15} {'execute us':>11}"
+    print(f"{header} {'compile us':>11}")
+    for label, build in STATEMENTS.items():
+        key = per_call_us(lambda: build()._generate_cache_key(), args.rounds)
+        compile_ = per_call_us(lambda: build().compile(dialect=dialect), 200)
+        execute = await execute_us(sessions, build, args.rounds // 10)
+        print(f"{label:<16} {key:>15.1f} {execute:>11.1f} {compile_:>11.1f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite+aiosqlite:///:memory:")
+    parser.add_argument("--rounds", type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
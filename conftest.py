@@ -1,5 +1,6 @@
 import typing
-from typing import AsyncGenerator
+from contextlib import contextmanager
+from typing import AsyncGenerator, Iterator
 from unittest.mock import AsyncMock, patch
 
 import pytest
@@ -7,11 +8,14 @@ from httpx import ASGITransport, AsyncClient
 from sqlalchemy import StaticPool
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from app.database import QueryStats, count_queries
 from app.dependencies import get_db
 from app.limiter import limiter
 from app.main import app
 from app.models._base import AbstractBase
 from app.redis_manager import redis_manager
+from app.services import auth as auth_services
+from app.settings import settings
 
 # The rate limiter uses an in-memory, IP-keyed counter shared across the whole
 # test session; disable it so unrelated tests don't exhaust each other's quota.
@@ -52,9 +56,45 @@ async def run_migrations():
 async def close_redis_connections():
     # redis.asyncio pools connections bound to the running event loop. Because
     # pytest-asyncio gives each test a fresh loop, close the pool after every
-    # test so the next one reconnects instead of reusing a closed-loop socket.
+    # test so the next one opens a new pool instead of reusing a closed-loop
+    # socket.
     yield
-    await redis_manager.redis_client.aclose()
+    await redis_manager.close()
+
+
+@pytest.fixture
+def query_budget():
+    """
+    `with query_budget(n) as queries:` fails the test if the block runs more
+    than n SQL statements; `queries.statements` lists them.
+    """
+
+    @contextmanager
+    def budget(max_queries: int) -> Iterator[QueryStats]:
+        with count_queries(keep_statements=True) as queries:
+            yield queries
+        assert (
+            queries.count <= max_queries
+        ), f"{queries.count} queries, budget {max_queries}: {queries.statements}"
+
+    return budget
+
+
+@pytest.fixture
+def redis_server():
+    # For tests of the connection itself (pools, server-side script cache,
+    # client tracking), which REDIS_MODE=memory has no equivalent of.
+    if settings.REDIS_MODE == "memory":
+        pytest.skip("needs a Redis server (REDIS_MODE=memory)")
+
+
+@pytest.fixture(autouse=True)
+def clear_local_caches():
+    # Per-worker caches outlive a test; start each one cold so a value cached
+    # against a previous test's data can't leak into the next.
+    auth_services.token_version_cache.clear()
+    auth_services.principal_cache.clear()
+    auth_services.verified_token_cache.clear()
 
 
 @pytest.fixture(scope="session", autouse=True)